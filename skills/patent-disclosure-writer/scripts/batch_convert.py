@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交底书批量转换（Markdown → DOCX）
+
+扫描目录树中的全部 `专利申请技术交底书_*.md`，在进程池中并行转换，
+最后输出包含每个文件验证评分、转换耗时和总体吞吐量的汇总报告。
+
+- 每个文件在工作进程内用 docx_pipeline 完成解析 → 附图渲染 → 生成 → 插入 → 验证，
+  不启动子进程，DOCX 只保存一次
+- 字体检查在批次开始时执行一次；模板文件和 mmdc 渲染器在工作进程启动时各加载一次，
+  之后该工作进程处理的所有文件复用
+- 附图只经渲染缓存渲染一次，插入时直接使用 `diagram_images_{发明名称}/` 中的图片
+- 单个文件转换失败只记录到汇总报告，不影响其它文件
+
+- 指定 `--trace` 时，各工作进程记录每个文件的转换步骤，合并为一份
+  Chrome Trace 格式的时间线（每个工作进程一行）
+
+用法：
+    python batch_convert.py <root_dir> [--workers 4] [--summary batch_summary.json]
+                            [--trace batch_trace.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from docx_pipeline import DEFAULT_TEMPLATE, StageError, check_fonts, convert_markdown, load_template
+from docx_stream_validator import DocxValidationError
+from mermaid_renderer import MmdcRenderer, RenderError, RenderOptions
+from trace_events import NULL_TRACER, Tracer, tracer_for
+
+DISCLOSURE_PREFIX = "专利申请技术交底书_"
+DEFAULT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# 工作进程内共享的配置（由 _init_worker 设置一次）
+_worker = {}  # type: Dict
+
+
+def find_disclosures(root_dir: str) -> List[str]:
+    """递归查找交底书 Markdown 文件（按路径排序，保证结果稳定）"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if name.startswith(DISCLOSURE_PREFIX) and name.endswith(".md"):
+                found.append(os.path.join(dirpath, name))
+    return found
+
+
+def output_paths(markdown_path: str, output_root: Optional[str], root_dir: str) -> Dict[str, str]:
+    """计算单个交底书的输出文件路径（同目录下多份交底书互不覆盖）"""
+    md_dir = os.path.dirname(os.path.abspath(markdown_path))
+    if output_root:
+        rel = os.path.relpath(md_dir, os.path.abspath(root_dir))
+        out_dir = os.path.normpath(os.path.join(output_root, rel))
+    else:
+        out_dir = md_dir
+    stem = os.path.splitext(os.path.basename(markdown_path))[0]
+    name = stem[len(DISCLOSURE_PREFIX):]
+    return {
+        "output_dir": out_dir,
+        "docx": os.path.join(out_dir, stem + ".docx"),
+        "images_dir": os.path.join(out_dir, "diagram_images_{}".format(name)),
+        "validation_json": os.path.join(out_dir, "validation_report_{}.json".format(name)),
+    }
+
+
+def _init_worker(config: Dict):
+    """工作进程初始化：保存配置，加载模板并创建复用的渲染器"""
+    _worker.clear()
+    _worker.update(config)
+    _worker["template"] = load_template(config["template"])
+    _worker["renderer"] = MmdcRenderer(mmdc=config["mmdc"])
+    _worker["render_options"] = (RenderOptions.for_print(config["print_dpi"])
+                                 if config["print_dpi"] else None)
+
+
+def convert_one(markdown_path: str, paths: Dict[str, str]) -> Dict:
+    """转换单个交底书，任何异常都转换为失败记录返回"""
+    tracer = Tracer(process_name="batch_convert worker") if _worker["trace"] else NULL_TRACER
+    record = {
+        "markdown_file": markdown_path,
+        "docx_file": paths["docx"],
+        "status": "success",
+        "overall_score": None,
+        "validation_passed": None,
+        "diagrams": 0,
+        "stage_seconds": {},
+    }
+    start = time.perf_counter()
+    try:
+        with tracer.span("convert", category="file", file=os.path.basename(markdown_path)):
+            _convert(markdown_path, paths, record, tracer)
+    except StageError as e:
+        record["status"] = "failed"
+        record["failed_stage"] = e.stage
+        record["error"] = str(e)
+    except (OSError, ValueError, RenderError, DocxValidationError) as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    if _worker["trace"]:
+        record["trace_events"] = tracer.to_dict()["traceEvents"]
+    return record
+
+
+def _convert(markdown_path: str, paths: Dict[str, str], record: Dict, tracer):
+    """在当前进程内转换一份交底书，结果写入 record"""
+    os.makedirs(paths["output_dir"], exist_ok=True)
+    report = convert_markdown(markdown_path, paths["docx"], _worker["template"],
+                              paths["images_dir"], renderer=_worker["renderer"],
+                              render_options=_worker["render_options"],
+                              render_workers=_worker["render_workers"],
+                              level=_worker["level"], tracer=tracer,
+                              timings=record["stage_seconds"])
+    validation = report["validation"]
+    with open(paths["validation_json"], "w", encoding="utf-8") as f:
+        json.dump(validation, f, ensure_ascii=False, indent=2)
+    record["diagrams"] = report["diagrams"]
+    for key in ("cache_hits", "cache_misses", "docx_bytes"):
+        if key in report:
+            record[key] = report[key]
+    record["overall_score"] = validation.get("overall_score")
+    record["validation_passed"] = validation.get("validation_passed")
+    record["critical_issues"] = len(validation.get("critical_issues") or [])
+
+
+def run_batch(root_dir: str, workers: int, config: Dict,
+              output_root: Optional[str] = None) -> Dict:
+    """在进程池中转换目录下的全部交底书"""
+    files = find_disclosures(root_dir)
+    records = []  # type: List[Dict]
+    trace_events = []  # type: List[Dict]
+    start = time.perf_counter()
+
+    if files:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(config,)) as pool:
+            futures = {
+                pool.submit(convert_one, path, output_paths(path, output_root, root_dir)): path
+                for path in files
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:  # 工作进程异常退出等情况
+                    record = {"markdown_file": path, "status": "failed", "error": str(e)}
+                trace_events.extend(record.pop("trace_events", []))
+                records.append(record)
+                mark = "✅" if record["status"] == "success" else "❌"
+                print("[{}/{}] {} {}".format(done, len(files), mark, path))
+
+    elapsed = time.perf_counter() - start
+    records.sort(key=lambda r: r["markdown_file"])
+    succeeded = [r for r in records if r["status"] == "success"]
+    scores = [r["overall_score"] for r in succeeded if r.get("overall_score") is not None]
+    summary = {
+        "batch_timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "root_dir": root_dir,
+        "workers": workers,
+        "validation_level": config["level"],
+        "total_files": len(records),
+        "succeeded": len(succeeded),
+        "failed": len(records) - len(succeeded),
+        "validation_passed": sum(1 for r in succeeded if r.get("validation_passed")),
+        "average_score": round(sum(scores) / len(scores), 1) if scores else None,
+        "wall_seconds": round(elapsed, 3),
+        "cumulative_seconds": round(sum(r.get("seconds", 0) for r in records), 3),
+        "files_per_minute": round(len(records) * 60 / elapsed, 2) if elapsed > 0 else None,
+        "files": records,
+    }
+    if config.get("trace"):
+        # 由 main 合并写入追踪文件，不进入汇总报告
+        summary["trace_events"] = trace_events
+    return summary
+
+
+def print_summary(summary: Dict):
+    """打印批量转换汇总"""
+    print()
+    print("=== 批量转换汇总 ===")
+    print("📁 文件总数: {}".format(summary["total_files"]))
+    print("✅ 转换成功: {}".format(summary["succeeded"]))
+    print("❌ 转换失败: {}".format(summary["failed"]))
+    print("⭐ 验证通过: {}".format(summary["validation_passed"]))
+    if summary["average_score"] is not None:
+        print("📊 平均评分: {}".format(summary["average_score"]))
+    print("⏱️  总耗时: {:.1f}秒（{}个工作进程）".format(summary["wall_seconds"], summary["workers"]))
+    if summary["files_per_minute"] is not None:
+        print("🚀 吞吐量: {} 份/分钟".format(summary["files_per_minute"]))
+    print()
+    print("| 文件 | 评分 | 耗时(秒) | 状态 |")
+    print("|------|------|---------|------|")
+    for r in summary["files"]:
+        score = r.get("overall_score")
+        status = "✅" if r["status"] == "success" else "❌ {}".format(r.get("error", ""))
+        print("| {} | {} | {} | {} |".format(
+            os.path.basename(r["markdown_file"]),
+            "-" if score is None else score,
+            r.get("seconds", "-"),
+            status,
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量转换目录下的专利交底书为 DOCX")
+    parser.add_argument("root_dir", help="包含交底书的根目录（递归扫描）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="并行工作进程数")
+    parser.add_argument("--output-root", help="输出根目录（默认与 Markdown 文件同目录）")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="DOCX 模板路径")
+    parser.add_argument("--level", default="strict", choices=["standard", "strict"], help="验证级别")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="每个工作进程内的 Mermaid 并行渲染进程数")
+    parser.add_argument("--mmdc", default="mmdc", help="mermaid-cli 可执行文件")
+    parser.add_argument("--print-dpi", type=int,
+                        help="按打印分辨率渲染附图并裁剪、压缩图片（如 300）")
+    parser.add_argument("--skip-font-check", action="store_true", help="跳过字体检查")
+    parser.add_argument("--summary", help="汇总报告 JSON 路径（默认 <root_dir>/batch_summary.json）")
+    parser.add_argument("--trace", help="输出 Chrome Trace 格式的各文件转换步骤时间线（JSON）")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root_dir):
+        print("❌ 错误：目录不存在")
+        print("📄 路径: {}".format(args.root_dir))
+        sys.exit(1)
+    if not os.path.exists(args.template):
+        print("❌ 错误：DOCX 模板不存在")
+        print("📄 路径: {}".format(args.template))
+        sys.exit(1)
+
+    # 字体检查整个批次只执行一次
+    if not args.skip_font_check:
+        try:
+            check_fonts()
+        except StageError:
+            print("❌ 字体检查未通过，请先安装思源黑体 CN 字体")
+            sys.exit(1)
+
+    config = {
+        "template": os.path.abspath(args.template),
+        "level": args.level,
+        "mmdc": args.mmdc,
+        "render_workers": args.render_workers,
+        "print_dpi": args.print_dpi,
+        "trace": bool(args.trace),
+    }
+    tracer = tracer_for(args.trace, "batch_convert")
+    with tracer.span("batch", category="batch"):
+        summary = run_batch(args.root_dir, max(1, args.workers), config,
+                            output_root=args.output_root)
+    if args.trace:
+        tracer.write(args.trace, summary.pop("trace_events"))
+    print_summary(summary)
+
+    summary_path = args.summary or os.path.join(args.root_dir, "batch_summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print()
+    print("📄 汇总报告: {}".format(summary_path))
+    if args.trace:
+        print("📄 追踪文件: {}".format(args.trace))
+
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,820 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DOCX 转换工具链性能基准
+
+按 IP-JL-027 模板结构生成不同规模的合成交底书（从几页到数百页、最多120幅附图），
+依次执行转换工具链的各个步骤，记录每个步骤的耗时、峰值内存和输出大小：
+
+- lint：mermaid_lint 检查全部附图
+- render_cold / render_warm：用桩渲染器代替 mmdc 渲染附图（无缓存 / 全部命中缓存）
+- optimize_images：image_optimizer 优化附图图片
+- build_docx：按模板格式生成包含全部附图的 DOCX（代替 docx_generator + diagram_inserter）
+- optimize_docx：DOCX 图片优化与媒体去重
+- validate：docx_stream_validator 验证 DOCX
+- parse / generate / insert / validate_external：`--scripts-dir` 下存在
+  docx_conversion 脚本时，额外测量 markdown_parser.py、docx_generator.py、
+  diagram_inserter.py、docx_validator.py
+
+每个步骤在独立子进程中执行，峰值内存互不影响。桩渲染器不启动浏览器，
+测得的是工具链本身的开销；每10幅附图中有1幅与前一幅结构相同，渲染结果
+相同，用于测量 DOCX 媒体去重。
+
+结果写入 JSON，`--compare` 与上一次的结果对比，耗时或峰值内存超过阈值时返回 1。
+
+用法：
+    python benchmark.py [--sizes small,medium,large] [--output benchmark_results.json]
+                        [--compare previous.json] [--threshold 0.2] [--trace-dir traces/]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from docx_pipeline import DEFAULT_TEMPLATE
+from figure_utils import iter_mermaid_blocks, read_text
+from trace_events import NULL_TRACER, Tracer
+
+# 规模：附图数量、正文段落数（每页约10个正文段落）
+SIZES = OrderedDict([
+    ("small", {"figures": 4, "paragraphs": 30}),
+    ("medium", {"figures": 24, "paragraphs": 300}),
+    ("large", {"figures": 120, "paragraphs": 2400}),
+])
+
+STAGES = ["lint", "render_cold", "render_warm", "optimize_images",
+          "build_docx", "optimize_docx", "validate"]
+EXTERNAL_STAGES = [
+    ("parse", "markdown_parser.py"),
+    ("generate", "docx_generator.py"),
+    ("insert", "diagram_inserter.py"),
+    ("validate_external", "docx_validator.py"),
+]
+
+DEFAULT_SCRIPTS_DIR = os.path.join(".claude", "scripts", "docx_conversion")
+DEFAULT_THRESHOLD = 0.2
+# 短于该耗时差的变化视为噪声，不判定为性能回退
+MIN_SECONDS_DELTA = 0.05
+STAGE_TIMEOUT = 1800
+# wait4 轮询间隔上限（秒），从 1ms 开始逐步加倍，短步骤的计时误差保持在毫秒级
+WAIT_POLL_MAX = 0.05
+
+MARKDOWN_NAME = "专利申请技术交底书_基准测试.md"
+DIAGRAM_DESC_NAME = "10_附图说明.md"
+IMAGES_DIRNAME = "diagram_images"
+DOCX_NAME = "基准测试.docx"
+OPTIMIZED_DOCX_NAME = "基准测试_optimized.docx"
+CONFIG_NAME = "benchmark_config.json"
+RESULT_NAME = ".stage_result.json"
+
+INVENTION_NAME = "一种用于专利交底书转换工具链的合成数据性能基准测试方法及系统"
+
+# 章节标题及正文段落占比；附图分布在背景技术、技术方案和具体实施方式中
+SECTIONS = [
+    ("## **2. 所属技术领域**", 0.02, 0.0),
+    ("## **3. 相关的背景技术**", 0.10, 0.1),
+    ("## **4. 发明内容**", 0.0, 0.0),
+    ("### **（1）解决的技术问题**", 0.05, 0.0),
+    ("### **（2）技术方案**", 0.20, 0.3),
+    ("### **（3）有益效果**", 0.05, 0.0),
+    ("## **5. 具体实施方式**", 0.48, 0.6),
+    ("## **6. 关键点和欲保护点**", 0.05, 0.0),
+    ("## **7. 其他有助于理解本技术的资料**", 0.05, 0.0),
+]
+
+PHRASES = [
+    "所述数据采集模块按照预设周期读取各检测设备上报的状态信息",
+    "并将状态信息写入共享存储区域供后续处理单元读取",
+    "所述调度单元根据任务优先级和设备负载确定执行顺序",
+    "当检测到通信链路异常时，系统自动切换至备用网卡继续传输",
+    "所述配置管理模块维护设备标识与网络地址之间的映射关系",
+    "在本实施例中，缓存数据以内容哈希作为索引以避免重复计算",
+    "处理结果经校验后按照统一的报文格式发送至上位机",
+    "从而在不增加硬件成本的前提下提高了整体处理效率",
+]
+NODE_LABELS = ["数据采集", "预处理", "特征提取", "任务调度", "状态判断",
+               "结果校验", "报文封装", "数据上报", "异常处理", "配置更新"]
+NODE_SUFFIXES = ["", "单元", "模块", "装置", "子系统", "接口", "服务", "队列",
+                 "缓存", "引擎", "通道", "代理"]
+
+HEADING_RE = re.compile(r"^(#{1,3})\s+(.*)$")
+BOLD_LINE_RE = re.compile(r"^\*\*(.+)\*\*$")
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+EMU_PER_INCH = 914400
+PRINT_WIDTH_EMU = 5 * EMU_PER_INCH
+
+
+class BenchmarkError(Exception):
+    """基准测试无法执行"""
+
+
+# ---------------------------------------------------------------------------
+# 合成交底书
+# ---------------------------------------------------------------------------
+
+def _split(total: int, shares: Sequence[float]) -> List[int]:
+    """按占比把 total 分配到各项（累计取整，合计恰好等于 total）"""
+    weight = sum(shares)
+    counts = []
+    assigned = 0
+    cumulative = 0.0
+    for share in shares:
+        cumulative += share
+        target = int(round(total * cumulative / weight)) if weight else 0
+        counts.append(target - assigned)
+        assigned = target
+    return counts
+
+
+def _paragraph(index: int) -> str:
+    count = len(PHRASES)
+    parts = [PHRASES[(index + k) % count] for k in range(5)]
+    return "，".join(parts) + "。"
+
+
+def _figure_source(number: int, structure: int) -> str:
+    """附图 Mermaid 源码：structure 相同的附图只有附图标记不同"""
+    base = number * 100
+    suffix = NODE_SUFFIXES[(structure // len(NODE_LABELS)) % len(NODE_SUFFIXES)]
+    if structure % 4 == 3:
+        lines = [
+            "sequenceDiagram",
+            "    participant C as 检测终端<br/>{}".format(base + 1),
+            "    participant S as 管理服务器<br/>{}".format(base + 2),
+            "    participant D as 数据库<br/>{}".format(base + 3),
+        ]
+        for step in range(3 + structure % 3):
+            label = NODE_LABELS[(structure + step) % len(NODE_LABELS)]
+            lines.append("    C->>S: {}{}请求".format(label, suffix))
+            lines.append("    S->>D: 写入记录")
+            lines.append("    S-->>C: 返回结果")
+        return "\n".join(lines)
+
+    nodes = 4 + structure % 5
+    lines = ["graph TD"]
+    for i in range(nodes):
+        label = NODE_LABELS[(structure + i) % len(NODE_LABELS)] + suffix
+        lines.append("    N{0}[{1}<br/>{2}]".format(i + 1, label, base + i + 1))
+    for i in range(1, nodes):
+        lines.append("    N{} --> N{}".format(i, i + 1))
+    return "\n".join(lines)
+
+
+def generate_disclosure(figures: int, paragraphs: int) -> Tuple[str, str]:
+    """生成整合后的交底书和附图说明，返回 (交底书 Markdown, 附图说明 Markdown)"""
+    body_counts = _split(paragraphs, [s[1] for s in SECTIONS])
+    figure_counts = _split(figures, [s[2] for s in SECTIONS])
+
+    out = ["# 发明专利申请交底书", "", "## **1. 发明创造名称**", "", INVENTION_NAME, ""]
+    desc = ["# 附图说明", ""]
+    paragraph_index = 0
+    number = 0
+    structure = 0
+    for (heading, _, _), body, count in zip(SECTIONS, body_counts, figure_counts):
+        out.extend([heading, ""])
+        # 附图均匀插入本节的正文段落之间
+        positions = [int(round((k + 1) * body / (count + 1))) for k in range(count)]
+        for j in range(body + 1):
+            while positions and positions[0] == j:
+                positions.pop(0)
+                number += 1
+                # 每10幅附图中有1幅沿用前一幅的结构
+                if number % 10 != 0:
+                    structure = number
+                title = "{}流程示意图".format(NODE_LABELS[structure % len(NODE_LABELS)])
+                source = _figure_source(number, structure)
+                out.extend([
+                    "**附图{}：{}**".format(number, title), "",
+                    "```mermaid", source, "```", "",
+                    "图{}说明：{}".format(number, _paragraph(number)), "",
+                ])
+                desc.extend([
+                    "### 图{}: {}".format(number, title), "",
+                    "```mermaid", source, "```", "",
+                ])
+            if j < body:
+                out.extend([_paragraph(paragraph_index), ""])
+                paragraph_index += 1
+    return "\n".join(out), "\n".join(desc)
+
+
+# ---------------------------------------------------------------------------
+# 桩渲染器
+# ---------------------------------------------------------------------------
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (struct.pack(">I", len(data)) + kind + data +
+            struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def stub_png(width: int, height: int, boxes: int, seed: int) -> bytes:
+    """生成与 mmdc 输出相似的 PNG：白色背景、四周留白、若干灰色节点框"""
+    white = b"\x00" + b"\xff" * (width * 3)
+    margin = width // 8
+    box_left = margin + seed % max(1, width // 8)
+    box_right = width - margin
+    box_row = (b"\x00" + b"\xff" * (box_left * 3) +
+               b"\xd0\xd0\xe8" * (box_right - box_left) +
+               b"\xff" * ((width - box_right) * 3))
+    band = max(1, (height - 2 * margin) // max(1, boxes * 2))
+    rows = []
+    for y in range(height):
+        inside = margin <= y < height - margin and ((y - margin) // band) % 2 == 0
+        rows.append(box_row if inside else white)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header) +
+            _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) +
+            _png_chunk(b"IEND", b""))
+
+
+class StubRenderer(object):
+    """
+    代替 MmdcRenderer 的桩渲染器
+
+    不启动浏览器，按源码结构生成确定性的 PNG：附图标记（数字）不影响图片内容，
+    结构相同的附图得到字节完全相同的图片。
+    """
+
+    version = "stub-1"
+
+    def render_batch(self, sources: Sequence[str], workdir: str, options) -> List[str]:
+        images = []
+        for i, source in enumerate(sources, 1):
+            skeleton = re.sub(r"\d", "", source)
+            boxes = max(1, skeleton.count("\n"))
+            width = int(options.width * options.scale)
+            height = min(int(options.height * options.scale), 120 * boxes + 2 * (width // 8))
+            path = os.path.join(workdir, "batch_out-{}.png".format(i))
+            with open(path, "wb") as f:
+                f.write(stub_png(width, height, boxes, zlib.crc32(skeleton.encode("utf-8"))))
+            images.append(path)
+        return images
+
+
+# ---------------------------------------------------------------------------
+# DOCX 生成（代替 docx_generator + diagram_inserter）
+# ---------------------------------------------------------------------------
+
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+PACKAGE_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/officeDocument" Target="word/document.xml"/>'
+    '</Relationships>'
+)
+# 正文：思源黑体 CN 10pt、1.5倍行距、首行缩进2字符、两端对齐；标题：18pt 加粗
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:styles xmlns:w="{ns}">'
+    '<w:docDefaults>'
+    '<w:rPrDefault><w:rPr><w:rFonts w:ascii="思源黑体 CN" w:eastAsia="思源黑体 CN" '
+    'w:hAnsi="思源黑体 CN"/><w:sz w:val="20"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:line="360" w:lineRule="auto"/>'
+    '<w:ind w:firstLineChars="200"/><w:jc w:val="both"/></w:pPr></w:pPrDefault>'
+    '</w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="PatentHeading"><w:name w:val="Patent Heading"/>'
+    '<w:basedOn w:val="Normal"/><w:pPr><w:ind w:firstLineChars="0"/><w:jc w:val="left"/></w:pPr>'
+    '<w:rPr><w:b/><w:sz w:val="36"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="FigureCaption"><w:name w:val="Figure Caption"/>'
+    '<w:basedOn w:val="Normal"/><w:pPr><w:ind w:firstLineChars="0"/><w:jc w:val="center"/></w:pPr>'
+    '<w:rPr><w:b/></w:rPr></w:style>'
+    '</w:styles>'
+).format(ns=W_NS)
+DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="{ns}" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"><w:body>'
+).format(ns=W_NS)
+# A4，页边距 2.54cm / 3.17cm
+DOCUMENT_TAIL = (
+    '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+    '<w:pgMar w:top="1440" w:right="1800" w:bottom="1440" w:left="1800"/></w:sectPr>'
+    '</w:body></w:document>'
+)
+IMAGE_PARAGRAPH = (
+    '<w:p><w:pPr><w:ind w:firstLineChars="0"/><w:jc w:val="center"/></w:pPr><w:r><w:drawing>'
+    '<wp:inline><wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{id}" name="图{id}"/>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<pic:pic><pic:nvPicPr><pic:cNvPr id="{id}" name="{name}"/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"/></pic:spPr></pic:pic></a:graphicData></a:graphic>'
+    '</wp:inline></w:drawing></w:r></w:p>'
+)
+
+
+def _text_paragraph(text: str, style: Optional[str] = None) -> str:
+    ppr = '<w:pPr><w:pStyle w:val="{}"/></w:pPr>'.format(style) if style else ""
+    return '<w:p>{}<w:r><w:t xml:space="preserve">{}</w:t></w:r></w:p>'.format(
+        ppr, escape(text))
+
+
+def _png_size(data: bytes) -> Tuple[int, int]:
+    return struct.unpack(">II", data[16:24])
+
+
+def build_docx(markdown_path: str, images_dir: str, docx_path: str, tracer=NULL_TRACER) -> Dict:
+    """按交底书模板格式生成 DOCX，附图图片插入到对应代码块的位置"""
+    from mermaid_renderer import image_filenames
+
+    with tracer.span("load_markdown"):
+        text = read_text(markdown_path)
+        all_blocks = list(iter_mermaid_blocks(text))
+        blocks = {b.start_line: b for b in all_blocks}
+        filenames = {b.start_line: name
+                     for b, name in zip(all_blocks, image_filenames(all_blocks))}
+
+    parts = [DOCUMENT_HEAD]
+    media = []  # type: List[Tuple[str, bytes]]
+    with tracer.span("fill_sections"):
+        lines = text.splitlines()
+        i = 0
+        while i < len(lines):
+            line = lines[i].strip()
+            block = blocks.get(i + 1)
+            if block is not None:
+                image_path = os.path.join(images_dir, filenames[block.start_line])
+                with tracer.span("insert_image", category="image", figure=block.figure_number):
+                    with open(image_path, "rb") as f:
+                        data = f.read()
+                    width, height = _png_size(data)
+                    index = len(media) + 1
+                    media.append(("image{}.png".format(index), data))
+                    parts.append(IMAGE_PARAGRAPH.format(
+                        cx=PRINT_WIDTH_EMU, cy=PRINT_WIDTH_EMU * height // max(1, width),
+                        id=index, name="image{}.png".format(index), rid="rIdImg{}".format(index)))
+                i = (block.end_line or len(lines))
+                continue
+            heading = HEADING_RE.match(line)
+            bold = BOLD_LINE_RE.match(line)
+            if heading:
+                parts.append(_text_paragraph(heading.group(2).strip("* "), "PatentHeading"))
+            elif bold:
+                parts.append(_text_paragraph(bold.group(1), "FigureCaption"))
+            elif line:
+                parts.append(_text_paragraph(line))
+            i += 1
+    parts.append(DOCUMENT_TAIL)
+
+    rels = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/'
+            '2006/relationships/styles" Target="styles.xml"/>']
+    for index, (name, _) in enumerate(media, 1):
+        rels.append('<Relationship Id="rIdImg{}" Type="http://schemas.openxmlformats.org/'
+                    'officeDocument/2006/relationships/image" Target="media/{}"/>'.format(index, name))
+    rels.append("</Relationships>")
+
+    with tracer.span("save", images=len(media)):
+        with zipfile.ZipFile(docx_path, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("[Content_Types].xml", CONTENT_TYPES_XML)
+            z.writestr("_rels/.rels", PACKAGE_RELS_XML)
+            z.writestr("word/document.xml", "".join(parts))
+            z.writestr("word/styles.xml", STYLES_XML)
+            z.writestr("word/_rels/document.xml.rels", "".join(rels))
+            for name, data in media:
+                z.writestr("word/media/" + name, data)
+    return {"images": len(media)}
+
+
+# ---------------------------------------------------------------------------
+# 子进程内执行的步骤
+# ---------------------------------------------------------------------------
+
+def _dir_bytes(path: str, pattern: str = "*.png") -> int:
+    return sum(os.path.getsize(p) for p in glob.glob(os.path.join(path, pattern)))
+
+
+def run_stage(stage: str, workdir: str, config: Dict, tracer=NULL_TRACER) -> Dict:
+    """执行一个工具链步骤，返回 {seconds, output_bytes, ...}"""
+    markdown = os.path.join(workdir, MARKDOWN_NAME)
+    images_dir = os.path.join(workdir, IMAGES_DIRNAME)
+    docx = os.path.join(workdir, DOCX_NAME)
+    optimized_docx = os.path.join(workdir, OPTIMIZED_DOCX_NAME)
+
+    if stage == "render_cold" and os.path.isdir(images_dir):
+        shutil.rmtree(images_dir)
+
+    # 各步骤的模块在步骤内导入，峰值内存只包含该步骤实际用到的模块
+    start = time.perf_counter()
+    if stage == "lint":
+        from mermaid_lint import lint_files
+        report = lint_files([markdown], level="standard", tracer=tracer)
+        result = {"output_bytes": None, "diagrams": report["total_diagrams"],
+                  "errors": report["errors"], "warnings": report["warnings"]}
+    elif stage in ("render_cold", "render_warm"):
+        from mermaid_renderer import RenderOptions, render_markdown
+        options = RenderOptions.for_print(config["print_dpi"]) if config.get("print_dpi") else None
+        report = render_markdown(markdown, images_dir, renderer=StubRenderer(),
+                                 options=options, tracer=tracer)
+        result = {"cache_hits": report["cache_hits"], "cache_misses": report["cache_misses"],
+                  "failed": report["failed"]}
+    elif stage == "optimize_images":
+        from image_optimizer import optimize_directory
+        report = optimize_directory(images_dir, tracer=tracer)
+        result = {"saved_bytes": report["saved_bytes"]}
+    elif stage == "build_docx":
+        result = build_docx(markdown, images_dir, docx, tracer=tracer)
+    elif stage == "optimize_docx":
+        from image_optimizer import optimize_docx
+        report = optimize_docx(docx, optimized_docx, tracer=tracer)
+        result = {"duplicates_removed": report["duplicates_removed"],
+                  "saved_bytes": report["saved_bytes"]}
+    elif stage == "validate":
+        from docx_stream_validator import validate_docx
+        report = validate_docx(optimized_docx, level="standard", tracer=tracer)
+        result = {"overall_score": report["overall_score"],
+                  "validation_passed": report["validation_passed"]}
+    else:
+        raise BenchmarkError("未知的步骤：{}".format(stage))
+    result["seconds"] = round(time.perf_counter() - start, 4)
+
+    if stage.startswith("render"):
+        result["output_bytes"] = _dir_bytes(images_dir)
+    elif stage == "optimize_images":
+        result["output_bytes"] = _dir_bytes(images_dir)
+    elif stage == "build_docx":
+        result["output_bytes"] = os.path.getsize(docx)
+    elif stage == "optimize_docx":
+        result["output_bytes"] = os.path.getsize(optimized_docx)
+    elif stage == "validate":
+        result["output_bytes"] = None
+    return result
+
+
+def _stage_main(argv: List[str]):
+    """子进程入口：benchmark.py _stage <stage> <workdir>"""
+    stage, workdir = argv
+    with open(os.path.join(workdir, CONFIG_NAME), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    trace_path = config.get("trace_path_pattern")
+    tracer = Tracer(process_name=stage) if trace_path else NULL_TRACER
+    try:
+        with tracer.span(stage, category="stage"):
+            result = run_stage(stage, workdir, config, tracer=tracer)
+    finally:
+        if trace_path:
+            tracer.write(trace_path.format(stage=stage))
+    with open(os.path.join(workdir, RESULT_NAME), "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+
+
+# ---------------------------------------------------------------------------
+# 父进程：子进程调度与测量
+# ---------------------------------------------------------------------------
+
+def _maxrss_kb(rusage) -> int:
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    if sys.platform == "darwin":
+        return int(rusage.ru_maxrss // 1024)
+    return int(rusage.ru_maxrss)
+
+
+def _wait4(proc: subprocess.Popen, timeout: float) -> Tuple[int, object, bool]:
+    """以 WNOHANG 轮询等待子进程，超时后结束子进程；返回 (状态, 资源占用, 是否超时)"""
+    deadline = time.perf_counter() + timeout
+    delay = 0.001
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            return status, rusage, False
+        if time.perf_counter() >= deadline:
+            proc.kill()
+            _, status, rusage = os.wait4(proc.pid, 0)
+            return status, rusage, True
+        time.sleep(delay)
+        delay = min(delay * 2, WAIT_POLL_MAX)
+
+
+def measure(cmd: List[str], workdir: str, timeout: float = STAGE_TIMEOUT) -> Dict:
+    """执行子进程，返回耗时、退出码、峰值内存（不支持 wait4 的平台为 None）；超时后结束子进程"""
+    log_path = os.path.join(workdir, "stage.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=workdir)
+        peak = None
+        timed_out = False
+        if hasattr(os, "wait4"):
+            status, rusage, timed_out = _wait4(proc, timeout)
+            proc.returncode = (os.WEXITSTATUS(status) if os.WIFEXITED(status)
+                               else -os.WTERMSIG(status))
+            peak = _maxrss_kb(rusage)
+        else:
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                timed_out = True
+        wall = time.perf_counter() - start
+    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+        output = f.read().strip().splitlines()
+    return {
+        "returncode": proc.returncode,
+        "wall_seconds": round(wall, 4),
+        "peak_rss_kb": peak,
+        "last_line": output[-1] if output else "",
+        "timed_out": timed_out,
+        "timeout": timeout,
+    }
+
+
+def _run_error(run: Dict) -> str:
+    if run["timed_out"]:
+        return "超时（超过{}秒），已结束子进程".format(run["timeout"])
+    return run["last_line"] or "返回码 {}".format(run["returncode"])
+
+
+def _run_internal(stage: str, workdir: str) -> Dict:
+    result_path = os.path.join(workdir, RESULT_NAME)
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    run = measure([sys.executable, os.path.abspath(__file__), "_stage", stage, workdir], workdir)
+    if run["returncode"] != 0 or not os.path.exists(result_path):
+        return {"error": _run_error(run),
+                "wall_seconds": run["wall_seconds"], "peak_rss_kb": run["peak_rss_kb"]}
+    with open(result_path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    result["wall_seconds"] = run["wall_seconds"]
+    result["peak_rss_kb"] = run["peak_rss_kb"]
+    return result
+
+
+def _run_external(stage: str, script: str, workdir: str, scripts_dir: str,
+                  template: str) -> Dict:
+    markdown = os.path.join(workdir, MARKDOWN_NAME)
+    parsed = os.path.join(workdir, "parsed_sections.json")
+    docx = os.path.join(workdir, "generated.docx")
+    args = {
+        "parse": [markdown, parsed],
+        "generate": [parsed, template, docx],
+        "insert": [markdown, docx, os.path.join(workdir, DIAGRAM_DESC_NAME),
+                   os.path.join(workdir, IMAGES_DIRNAME)],
+        "validate_external": [docx, os.path.join(workdir, "validation_report.json"),
+                              "--level", "standard"],
+    }[stage]
+    run = measure([sys.executable, os.path.join(scripts_dir, script)] + args, workdir)
+    result = {"seconds": run["wall_seconds"], "wall_seconds": run["wall_seconds"],
+              "peak_rss_kb": run["peak_rss_kb"]}
+    if run["returncode"] != 0:
+        result["error"] = _run_error(run)
+    elif stage in ("generate", "insert"):
+        result["output_bytes"] = os.path.getsize(docx)
+    return result
+
+
+def _best(runs: List[Dict]) -> Dict:
+    """多次运行取耗时最短的一次，峰值内存取最大值"""
+    ok = [r for r in runs if "error" not in r]
+    if not ok:
+        return runs[-1]
+    best = dict(min(ok, key=lambda r: r["seconds"]))
+    peaks = [r["peak_rss_kb"] for r in ok if r.get("peak_rss_kb") is not None]
+    best["peak_rss_kb"] = max(peaks) if peaks else None
+    return best
+
+
+def run_size(name: str, spec: Dict, workdir: str, repeat: int, config: Dict,
+             scripts_dir: Optional[str], template: str) -> Dict:
+    """生成一种规模的交底书并测量全部步骤"""
+    os.makedirs(workdir, exist_ok=True)
+    markdown, desc = generate_disclosure(spec["figures"], spec["paragraphs"])
+    with open(os.path.join(workdir, MARKDOWN_NAME), "w", encoding="utf-8") as f:
+        f.write(markdown)
+    with open(os.path.join(workdir, DIAGRAM_DESC_NAME), "w", encoding="utf-8") as f:
+        f.write(desc)
+    stage_config = dict(config)
+    if config.get("trace_dir"):
+        stage_config["trace_path_pattern"] = os.path.join(
+            os.path.abspath(config["trace_dir"]), name + "_{stage}.json")
+    with open(os.path.join(workdir, CONFIG_NAME), "w", encoding="utf-8") as f:
+        json.dump(stage_config, f, ensure_ascii=False)
+
+    external = []  # type: List[Tuple[str, str]]
+    if scripts_dir and os.path.isdir(scripts_dir):
+        external = [(stage, script) for stage, script in EXTERNAL_STAGES
+                    if os.path.exists(os.path.join(scripts_dir, script))]
+
+    runs = OrderedDict()  # type: OrderedDict[str, List[Dict]]
+    for _ in range(repeat):
+        failed = False
+        for stage in STAGES:
+            result = {"error": "前序步骤失败"} if failed else _run_internal(stage, workdir)
+            failed = failed or "error" in result
+            runs.setdefault(stage, []).append(result)
+        failed = False
+        for stage, script in external:
+            result = ({"error": "前序步骤失败"} if failed else
+                      _run_external(stage, script, workdir, scripts_dir, template))
+            failed = failed or "error" in result
+            runs.setdefault(stage, []).append(result)
+
+    return {
+        "figures": spec["figures"],
+        "paragraphs": spec["paragraphs"],
+        "markdown_bytes": len(markdown.encode("utf-8")),
+        "stages": OrderedDict((stage, _best(results)) for stage, results in runs.items()),
+    }
+
+
+def run_benchmark(sizes: List[str], repeat: int = 1, config: Optional[Dict] = None,
+                  scripts_dir: Optional[str] = None, template: str = DEFAULT_TEMPLATE,
+                  workdir: Optional[str] = None, keep: bool = False) -> Dict:
+    config = config or {}
+    root = workdir or tempfile.mkdtemp(prefix="patent_benchmark_")
+    if config.get("trace_dir"):
+        os.makedirs(config["trace_dir"], exist_ok=True)
+    try:
+        results = OrderedDict()
+        for name in sizes:
+            print("⏱️  {}：{} 幅附图，{} 个正文段落".format(
+                name, SIZES[name]["figures"], SIZES[name]["paragraphs"]))
+            results[name] = run_size(name, SIZES[name], os.path.join(root, name), repeat,
+                                     config, scripts_dir and os.path.abspath(scripts_dir),
+                                     os.path.abspath(template))
+    finally:
+        if not workdir:
+            if keep:
+                print("📁 临时工作目录已保留: {}".format(root))
+            else:
+                shutil.rmtree(root, ignore_errors=True)
+
+    try:
+        import PIL  # noqa: F401
+        pillow = True
+    except ImportError:
+        pillow = False
+    return {
+        "benchmark_timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pillow": pillow,
+        "repeat": repeat,
+        "print_dpi": config.get("print_dpi"),
+        "sizes": results,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 结果对比与输出
+# ---------------------------------------------------------------------------
+
+def compare_results(current: Dict, previous: Dict, threshold: float) -> List[Dict]:
+    """对比两次结果中都存在的规模和步骤，返回全部对比项（regression 标记回退）"""
+    rows = []
+    for size, data in current["sizes"].items():
+        old_stages = previous.get("sizes", {}).get(size, {}).get("stages", {})
+        for stage, new in data["stages"].items():
+            old = old_stages.get(stage)
+            if not old or "error" in old or "error" in new:
+                continue
+            row = {"size": size, "stage": stage, "regression": False,
+                   "old_seconds": old["seconds"], "new_seconds": new["seconds"],
+                   "old_rss_kb": old.get("peak_rss_kb"), "new_rss_kb": new.get("peak_rss_kb")}
+            if new["seconds"] > old["seconds"] * (1 + threshold) and \
+                    new["seconds"] - old["seconds"] >= MIN_SECONDS_DELTA:
+                row["regression"] = True
+            if row["old_rss_kb"] and row["new_rss_kb"] and \
+                    row["new_rss_kb"] > row["old_rss_kb"] * (1 + threshold):
+                row["regression"] = True
+            rows.append(row)
+    return rows
+
+
+def _size_text(value: Optional[int]) -> str:
+    if value is None:
+        return "-"
+    if value >= 1024 * 1024:
+        return "{:.1f}MB".format(value / 1024.0 / 1024.0)
+    return "{:.1f}KB".format(value / 1024.0)
+
+
+def print_results(results: Dict):
+    for size, data in results["sizes"].items():
+        print()
+        print("=== {}（{} 幅附图，{} 个正文段落）===".format(
+            size, data["figures"], data["paragraphs"]))
+        print("| 步骤 | 耗时(秒) | 峰值内存 | 输出大小 |")
+        print("|------|---------|---------|---------|")
+        for stage, r in data["stages"].items():
+            if "error" in r:
+                print("| {} | ❌ {} | - | - |".format(stage, r["error"]))
+                continue
+            rss = r.get("peak_rss_kb")
+            print("| {} | {:.3f} | {} | {} |".format(
+                stage, r["seconds"], _size_text(rss * 1024) if rss is not None else "-",
+                _size_text(r.get("output_bytes"))))
+
+
+def print_comparison(rows: List[Dict], threshold: float):
+    print()
+    print("=== 与上次结果对比（阈值 {:.0%}）===".format(threshold))
+    print("| 规模 | 步骤 | 耗时(秒) | 峰值内存 | 状态 |")
+    print("|------|------|---------|---------|------|")
+    for row in rows:
+        rss = "-"
+        if row["old_rss_kb"] and row["new_rss_kb"]:
+            rss = "{} → {}".format(_size_text(row["old_rss_kb"] * 1024),
+                                   _size_text(row["new_rss_kb"] * 1024))
+        print("| {} | {} | {:.3f} → {:.3f} | {} | {} |".format(
+            row["size"], row["stage"], row["old_seconds"], row["new_seconds"], rss,
+            "❌ 回退" if row["regression"] else "✅"))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "_stage":
+        _stage_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="DOCX 转换工具链性能基准")
+    parser.add_argument("--sizes", default=",".join(SIZES),
+                        help="测试规模，逗号分隔（{}）".format("、".join(SIZES)))
+    parser.add_argument("--repeat", type=int, default=1, help="每个步骤重复次数（取最短耗时）")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果 JSON 路径")
+    parser.add_argument("--compare", help="上一次的结果 JSON，对比并检查性能回退")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="耗时或峰值内存增加超过该比例视为回退（默认 0.2）")
+    parser.add_argument("--print-dpi", type=int, help="按打印分辨率渲染附图（如 300）")
+    parser.add_argument("--trace-dir", help="每个步骤输出 Chrome Trace 格式的阶段耗时到该目录")
+    parser.add_argument("--scripts-dir", default=DEFAULT_SCRIPTS_DIR,
+                        help="docx_conversion 脚本目录（存在时同时测量这些脚本）")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="DOCX 模板路径")
+    parser.add_argument("--workdir", help="工作目录（默认使用临时目录并在结束后删除）")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录（结束时输出其路径）")
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown or not sizes:
+        print("❌ 错误：未知的测试规模：{}".format("、".join(unknown) or args.sizes))
+        print("💡 可选规模：{}".format("、".join(SIZES)))
+        sys.exit(2)
+    previous = None
+    if args.compare:
+        if not os.path.exists(args.compare):
+            print("❌ 错误：对比结果文件不存在")
+            print("📄 路径: {}".format(args.compare))
+            sys.exit(2)
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    config = {"print_dpi": args.print_dpi, "trace_dir": args.trace_dir}
+    results = run_benchmark(sizes, repeat=max(1, args.repeat), config=config,
+                            scripts_dir=args.scripts_dir, template=args.template,
+                            workdir=args.workdir, keep=args.keep)
+    print_results(results)
+
+    regressions = []  # type: List[Dict]
+    if previous is not None:
+        rows = compare_results(results, previous, args.threshold)
+        results["comparison"] = {"baseline": args.compare, "threshold": args.threshold,
+                                 "rows": rows}
+        print_comparison(rows, args.threshold)
+        regressions = [r for r in rows if r["regression"]]
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print()
+    print("📄 基准结果: {}".format(args.output))
+    if args.trace_dir:
+        print("📄 追踪文件目录: {}".format(args.trace_dir))
+
+    failed = [s for d in results["sizes"].values() for s, r in d["stages"].items() if "error" in r]
+    if regressions:
+        print("❌ {} 个步骤性能回退".format(len(regressions)))
+    sys.exit(1 if regressions or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交底书单进程转换流水线（Markdown → DOCX）
+
+在一个进程内对同一个 `Document` 对象依次执行 `/patent-md-2-docx` 的各个步骤，
+DOCX 只在最后保存一次：
+
+- parse：按 markdown-parser 子代理的规则解析章节，结果与 parsed_sections.json 结构相同
+- generate：加载模板，按 docx-generator 子代理的字体和段落格式填充7个章节，
+  附图代码块的位置留出空的图片段落
+- render（可选，`--render`）：用 mermaid_renderer 的缓存渲染附图；未指定时直接使用
+  `diagram_images/` 中已有的图片，不调用 mmdc
+- insert：把 `diagram_images/图N_名称.png` 插入到对应的图片段落
+- validate：在内存中保存文档，用 docx_stream_validator 验证，验证通过与否都写出同一份字节
+
+各步骤也可以单独作为函数调用（parse_markdown、generate_document、insert_figures、
+validate_document）。模板文件和字体检查结果在进程内只读取一次，批量转换时
+同一个工作进程处理的所有文件共用（见 batch_convert.py）。
+
+用法：
+    python docx_pipeline.py <markdown_file> <output_docx> [--images-dir diagram_images]
+                            [--template 模板.docx] [--render] [--print-dpi 300]
+                            [--level strict] [--validation-report report.json]
+                            [--skip-font-check] [--trace trace.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from docx_stream_validator import REQUIRED_SECTIONS, REQUIRED_SUBSECTIONS, validate_docx
+from figure_utils import FIGURE_HEADING_RE, MERMAID_FENCE_RE, iter_mermaid_blocks, read_text
+from image_optimizer import DEFAULT_PRINT_WIDTH
+from mermaid_renderer import (MermaidRenderCache, MmdcRenderer, RenderError, RenderOptions,
+                              image_filenames)
+from trace_events import NULL_TRACER, tracer_for
+
+try:
+    import docx
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx.shared import Inches, Pt
+    from docx.text.paragraph import Paragraph
+except ImportError:  # python-docx 为可选依赖，只有本流水线需要
+    docx = None
+
+DEFAULT_TEMPLATE = os.path.join(
+    "skills", "patent-disclosure-writer", "templates", "发明、实用新型专利申请交底书 模板.docx"
+)
+
+TITLE_FONT = "思源黑体 CN Bold"
+BODY_FONT = "思源黑体 CN Normal"
+TITLE_FONT_SIZE = 18
+BODY_FONT_SIZE = 10
+LINE_SPACING = 1.5
+FIRST_LINE_INDENT_CHARS = 2
+# 字体检查接受的字体族名称（fc-list 输出中文或英文名称）
+FONT_FAMILIES = ("思源黑体 CN", "Source Han Sans CN", "思源黑体 SC", "Source Han Sans SC")
+
+SUBSECTION_TITLES = [("1", "解决的技术问题"), ("2", "技术方案"), ("3", "有益效果")]
+
+# markdown-parser 子代理定义的章节标题格式
+SECTION_RE = re.compile(r"^##\s*\*\*(\d+)\.\s*(.+?)\*\*")
+SUBSECTION_RE = re.compile(r"^###\s*\*\*（(\d+)）(.+?)\*\*")
+TITLE_RE = re.compile(r"^#\s+(.+?)\s*$")
+OTHER_HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*#*$")
+BOLD_LINE_RE = re.compile(r"^\*\*(.+?)\*\*$")
+LIST_MARK_RE = re.compile(r"^(?:[-*+]|>)\s+")
+INLINE_MARK_RE = re.compile(r"\*\*|__|`")
+TABLE_RULE_RE = re.compile(r"^\|?[\s:|-]+\|?$")
+MAX_HEADING_LENGTH = 40
+
+
+class StageError(Exception):
+    """转换步骤执行失败"""
+
+    def __init__(self, stage: str, message: str):
+        super(StageError, self).__init__("{}: {}".format(stage, message))
+        self.stage = stage
+
+
+@contextmanager
+def _stage(name: str, timings: Dict[str, float], tracer, **args):
+    """记录一个步骤的耗时（秒）和追踪事件"""
+    start = time.perf_counter()
+    try:
+        with tracer.span(name, category="stage", **args):
+            yield
+    finally:
+        timings[name] = round(time.perf_counter() - start, 3)
+
+
+# ---------------------------------------------------------------------------
+# 模板与字体（每个进程只加载一次）
+# ---------------------------------------------------------------------------
+
+class DocxTemplate(object):
+    """读入内存的 DOCX 模板，每份交底书从同一份字节创建新的 Document"""
+
+    def __init__(self, path: str):
+        if docx is None:
+            raise StageError("generate", "未安装 python-docx（pip install python-docx）")
+        if not os.path.exists(path):
+            raise StageError("generate", "DOCX 模板不存在：{}".format(path))
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = f.read()
+
+    def new_document(self):
+        return docx.Document(io.BytesIO(self.data))
+
+
+_template_cache = {}  # type: Dict[str, DocxTemplate]
+_font_families = []  # type: List[Optional[frozenset]]
+
+
+def load_template(path: str) -> DocxTemplate:
+    """按路径缓存模板，同一进程内重复调用不会再次读取文件"""
+    key = os.path.abspath(path)
+    if key not in _template_cache:
+        _template_cache[key] = DocxTemplate(key)
+    return _template_cache[key]
+
+
+def installed_font_families() -> Optional[frozenset]:
+    """已安装的字体族名称（通过 fc-list 查询一次并缓存；无法查询时返回 None）"""
+    if not _font_families:
+        families = None
+        try:
+            result = subprocess.run(["fc-list", ":", "family"], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, universal_newlines=True,
+                                    timeout=60)
+            if result.returncode == 0:
+                families = frozenset(name.strip() for line in result.stdout.splitlines()
+                                     for name in line.split(","))
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        _font_families.append(families)
+    return _font_families[0]
+
+
+def check_fonts():
+    """确认思源黑体 CN 已安装；系统没有 fc-list（如 Windows）时跳过检查"""
+    families = installed_font_families()
+    if families is not None and not any(f in families for f in FONT_FAMILIES):
+        raise StageError("generate", "系统未安装思源黑体 CN 字体")
+
+
+# ---------------------------------------------------------------------------
+# parse
+# ---------------------------------------------------------------------------
+
+def parse_markdown(text: str) -> Dict:
+    """
+    解析交底书章节，返回与 parsed_sections.json 相同的结构
+
+    每个章节和子章节额外记录 `figures`：其中的 Mermaid 代码块序号（MermaidBlock.index）。
+    """
+    title = None
+    sections = []  # type: List[Dict]
+    current = None  # type: Optional[Dict]
+    in_fence = False
+    for line_no, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_fence = not in_fence
+        elif not in_fence:
+            section = SECTION_RE.match(stripped)
+            sub = SUBSECTION_RE.match(stripped)
+            if section:
+                current = {"number": section.group(1), "title": section.group(2).strip(),
+                           "level": 2, "start_line": line_no, "lines": [], "figures": []}
+                sections.append(current)
+                continue
+            if sub and current is not None and current["number"] == "4":
+                current.setdefault("subsections", []).append({
+                    "number": "4.{}".format(sub.group(1)), "title": sub.group(2).strip(),
+                    "level": 3, "start_line": line_no, "lines": [], "figures": []})
+                continue
+            heading = TITLE_RE.match(stripped)
+            if heading and title is None and current is None:
+                title = heading.group(1)
+                continue
+        if current is not None:
+            target = current["subsections"][-1] if current.get("subsections") else current
+            target["lines"].append(line)
+
+    for block in iter_mermaid_blocks(text):
+        owner = None
+        for section in sections:
+            for entry in [section] + section.get("subsections", []):
+                if entry["start_line"] < block.start_line:
+                    owner = entry
+        if owner is not None:
+            owner["figures"].append(block.index)
+
+    for section in sections:
+        for entry in [section] + section.get("subsections", []):
+            entry["content"] = "\n".join(entry.pop("lines")).strip()
+            entry.pop("start_line")
+
+    found = {s["number"] for s in sections}
+    section_4 = next((s for s in sections if s["number"] == "4"), None)
+    found_subs = {s["number"].split(".")[1] for s in (section_4 or {}).get("subsections", [])}
+    missing = [n for n, _ in REQUIRED_SECTIONS if n not in found]
+    missing_subs = ["4.{}".format(n) for n in REQUIRED_SUBSECTIONS if n not in found_subs]
+    return {
+        "title": title,
+        "sections": sections,
+        "metadata": {
+            "total_sections": len(sections),
+            "has_subsections": bool(found_subs),
+            "parsing_timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        },
+        "validation": {
+            "is_complete": not missing and not missing_subs,
+            "missing_sections": missing,
+            "missing_subsections": missing_subs,
+            "all_sections_found": len(REQUIRED_SECTIONS) - len(missing),
+            "expected_sections": len(REQUIRED_SECTIONS),
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# generate
+# ---------------------------------------------------------------------------
+
+def _set_run_font(run, font: str, size: int, bold: bool):
+    run.font.name = font
+    run.font.size = Pt(size)
+    run.font.bold = bold
+    # 中文字符使用 eastAsia 字体，必须与 font.name 同时设置
+    run._element.get_or_add_rPr().get_or_add_rFonts().set(qn("w:eastAsia"), font)
+
+
+def _format_paragraph(paragraph, align, indent: bool):
+    fmt = paragraph.paragraph_format
+    fmt.line_spacing = LINE_SPACING
+    fmt.alignment = align
+    fmt.first_line_indent = Pt(FIRST_LINE_INDENT_CHARS * BODY_FONT_SIZE) if indent else Pt(0)
+    ind = paragraph._p.get_or_add_pPr().find(qn("w:ind"))
+    if ind is not None:
+        # Word 按字符数显示首行缩进（firstLineChars 优先于 firstLine）
+        ind.set(qn("w:firstLineChars"), str(FIRST_LINE_INDENT_CHARS * 100 if indent else 0))
+
+
+def _set_heading(paragraph, text: str, font: str, size: int):
+    """模板中的标题段落：去掉自动编号，改为显式的「N、标题」文字"""
+    ppr = paragraph._p.get_or_add_pPr()
+    num_pr = ppr.find(qn("w:numPr"))
+    if num_pr is not None:
+        ppr.remove(num_pr)
+    for run in list(paragraph.runs):
+        run._element.getparent().remove(run._element)
+    _set_run_font(paragraph.add_run(text), font, size, True)
+
+
+def _content_items(content: str):
+    """把章节内容拆分为 (类型, 文本) 段落：body、heading、caption、figure"""
+    in_code = False
+    for line in content.splitlines():
+        stripped = line.strip()
+        if MERMAID_FENCE_RE.match(line) and not in_code:
+            in_code = "mermaid"
+            yield "figure", ""
+            continue
+        if stripped.startswith("```"):
+            in_code = False if in_code else "code"
+            continue
+        if in_code == "mermaid" or not stripped or TABLE_RULE_RE.match(stripped):
+            continue
+        if in_code:
+            yield "body", stripped
+            continue
+        figure = FIGURE_HEADING_RE.match(stripped)
+        if figure:
+            yield "caption", "附图{}：{}".format(figure.group(1), figure.group(2))
+            continue
+        heading = OTHER_HEADING_RE.match(stripped) or BOLD_LINE_RE.match(stripped)
+        if heading:
+            yield "heading", INLINE_MARK_RE.sub("", heading.group(1)).strip()
+            continue
+        if stripped.startswith("|"):
+            stripped = "　".join(cell.strip() for cell in stripped.strip("|").split("|"))
+        yield "body", INLINE_MARK_RE.sub("", LIST_MARK_RE.sub("", stripped))
+
+
+def _find_headings(document) -> List[Tuple[str, str, object]]:
+    """按模板顺序定位7个章节和第4章节3个子项的标题段落，返回 (编号, 标题文字, 段落)"""
+    targets = []
+    for number, title in REQUIRED_SECTIONS:
+        targets.append((number, "{}、{}".format(number, title), title))
+        if number == "4":
+            targets.extend(("4." + n, "（{}）{}".format(n, t), t) for n, t in SUBSECTION_TITLES)
+    paragraphs = document.paragraphs
+    found = []
+    position = 0
+    for number, text, title in targets:
+        for i in range(position, len(paragraphs)):
+            candidate = paragraphs[i].text.strip()
+            if title in candidate and len(candidate) <= MAX_HEADING_LENGTH:
+                found.append((number, text, paragraphs[i]))
+                position = i + 1
+                break
+        else:
+            raise StageError("generate", "模板缺少章节标题：{}".format(text))
+    return found
+
+
+def _insert_after(anchor, kind: str, text: str):
+    p = OxmlElement("w:p")
+    anchor._p.addnext(p)
+    paragraph = Paragraph(p, anchor._parent)
+    if kind == "body":
+        _format_paragraph(paragraph, WD_ALIGN_PARAGRAPH.JUSTIFY, True)
+        _set_run_font(paragraph.add_run(text), BODY_FONT, BODY_FONT_SIZE, False)
+    elif kind == "heading":
+        _format_paragraph(paragraph, WD_ALIGN_PARAGRAPH.LEFT, False)
+        _set_run_font(paragraph.add_run(text), TITLE_FONT, BODY_FONT_SIZE, True)
+    else:
+        _format_paragraph(paragraph, WD_ALIGN_PARAGRAPH.CENTER, False)
+        if text:
+            _set_run_font(paragraph.add_run(text), TITLE_FONT, BODY_FONT_SIZE, True)
+    return paragraph
+
+
+def generate_document(parsed: Dict, template: DocxTemplate):
+    """
+    从模板创建文档并填充章节内容，返回 (document, anchors)
+
+    模板中除文档标题和章节标题外的段落（字体要求说明、占位空段落）全部删除；
+    anchors 为 [(代码块序号, 空的图片段落)]，由 insert_figures 插入图片。
+    """
+    document = template.new_document()
+    headings = _find_headings(document)
+    keep = {id(p._p) for _, _, p in headings}
+    title = document.paragraphs[0]
+    keep.add(id(title._p))
+    for paragraph in document.paragraphs:
+        ppr = paragraph._p.pPr
+        if id(paragraph._p) in keep or (ppr is not None and ppr.find(qn("w:sectPr")) is not None):
+            continue
+        paragraph._p.getparent().remove(paragraph._p)
+
+    _set_heading(title, title.text.strip(), TITLE_FONT, TITLE_FONT_SIZE)
+    entries = {}
+    for section in parsed["sections"]:
+        entries[section["number"]] = section
+        for sub in section.get("subsections", []):
+            entries[sub["number"]] = sub
+
+    anchors = []  # type: List[Tuple[int, object]]
+    for number, text, paragraph in headings:
+        _set_heading(paragraph, text, TITLE_FONT, TITLE_FONT_SIZE)
+        entry = entries.get(number)
+        if entry is None:
+            continue
+        figures = list(entry["figures"])
+        anchor = paragraph
+        for kind, item in _content_items(entry["content"]):
+            anchor = _insert_after(anchor, kind, item)
+            if kind == "figure" and figures:
+                anchors.append((figures.pop(0), anchor))
+    return document, anchors
+
+
+# ---------------------------------------------------------------------------
+# insert / validate
+# ---------------------------------------------------------------------------
+
+def insert_figures(anchors, blocks, images_dir: str, tracer=NULL_TRACER) -> List[Dict]:
+    """
+    把 `diagram_images/` 中已渲染的图片插入到图片段落（不调用 mmdc）
+
+    图片宽度超过打印宽度时按比例缩小到打印宽度；缺少图片时整个步骤失败。
+    """
+    names = {block.index: name for block, name in zip(blocks, image_filenames(blocks))}
+    by_index = {block.index: block for block in blocks}
+    missing = [os.path.join(images_dir, names[index]) for index, _ in anchors
+               if not os.path.exists(os.path.join(images_dir, names[index]))]
+    if missing:
+        raise StageError("insert", "附图图片不存在（请先渲染附图）：{}".format("、".join(missing)))
+
+    max_width = Inches(DEFAULT_PRINT_WIDTH)
+    inserted = []
+    for index, paragraph in anchors:
+        block = by_index[index]
+        path = os.path.join(images_dir, names[index])
+        with tracer.span("insert_image", category="image", figure=block.figure_number):
+            shape = paragraph.add_run().add_picture(path)
+            if shape.width > max_width:
+                shape.height = int(shape.height * max_width / shape.width)
+                shape.width = max_width
+        inserted.append({
+            "diagram_number": "图{}".format(block.figure_number)
+            if block.figure_number is not None else None,
+            "diagram_name": block.figure_title,
+            "image_path": path,
+            "status": "success",
+        })
+    return inserted
+
+
+def validate_document(document, level: str = "standard", tracer=NULL_TRACER) -> Tuple[bytes, Dict]:
+    """在内存中保存文档并验证，返回 (DOCX 字节, 验证报告)"""
+    buffer = io.BytesIO()
+    with tracer.span("serialize"):
+        document.save(buffer)
+    data = buffer.getvalue()
+    return data, validate_docx(data, level=level, tracer=tracer)
+
+
+# ---------------------------------------------------------------------------
+# 完整流水线
+# ---------------------------------------------------------------------------
+
+def convert_markdown(markdown_path: str, docx_path: str, template: DocxTemplate,
+                     images_dir: str, renderer=None, render_options=None, render_workers=1,
+                     level: str = "standard", tracer=NULL_TRACER,
+                     timings: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    在一个进程内完成交底书转换，DOCX 只写入一次，返回包含各步骤耗时的报告
+
+    renderer 为空时使用 images_dir 中已有的附图图片；否则先用渲染缓存补齐图片。
+    传入 timings 时各步骤耗时同时写入该字典，转换失败时保留已完成步骤的耗时。
+    """
+    timings = {} if timings is None else timings  # type: Dict[str, float]
+    report = {
+        "markdown_file": markdown_path,
+        "docx_file": docx_path,
+        "stage_seconds": timings,
+    }
+
+    with _stage("parse", timings, tracer):
+        text = read_text(markdown_path)
+        parsed = parse_markdown(text)
+        blocks = list(iter_mermaid_blocks(text))
+    report["title"] = parsed["title"]
+    report["parse_validation"] = parsed["validation"]
+    report["diagrams"] = len(blocks)
+
+    if blocks and renderer is not None:
+        os.makedirs(images_dir, exist_ok=True)
+        cache = MermaidRenderCache(images_dir, renderer=renderer, options=render_options,
+                                   workers=render_workers, tracer=tracer)
+        with _stage("render", timings, tracer, figures=len(blocks)):
+            render_report = cache.render_blocks(blocks)
+        report["cache_hits"] = render_report["cache_hits"]
+        report["cache_misses"] = render_report["cache_misses"]
+        if render_report["failed"]:
+            raise StageError("render", "{} 幅附图渲染失败".format(render_report["failed"]))
+
+    with _stage("generate", timings, tracer):
+        document, anchors = generate_document(parsed, template)
+    with _stage("insert", timings, tracer, figures=len(anchors)):
+        report["insertions"] = insert_figures(anchors, blocks, images_dir, tracer=tracer)
+    with _stage("validate", timings, tracer):
+        data, validation = validate_document(document, level=level, tracer=tracer)
+    with _stage("save", timings, tracer, bytes=len(data)):
+        with open(docx_path, "wb") as f:
+            f.write(data)
+    report["docx_bytes"] = len(data)
+    report["validation"] = validation
+    return report
+
+
+def print_report(report: Dict):
+    """打印转换结果和各步骤耗时"""
+    validation = report["validation"]
+    print("=== DOCX 转换完成 ===")
+    print("📄 输出文件: {}".format(report["docx_file"]))
+    print("🖼️  插入附图: {}".format(len(report["insertions"])))
+    if "cache_hits" in report:
+        print("♻️  缓存命中: {}，🎨 重新渲染: {}".format(report["cache_hits"],
+                                                   report["cache_misses"]))
+    print("{} 验证评分: {}".format("✅" if validation["validation_passed"] else "❌",
+                                 validation["overall_score"]))
+    for issue in validation["critical_issues"]:
+        print("  ❌ {}".format(issue))
+    print()
+    print("| 步骤 | 耗时(秒) |")
+    print("|------|---------|")
+    for stage, seconds in report["stage_seconds"].items():
+        print("| {} | {:.3f} |".format(stage, seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在一个进程内将专利交底书 Markdown 转换为 DOCX")
+    parser.add_argument("markdown_file", help="交底书 Markdown 文件")
+    parser.add_argument("output_docx", help="输出 DOCX 路径")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="DOCX 模板路径")
+    parser.add_argument("--images-dir",
+                        help="附图图片目录（默认为输出目录下的 diagram_images）")
+    parser.add_argument("--render", action="store_true",
+                        help="转换前用 mermaid_renderer 渲染附图（默认只使用已有图片）")
+    parser.add_argument("--print-dpi", type=int, help="按打印分辨率渲染附图（配合 --render）")
+    parser.add_argument("--render-workers", type=int, default=1, help="并行渲染进程数")
+    parser.add_argument("--mmdc", default="mmdc", help="mermaid-cli 可执行文件")
+    parser.add_argument("--level", default="standard", choices=["standard", "strict"],
+                        help="验证级别")
+    parser.add_argument("--validation-report", help="验证报告 JSON 输出路径")
+    parser.add_argument("--skip-font-check", action="store_true", help="跳过字体检查")
+    parser.add_argument("--trace", help="输出 Chrome Trace 格式的阶段耗时（JSON）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.markdown_file):
+        print("❌ 错误：Markdown 文件不存在")
+        print("📄 路径: {}".format(args.markdown_file))
+        sys.exit(1)
+
+    images_dir = args.images_dir or os.path.join(
+        os.path.dirname(os.path.abspath(args.output_docx)), "diagram_images")
+    renderer = MmdcRenderer(mmdc=args.mmdc) if args.render else None
+    options = RenderOptions.for_print(args.print_dpi) if args.print_dpi else None
+    tracer = tracer_for(args.trace, "docx_pipeline")
+    try:
+        if not args.skip_font_check:
+            check_fonts()
+        template = load_template(args.template)
+        report = convert_markdown(args.markdown_file, args.output_docx, template, images_dir,
+                                  renderer=renderer, render_options=options,
+                                  render_workers=args.render_workers, level=args.level,
+                                  tracer=tracer)
+    except (StageError, RenderError, OSError) as e:
+        print("❌ 错误：DOCX 转换失败")
+        print("📄 文件: {}".format(args.markdown_file))
+        print("🔍 原因: {}".format(e))
+        sys.exit(1)
+    finally:
+        if args.trace:
+            tracer.write(args.trace)
+
+    print_report(report)
+    if args.validation_report:
+        with open(args.validation_report, "w", encoding="utf-8") as f:
+            json.dump(report["validation"], f, ensure_ascii=False, indent=2)
+        print()
+        print("📄 验证报告: {}".format(args.validation_report))
+
+
+if __name__ == "__main__":
+    main()
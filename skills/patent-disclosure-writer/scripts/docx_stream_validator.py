@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DOCX 流式验证引擎
+
+按 docx-validator 子代理定义的6个类别验证交底书 DOCX：
+章节完整性、字体应用、段落格式、样式一致性、页面设置、内容质量。
+
+- 只读取 `word/styles.xml` 和 `word/document.xml`，图片等媒体部件不会被加载
+- `document.xml` 以流式方式解析，单次遍历同时为6个检查类别收集数据；
+  处理完的正文元素立即从树中移除，内存占用与文档长度无关
+- 样式继承链（docDefaults → 段落样式 → 字符样式 → 直接格式）每个样式只解析一次
+- 不依赖 python-docx，可作为库在内存中验证尚未保存到磁盘的文档
+
+段落范围、段落文本和首个文字块的取法与 python-docx 相同（`doc.paragraphs`、
+`paragraph.text`、`paragraph.runs[0]`），与 docx_validator.py 的差异见
+docx-validator 子代理说明中的「流式验证引擎与 docx_validator.py 的差异」。
+
+验证级别：
+- standard：正文段落中 ≥90% 的行距和对齐方式符合要求即通过，首行缩进只在报告中说明
+- strict：每个正文段落的行距、对齐方式和首行缩进都必须符合要求
+
+命令行用法（与 docx_validator.py 一致）：
+    python docx_stream_validator.py <docx_path> [output_json_path] [--level strict] [--trace trace.json]
+
+库用法：
+    from docx_stream_validator import validate_docx
+    report = validate_docx(buffer, level="strict")   # 路径、bytes 或文件对象
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import zipfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from xml.etree import ElementTree as ET
+
+from trace_events import NULL_TRACER, tracer_for
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W = "{%s}" % W_NS
+
+EXPECTED_FONT = "思源黑体 CN"
+TITLE_FONT_SIZE = 18
+BODY_FONT_SIZE = 10
+LINE_SPACING = 1.5
+LINE_SPACING_TOLERANCE = 0.1
+FIRST_LINE_INDENT_CHARS = 2
+A4_WIDTH_CM = 21.0
+A4_HEIGHT_CM = 29.7
+PAGE_TOLERANCE_CM = 0.5
+MAX_EMPTY_PARAGRAPHS = 5
+MIN_SECTION_LENGTH = 20
+PASS_SCORE = 80
+
+# 段落格式中必须符合要求的正文段落比例（按验证级别）
+FORMAT_RATIO = {"standard": 0.9, "strict": 1.0}
+
+REQUIRED_SECTIONS = [
+    ("1", "发明创造名称"),
+    ("2", "所属技术领域"),
+    ("3", "相关的背景技术"),
+    ("4", "发明内容"),
+    ("5", "具体实施方式"),
+    ("6", "关键点和欲保护点"),
+    ("7", "其他有助于理解本技术的资料"),
+]
+REQUIRED_SUBSECTIONS = ["1", "2", "3"]
+
+WEIGHTS = {
+    "section_completeness": 30,
+    "font_application": 25,
+    "paragraph_formatting": 20,
+    "style_consistency": 10,
+    "page_setup": 5,
+    "content_quality": 10,
+}
+
+SECTION_RE = re.compile(r"^\s*([1-7])\s*[\.．、]\s*(\S.*)$")
+SUBSECTION_RE = re.compile(r"^\s*[（(]\s*([1-9])\s*[）)]")
+MAX_HEADING_LENGTH = 40
+
+
+class DocxValidationError(Exception):
+    """DOCX 文件无法读取或结构不完整"""
+
+
+def _on(elem) -> bool:
+    """布尔型属性（如 <w:b/>、<w:b w:val="0"/>）"""
+    val = elem.get(W + "val")
+    return val is None or val not in ("0", "false", "off")
+
+
+class StyleResolver(object):
+    """
+    解析 styles.xml 并缓存每个样式沿 basedOn 链合并后的属性
+
+    段落属性：line_spacing、line_rule、first_line、first_line_chars、jc
+    字符属性：font_ascii、font_east_asia、size_pt、bold
+    """
+
+    def __init__(self, styles_xml: Optional[bytes]):
+        self._styles = {}  # type: Dict[str, Dict]
+        self._resolved = {}  # type: Dict[str, Dict]
+        self.defaults = {"ppr": {}, "rpr": {}}  # type: Dict[str, Dict]
+        self.default_paragraph_style = None  # type: Optional[str]
+        if styles_xml:
+            self._parse(ET.fromstring(styles_xml))
+
+    def _parse(self, root):
+        doc_defaults = root.find(W + "docDefaults")
+        if doc_defaults is not None:
+            ppr = doc_defaults.find("{0}pPrDefault/{0}pPr".format(W))
+            rpr = doc_defaults.find("{0}rPrDefault/{0}rPr".format(W))
+            self.defaults = {"ppr": parse_ppr(ppr), "rpr": parse_rpr(rpr)}
+
+        for style in root.iter(W + "style"):
+            style_id = style.get(W + "styleId")
+            if not style_id:
+                continue
+            based_on = style.find(W + "basedOn")
+            self._styles[style_id] = {
+                "type": style.get(W + "type"),
+                "based_on": based_on.get(W + "val") if based_on is not None else None,
+                "ppr": parse_ppr(style.find(W + "pPr")),
+                "rpr": parse_rpr(style.find(W + "rPr")),
+            }
+            if style.get(W + "type") == "paragraph" and _on_default(style):
+                self.default_paragraph_style = style_id
+
+    def resolve(self, style_id: Optional[str]) -> Dict:
+        """返回样式合并继承链后的 {"ppr": ..., "rpr": ...}"""
+        if not style_id or style_id not in self._styles:
+            return {"ppr": {}, "rpr": {}}
+        cached = self._resolved.get(style_id)
+        if cached is not None:
+            return cached
+
+        chain = []
+        seen = set()
+        current = style_id
+        while current and current in self._styles and current not in seen:
+            seen.add(current)
+            chain.append(self._styles[current])
+            current = self._styles[current]["based_on"]
+
+        merged = {"ppr": {}, "rpr": {}}  # type: Dict[str, Dict]
+        for style in reversed(chain):
+            merged["ppr"].update(style["ppr"])
+            merged["rpr"].update(style["rpr"])
+        self._resolved[style_id] = merged
+        return merged
+
+    def paragraph_props(self, p_style: Optional[str], direct: Dict) -> Dict:
+        props = dict(self.defaults["ppr"])
+        props.update(self.resolve(p_style or self.default_paragraph_style)["ppr"])
+        props.update(direct)
+        return props
+
+    def run_props(self, p_style: Optional[str], r_style: Optional[str], direct: Dict) -> Dict:
+        props = dict(self.defaults["rpr"])
+        props.update(self.resolve(p_style or self.default_paragraph_style)["rpr"])
+        props.update(self.resolve(r_style)["rpr"])
+        props.update(direct)
+        return props
+
+
+def _on_default(style) -> bool:
+    val = style.get(W + "default")
+    return val in ("1", "true", "on")
+
+
+def parse_ppr(ppr) -> Dict:
+    """提取段落属性中与验证相关的部分"""
+    props = {}  # type: Dict
+    if ppr is None:
+        return props
+    spacing = ppr.find(W + "spacing")
+    if spacing is not None and spacing.get(W + "line") is not None:
+        props["line"] = int(spacing.get(W + "line"))
+        props["line_rule"] = spacing.get(W + "lineRule", "auto")
+    ind = ppr.find(W + "ind")
+    if ind is not None:
+        if ind.get(W + "firstLineChars") is not None:
+            props["first_line_chars"] = int(ind.get(W + "firstLineChars"))
+        if ind.get(W + "firstLine") is not None:
+            props["first_line"] = int(ind.get(W + "firstLine"))
+    jc = ppr.find(W + "jc")
+    if jc is not None:
+        props["jc"] = jc.get(W + "val")
+    return props
+
+
+def parse_rpr(rpr) -> Dict:
+    """提取字符属性中与验证相关的部分"""
+    props = {}  # type: Dict
+    if rpr is None:
+        return props
+    fonts = rpr.find(W + "rFonts")
+    if fonts is not None:
+        if fonts.get(W + "ascii"):
+            props["font_ascii"] = fonts.get(W + "ascii")
+        if fonts.get(W + "eastAsia"):
+            props["font_east_asia"] = fonts.get(W + "eastAsia")
+    size = rpr.find(W + "sz")
+    if size is not None and size.get(W + "val"):
+        props["size_pt"] = int(size.get(W + "val")) / 2.0
+    bold = rpr.find(W + "b")
+    if bold is not None:
+        props["bold"] = _on(bold)
+    return props
+
+
+class ParagraphInfo(object):
+    """单次遍历中每个段落保留的最小信息（不保留 XML 元素）"""
+
+    __slots__ = ("text", "font_name", "font_size", "bold", "has_runs",
+                 "has_drawing", "line_spacing", "first_line_chars", "jc")
+
+    def __init__(self):
+        self.text = ""
+        self.font_name = None  # type: Optional[str]
+        self.font_size = None  # type: Optional[float]
+        self.bold = False
+        self.has_runs = False
+        self.has_drawing = False
+        self.line_spacing = None  # type: Optional[float]
+        self.first_line_chars = None  # type: Optional[float]
+        self.jc = None  # type: Optional[str]
+
+
+def _run_text(run) -> str:
+    """文字块文本（与 python-docx 的 Run.text 相同）"""
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == W + "t":
+            parts.append(child.text or "")
+        elif tag in (W + "tab", W + "ptab"):
+            parts.append("\t")
+        elif tag == W + "br":
+            if child.get(W + "type", "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag == W + "cr":
+            parts.append("\n")
+        elif tag == W + "noBreakHyphen":
+            parts.append("-")
+    return "".join(parts)
+
+
+def _read_paragraph(p, styles: StyleResolver) -> ParagraphInfo:
+    info = ParagraphInfo()
+    ppr = p.find(W + "pPr")
+    p_style = None
+    direct_ppr = {}  # type: Dict
+    if ppr is not None:
+        style = ppr.find(W + "pStyle")
+        p_style = style.get(W + "val") if style is not None else None
+        direct_ppr = parse_ppr(ppr)
+    props = styles.paragraph_props(p_style, direct_ppr)
+
+    if "line" in props and props.get("line_rule", "auto") == "auto":
+        info.line_spacing = props["line"] / 240.0
+    if "first_line_chars" in props:
+        info.first_line_chars = props["first_line_chars"] / 100.0
+    info.jc = props.get("jc")
+
+    # 段落文本只包含直接子级文字块和超链接（文本框内的段落不计入）
+    texts = []
+    runs = []
+    for child in p:
+        if child.tag == W + "r":
+            runs.append(child)
+            texts.append(_run_text(child))
+        elif child.tag == W + "hyperlink":
+            texts.extend(_run_text(run) for run in child.findall(W + "r"))
+    info.text = "".join(texts)
+    info.has_drawing = any(
+        run.find(".//" + W + "drawing") is not None or run.find(".//" + W + "pict") is not None
+        for run in runs
+    )
+
+    # 字体取自第一个文字块（即使该文字块没有文字）
+    if runs:
+        rpr = runs[0].find(W + "rPr")
+        r_style = None
+        direct_rpr = {}  # type: Dict
+        if rpr is not None:
+            style = rpr.find(W + "rStyle")
+            r_style = style.get(W + "val") if style is not None else None
+            direct_rpr = parse_rpr(rpr)
+        run_props = styles.run_props(p_style, r_style, direct_rpr)
+        info.font_name = run_props.get("font_ascii") or run_props.get("font_east_asia")
+        info.font_size = run_props.get("size_pt")
+        info.bold = bool(run_props.get("bold", False))
+        info.has_runs = True
+
+    if info.first_line_chars is None and "first_line" in props:
+        # 首行缩进以 twip 表示时，按首个文字块的字号换算成字符数
+        size = info.font_size or BODY_FONT_SIZE
+        info.first_line_chars = props["first_line"] / 20.0 / size
+    return info
+
+
+class _Collector(object):
+    """单次遍历中为6个检查类别累计数据"""
+
+    def __init__(self):
+        self.sections = {}  # type: Dict[str, Dict]
+        self.subsections = set()
+        self.current_section = None  # type: Optional[str]
+        self.section_lengths = {}  # type: Dict[str, int]
+        self.title_para = None  # type: Optional[ParagraphInfo]
+        self.body_para = None  # type: Optional[ParagraphInfo]
+        self.title_fonts = set()
+        self.body_fonts = set()
+        self.body_count = 0
+        self.spacing_values = []  # type: List[float]
+        self.spacing_ok = 0
+        self.indent_ok = 0
+        self.justify_ok = 0
+        self.empty_paragraphs = 0
+        self.image_paragraphs = 0
+        self.page = None  # type: Optional[Dict]
+
+    def feed(self, info: ParagraphInfo):
+        text = info.text.strip()
+        # 字体按每个有文字块的段落统计，包括空段落和图片段落
+        self._collect_fonts(info)
+
+        if not text:
+            # 只含图片的段落是附图，不计为空段落
+            if info.has_drawing:
+                self.image_paragraphs += 1
+            else:
+                self.empty_paragraphs += 1
+            return
+
+        heading = SECTION_RE.match(text)
+        if heading and len(text) <= MAX_HEADING_LENGTH:
+            number = heading.group(1)
+            expected = dict(REQUIRED_SECTIONS)[number]
+            if expected in heading.group(2) or info.bold:
+                self.sections.setdefault(number, {"title": heading.group(2).strip()})
+                self.current_section = number
+                self.section_lengths.setdefault(number, 0)
+                return
+        sub = SUBSECTION_RE.match(text)
+        if sub and self.current_section == "4" and len(text) <= MAX_HEADING_LENGTH:
+            self.subsections.add(sub.group(1))
+
+        if self.current_section is not None:
+            self.section_lengths[self.current_section] += len(text)
+
+        if info.bold:
+            return
+
+        # 正文段落：段落格式统计
+        self.body_count += 1
+        if info.line_spacing is not None:
+            self.spacing_values.append(info.line_spacing)
+            if abs(info.line_spacing - LINE_SPACING) <= LINE_SPACING_TOLERANCE:
+                self.spacing_ok += 1
+        if info.first_line_chars is not None and \
+                abs(info.first_line_chars - FIRST_LINE_INDENT_CHARS) <= 0.5:
+            self.indent_ok += 1
+        if info.jc in ("both", "distribute"):
+            self.justify_ok += 1
+
+    def _collect_fonts(self, info: ParagraphInfo):
+        if not info.has_runs:
+            return
+        if info.bold:
+            self.title_fonts.add(info.font_name)
+            if self.title_para is None:
+                self.title_para = info
+        else:
+            self.body_fonts.add(info.font_name)
+            if self.body_para is None:
+                self.body_para = info
+
+    def feed_section_properties(self, sect_pr):
+        """记录第一节的节属性（与 python-docx 的 doc.sections[0] 相同）"""
+        if self.page is not None:
+            return
+        page = {}
+        size = sect_pr.find(W + "pgSz")
+        if size is not None:
+            page["width_cm"] = _twips_to_cm(size.get(W + "w"))
+            page["height_cm"] = _twips_to_cm(size.get(W + "h"))
+        margins = sect_pr.find(W + "pgMar")
+        if margins is not None:
+            for side in ("top", "bottom", "left", "right"):
+                page[side] = _twips_to_cm(margins.get(W + side))
+        self.page = page
+
+
+def _twips_to_cm(value) -> Optional[float]:
+    if value is None:
+        return None
+    return round(int(value) / 1440.0 * 2.54, 2)
+
+
+def _font_check(info: Optional[ParagraphInfo], expected_size: int, label: str,
+                issues: List[str]) -> Dict:
+    if info is None:
+        issues.append("未找到{}段落".format(label))
+        return {"passed": False, "font_name": None, "font_size_pt": None, "is_bold": None}
+    passed = True
+    if not info.font_name or EXPECTED_FONT not in info.font_name:
+        issues.append("{}未使用{}".format(label, EXPECTED_FONT))
+        passed = False
+    if info.font_size is None or abs(info.font_size - expected_size) > 1:
+        issues.append("{}字号应为{}pt".format(label, expected_size))
+        passed = False
+    size = info.font_size
+    return {
+        "passed": passed,
+        "font_name": info.font_name,
+        "font_size_pt": int(size) if size is not None and size == int(size) else size,
+        "is_bold": info.bold,
+    }
+
+
+def _build_report(c: _Collector, level: str) -> Dict:
+    checks = {}
+    critical = []  # type: List[str]
+    recommendations = []  # type: List[str]
+
+    # 1. 章节完整性
+    missing = [n for n, _ in REQUIRED_SECTIONS if n not in c.sections]
+    missing_subs = [n for n in REQUIRED_SUBSECTIONS if n not in c.subsections]
+    section_ok = not missing and not missing_subs
+    checks["section_completeness"] = {
+        "passed": section_ok,
+        "details": {
+            "expected_sections": len(REQUIRED_SECTIONS),
+            "found_sections": len(REQUIRED_SECTIONS) - len(missing),
+            "missing_sections": missing,
+            "sections": [
+                {"number": n, "title": title, "found": n in c.sections}
+                for n, title in REQUIRED_SECTIONS
+            ],
+            "section_4_subsections": {
+                "expected": len(REQUIRED_SUBSECTIONS),
+                "found": len(REQUIRED_SUBSECTIONS) - len(missing_subs),
+                "complete": not missing_subs,
+            },
+        },
+    }
+    if missing:
+        critical.append("缺少章节：{}".format("、".join(missing)))
+    if missing_subs:
+        critical.append("第4章节缺少子项：{}".format("、".join(
+            "（{}）".format(n) for n in missing_subs)))
+
+    # 2. 字体应用
+    font_issues = []  # type: List[str]
+    title_check = _font_check(c.title_para, TITLE_FONT_SIZE, "标题", font_issues)
+    body_check = _font_check(c.body_para, BODY_FONT_SIZE, "正文", font_issues)
+    font_ok = title_check["passed"] and body_check["passed"]
+    checks["font_application"] = {
+        "passed": font_ok,
+        "details": {
+            "expected_font": EXPECTED_FONT,
+            "title_font_check": title_check,
+            "body_font_check": body_check,
+            "font_issues": font_issues,
+        },
+    }
+    if not font_ok:
+        critical.extend(font_issues)
+        recommendations.append("标题使用思源黑体 CN Bold 18pt，正文使用思源黑体 CN Normal 10pt")
+
+    # 3. 段落格式
+    total = c.body_count
+    required_ratio = FORMAT_RATIO[level]
+
+    def ratio_ok(count):
+        return total == 0 or count >= total * required_ratio
+
+    spacing_ok = bool(c.spacing_values) and ratio_ok(c.spacing_ok)
+    indent_ok = ratio_ok(c.indent_ok)
+    justify_ok = ratio_ok(c.justify_ok)
+    if c.spacing_values:
+        actual_range = "{:.1f}-{:.1f}".format(min(c.spacing_values), max(c.spacing_values))
+    else:
+        actual_range = None
+    format_ok = spacing_ok and justify_ok and (indent_ok or level != "strict")
+    checks["paragraph_formatting"] = {
+        "passed": format_ok,
+        "details": {
+            "line_spacing_check": {
+                "expected": LINE_SPACING,
+                "actual_range": actual_range,
+                "passed": spacing_ok,
+            },
+            "first_line_indent_check": {
+                "expected_chars": FIRST_LINE_INDENT_CHARS,
+                "passed": indent_ok,
+                "scored": level == "strict",
+            },
+            "alignment_check": {
+                "expected": "justify",
+                "passed": justify_ok,
+            },
+        },
+    }
+    if not spacing_ok:
+        recommendations.append("正文行距应设置为1.5倍")
+    if not indent_ok:
+        recommendations.append("正文首行缩进应设置为2字符")
+    if not justify_ok:
+        recommendations.append("正文段落应两端对齐")
+
+    # 4. 样式一致性（允许最多2种字体：Bold 和 Normal）
+    inconsistencies = []
+    title_consistent = len(c.title_fonts) <= 2
+    body_consistent = len(c.body_fonts) <= 2
+    if not title_consistent:
+        inconsistencies.append("标题使用了多种字体：{}".format(
+            "、".join(sorted(str(f) for f in c.title_fonts))))
+    if not body_consistent:
+        inconsistencies.append("正文使用了多种字体：{}".format(
+            "、".join(sorted(str(f) for f in c.body_fonts))))
+    checks["style_consistency"] = {
+        "passed": title_consistent and body_consistent,
+        "details": {
+            "title_style_consistent": title_consistent,
+            "body_style_consistent": body_consistent,
+            "inconsistencies": inconsistencies,
+        },
+    }
+    if inconsistencies:
+        recommendations.append("统一同级标题和正文的字体")
+
+    # 5. 页面设置
+    page = c.page or {}
+    width = page.get("width_cm")
+    height = page.get("height_cm")
+    is_a4 = width is not None and height is not None and \
+        abs(width - A4_WIDTH_CM) < PAGE_TOLERANCE_CM and \
+        abs(height - A4_HEIGHT_CM) < PAGE_TOLERANCE_CM
+    checks["page_setup"] = {
+        "passed": is_a4,
+        "details": {
+            "margins": {
+                side: "{}cm".format(page[side]) if page.get(side) is not None else None
+                for side in ("top", "bottom", "left", "right")
+            },
+            "paper_size": "A4" if is_a4 else (
+                "{}cm × {}cm".format(width, height) if width is not None else None),
+        },
+    }
+    if not is_a4:
+        recommendations.append("纸张大小应设置为 A4（21.0cm × 29.7cm）")
+
+    # 6. 内容质量
+    warnings = []
+    short_sections = [
+        dict(REQUIRED_SECTIONS)[n] for n in sorted(c.section_lengths)
+        if c.section_lengths[n] < MIN_SECTION_LENGTH
+    ]
+    for title in short_sections:
+        warnings.append("章节'{}'内容过短".format(title))
+    if c.empty_paragraphs > MAX_EMPTY_PARAGRAPHS:
+        warnings.append("空段落过多（{}个）".format(c.empty_paragraphs))
+    checks["content_quality"] = {
+        "passed": not warnings,
+        "details": {
+            "empty_paragraphs": c.empty_paragraphs,
+            "image_paragraphs": c.image_paragraphs,
+            "very_short_sections": short_sections,
+            "warnings": warnings,
+        },
+    }
+    if warnings:
+        recommendations.append("删除多余空段落并补充过短章节的内容")
+
+    score = sum(WEIGHTS[name] for name, check in checks.items() if check["passed"])
+    return {
+        "validation_passed": score >= PASS_SCORE and not critical,
+        "validation_level": level,
+        "validation_timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "overall_score": score,
+        "critical_issues": critical,
+        "checks": checks,
+        "recommendations": recommendations,
+    }
+
+
+def validate_docx(docx, level: str = "standard", tracer=NULL_TRACER) -> Dict:
+    """
+    验证 DOCX 并返回与 validation_report.json 相同结构的报告
+
+    docx 可以是文件路径、bytes 或可 seek 的二进制文件对象。
+    """
+    if level not in FORMAT_RATIO:
+        raise ValueError("未知的验证级别：{}".format(level))
+    if isinstance(docx, (bytes, bytearray)):
+        docx = io.BytesIO(docx)
+    try:
+        with tracer.span("open_package"):
+            archive = zipfile.ZipFile(docx)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise DocxValidationError("无法打开 DOCX 文件：{}".format(e))
+
+    with archive:
+        names = set(archive.namelist())
+        if "word/document.xml" not in names:
+            raise DocxValidationError("DOCX 缺少 word/document.xml")
+        with tracer.span("load_styles"):
+            styles = StyleResolver(
+                archive.read("word/styles.xml") if "word/styles.xml" in names else None
+            )
+
+        collector = _Collector()
+        body = None
+        ancestors = []  # type: List[str]
+        # 6个检查类别的数据在这一次遍历中同时收集
+        with tracer.span("stream_document"), archive.open("word/document.xml") as stream:
+            for event, elem in ET.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == W + "body":
+                        body = elem
+                    ancestors.append(elem.tag)
+                    continue
+                ancestors.pop()
+                # 节属性位于 body 末尾或正文段落的 pPr 中
+                if elem.tag == W + "sectPr" and (
+                        len(ancestors) == 2 or ancestors[2:] == [W + "p", W + "pPr"]):
+                    collector.feed_section_properties(elem)
+                if len(ancestors) != 2 or body is None:
+                    continue
+                # 只验证 body 的直接子级段落（表格内的段落不计入，与 doc.paragraphs 相同）
+                if elem.tag == W + "p":
+                    collector.feed(_read_paragraph(elem, styles))
+                # 处理完的元素从 body 中移除，已解析的树不随文档增长
+                elem.clear()
+                body.remove(elem)
+
+    with tracer.span("build_report", paragraphs=collector.body_count):
+        return _build_report(collector, level)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DOCX 流式验证（单次遍历）")
+    parser.add_argument("docx_path", help="待验证的 DOCX 文件")
+    parser.add_argument("output_json_path", nargs="?", help="验证报告 JSON 输出路径")
+    parser.add_argument("--level", default="standard", choices=["standard", "strict"],
+                        help="验证级别")
+    parser.add_argument("--trace", help="输出 Chrome Trace 格式的阶段耗时（JSON）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.docx_path):
+        print("❌ 错误：DOCX 文件不存在")
+        print("📄 路径: {}".format(args.docx_path))
+        sys.exit(1)
+
+    tracer = tracer_for(args.trace, "docx_stream_validator")
+    try:
+        report = validate_docx(args.docx_path, level=args.level, tracer=tracer)
+    except DocxValidationError as e:
+        print("❌ 错误：{}".format(e))
+        sys.exit(1)
+    finally:
+        if args.trace:
+            tracer.write(args.trace)
+
+    print("⭐ 总体评分: {}/100".format(report["overall_score"]))
+    print("{} 验证状态: {}".format("✅" if report["validation_passed"] else "❌",
+                                  "通过" if report["validation_passed"] else "未通过"))
+    for name, check in report["checks"].items():
+        print("  {} {}".format("✅" if check["passed"] else "❌", name))
+    for issue in report["critical_issues"]:
+        print("⚠️  {}".format(issue))
+
+    if args.output_json_path:
+        with open(args.output_json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("📄 验证报告: {}".format(args.output_json_path))
+
+    sys.exit(0 if report["validation_passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+附图全局重新编号
+
+章节生成器（03-07）各自从图1开始编号附图，全部章节生成后运行本工具，
+按「章节顺序 + 章节内出现顺序」把附图重新编号为全局连续的图1、图2、图3……
+
+每个章节文件内会改写：
+- 附图标题：`#### 附图N：` → `#### 附图M：`
+- 正文中的附图引用：`如图N所示`、`图N说明：` 等所有 `图N`
+- 附图标记：图N 的 N00-N99（含 `N01-1` 形式的子标记）→ M00-M99
+  - Mermaid 代码块中只改写 mermaid_lint.py 识别的标记：节点、参与者、子图标签末尾的标记，
+    以及连线、消息、Note 标签中 `<br/>` 后的标记（`消息1<br/>621`）；标记的百位必须等于
+    该代码块所属附图的原编号，`HTTP 200 OK` 等普通数字不受影响
+  - 正文中只改写括号内（`（401）`、`(401)`）和「步骤401」形式的标记，避免误改普通数字
+
+编号只由附图标题的出现顺序决定，与原编号无关，重复运行结果不变。
+
+用法：
+    python figure_renumber.py [directory] [--dry-run] [--report renumber_report.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from figure_utils import iter_figure_headings, iter_mermaid_blocks, read_text
+from mermaid_lint import lint_block
+
+CHAPTER_PATTERNS = ["03_*.md", "04_*.md", "05_*.md", "06_*.md", "07_*.md"]
+
+FIGURE_REF_RE = re.compile(r"(?<![0-9])图(\d+)(?![0-9])")
+PROSE_MARK_RE = re.compile(r"(?<=[（(])(\d{3,4})(?=[）)\-、，,])|(?<=步骤)(\d{3,4})(?![0-9])")
+
+
+def chapter_files(directory: str) -> List[str]:
+    """按章节顺序返回 03-07 章节文件"""
+    files = []
+    for pattern in CHAPTER_PATTERNS:
+        files.extend(sorted(glob.glob(os.path.join(directory, pattern))))
+    return files
+
+
+def plan_numbering(files: List[str]) -> "OrderedDict[str, OrderedDict[int, int]]":
+    """为每个文件计算 局部编号 → 全局编号 的映射"""
+    plan = OrderedDict()  # type: OrderedDict[str, OrderedDict[int, int]]
+    next_number = 1
+    for path in files:
+        mapping = OrderedDict()  # type: OrderedDict[int, int]
+        for heading in iter_figure_headings(read_text(path)):
+            if heading.number in mapping:
+                continue  # 同一编号重复出现时以第一次为准，留给验证器报告
+            mapping[heading.number] = next_number
+            next_number += 1
+        plan[path] = mapping
+    return plan
+
+
+def _mark_replacer(mapping: Dict[int, int]):
+    """返回把 N00-N99 映射到 M00-M99 的替换函数"""
+
+    def replace(match):
+        digits = match.group(match.lastindex)
+        figure, rest = divmod(int(digits), 100)
+        if figure in mapping and len(digits) == len(str(figure)) + 2:
+            return str(mapping[figure] * 100 + rest)
+        return match.group(0)
+
+    return replace
+
+
+def _diagram_mark_edits(text: str, line_starts: List[int], block,
+                        mapping: Dict[int, int]) -> List[Tuple[int, int, str]]:
+    """返回代码块中需要改写的标记：(起始偏移, 结束偏移, 新标记)"""
+    figure = block.figure_number
+    if figure not in mapping:
+        return []
+    edits = []  # type: List[Tuple[int, int, str]]
+    for mark in lint_block("", block).marks:
+        if mark.parent // 100 != figure:
+            continue
+        start = line_starts[mark.line - 1] + mark.column - 1
+        end = start + len(mark.text)
+        if text[start:end] != mark.text:
+            continue
+        parent = str(mapping[figure] * 100 + mark.parent % 100)
+        edits.append((start, end, parent + mark.text[len(str(mark.parent)):]))
+    return sorted(edits)
+
+
+def renumber_text(text: str, mapping: Dict[int, int]) -> str:
+    """按映射改写一个章节文件的文本"""
+    if not mapping or all(k == v for k, v in mapping.items()):
+        return text
+
+    def replace_ref(match):
+        number = int(match.group(1))
+        return "图{}".format(mapping.get(number, number))
+
+    replace_mark = _mark_replacer(mapping)
+    line_starts = [0] + [m.end() for m in re.finditer("\n", text)]
+
+    pieces = []  # type: List[str]
+    cursor = 0
+    for block in iter_mermaid_blocks(text):
+        prose = text[cursor:block.start_offset]
+        pieces.append(PROSE_MARK_RE.sub(replace_mark, FIGURE_REF_RE.sub(replace_ref, prose)))
+        cursor = block.start_offset
+        for start, end, mark in _diagram_mark_edits(text, line_starts, block, mapping):
+            pieces.append(text[cursor:start])
+            pieces.append(mark)
+            cursor = end
+        pieces.append(text[cursor:block.end_offset])
+        cursor = block.end_offset
+    prose = text[cursor:]
+    pieces.append(PROSE_MARK_RE.sub(replace_mark, FIGURE_REF_RE.sub(replace_ref, prose)))
+    return "".join(pieces)
+
+
+def renumber_directory(directory: str, dry_run: bool = False) -> Dict:
+    """重新编号目录下的 03-07 章节文件，返回编号报告"""
+    files = chapter_files(directory)
+    plan = plan_numbering(files)
+    chapters = []
+    modified = []
+    for path, mapping in plan.items():
+        text = read_text(path)
+        new_text = renumber_text(text, mapping)
+        changed = new_text != text
+        if changed:
+            modified.append(os.path.basename(path))
+            if not dry_run:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(new_text)
+        chapters.append({
+            "file": os.path.basename(path),
+            "figures": [
+                {"local": local, "global": number}
+                for local, number in mapping.items()
+            ],
+            "modified": changed,
+        })
+    total = sum(len(m) for m in plan.values())
+    return {
+        "directory": directory,
+        "dry_run": dry_run,
+        "total_figures": total,
+        "chapters": chapters,
+        "modified_files": modified,
+    }
+
+
+def _format_range(numbers: List[int]) -> str:
+    if not numbers:
+        return "无附图"
+    if len(numbers) == 1:
+        return "图{}".format(numbers[0])
+    return "图{}-图{}".format(numbers[0], numbers[-1])
+
+
+def print_report(report: Dict):
+    print("=== 附图重新编号报告 ===")
+    print()
+    for chapter in report["chapters"]:
+        figures = chapter["figures"]
+        changes = ["图{}→图{}".format(f["local"], f["global"])
+                   for f in figures if f["local"] != f["global"]]
+        status = "✏️ " if chapter["modified"] else "✓"
+        detail = "，".join(changes) if changes else "编号无需调整"
+        print("{} {} - {}（{}）".format(
+            status, chapter["file"], _format_range([f["global"] for f in figures]), detail))
+    print()
+    print("附图统计：共 {} 幅{}".format(
+        report["total_figures"],
+        "（图1-图{}）".format(report["total_figures"]) if report["total_figures"] else ""))
+    if report["dry_run"]:
+        print("ℹ️  预览模式，未修改任何文件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将章节 03-07 的附图重新编号为全局连续编号")
+    parser.add_argument("directory", nargs="?", default=".", help="章节文件所在目录")
+    parser.add_argument("--dry-run", action="store_true", help="只显示编号方案，不修改文件")
+    parser.add_argument("--report", help="编号报告 JSON 输出路径")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print("❌ 错误：目录不存在")
+        print("📄 路径: {}".format(args.directory))
+        sys.exit(1)
+
+    report = renumber_directory(args.directory, dry_run=args.dry_run)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("📄 编号报告: {}".format(args.report))
+
+
+if __name__ == "__main__":
+    main()
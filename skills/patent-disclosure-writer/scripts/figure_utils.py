@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+附图解析工具
+
+从章节文件、`10_附图说明.md` 或整合后的交底书中提取附图标题与 Mermaid 代码块。
+支持以下三种附图标题写法：
+
+- 章节文件：`#### 附图4：设备发现流程图`
+- 附图说明：`### 图4: 设备发现流程图`
+- 整合文档：`**附图4：设备发现流程图**`
+"""
+
+import re
+from collections import namedtuple
+from typing import Iterator, List, Optional
+
+# 附图标题（兼容全角/半角冒号）
+FIGURE_HEADING_RE = re.compile(
+    r"^(?:#{3,4}\s*附?图|\*\*附图)(\d+)\s*[：:]\s*(.*?)\s*(?:\*\*)?\s*$"
+)
+
+# Mermaid 代码块起止标记
+MERMAID_FENCE_RE = re.compile(r"^(\s*)```\s*mermaid\s*$")
+FENCE_CLOSE_RE = re.compile(r"^\s*```\s*$")
+
+MermaidBlock = namedtuple(
+    "MermaidBlock",
+    [
+        "index",          # 代码块在文件中的序号（从1开始）
+        "figure_number",  # 所属附图编号（无法确定时为 None）
+        "figure_title",   # 所属附图名称
+        "source",         # Mermaid 源码（不含围栏）
+        "start_line",     # ```mermaid 所在行（从1开始）
+        "end_line",       # 结束 ``` 所在行（未闭合时为 None）
+        "start_offset",   # 代码块在文本中的起始字符偏移
+        "end_offset",     # 代码块在文本中的结束字符偏移（不含）
+    ],
+)
+
+FigureHeading = namedtuple("FigureHeading", ["number", "title", "line"])
+
+
+def iter_figure_headings(text: str) -> Iterator[FigureHeading]:
+    """按出现顺序返回所有附图标题（跳过代码块内部的内容）"""
+    in_fence = False
+    for line_no, line in enumerate(text.splitlines(), 1):
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        match = FIGURE_HEADING_RE.match(line.strip())
+        if match:
+            yield FigureHeading(int(match.group(1)), match.group(2), line_no)
+
+
+def iter_mermaid_blocks(text: str) -> Iterator[MermaidBlock]:
+    """
+    按出现顺序返回所有 Mermaid 代码块
+
+    每个代码块归属于其前方最近的附图标题。
+    """
+    lines = text.splitlines(keepends=True)
+    offset = 0
+    index = 0
+    figure_number = None  # type: Optional[int]
+    figure_title = ""
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.rstrip("\r\n")
+
+        heading = FIGURE_HEADING_RE.match(stripped.strip())
+        if heading:
+            figure_number = int(heading.group(1))
+            figure_title = heading.group(2)
+
+        if MERMAID_FENCE_RE.match(stripped):
+            index += 1
+            start_line = i + 1
+            start_offset = offset
+            body = []  # type: List[str]
+            offset += len(line)
+            i += 1
+            end_line = None
+            while i < len(lines):
+                inner = lines[i]
+                offset += len(inner)
+                i += 1
+                if FENCE_CLOSE_RE.match(inner.rstrip("\r\n")):
+                    end_line = i
+                    break
+                body.append(inner)
+            yield MermaidBlock(
+                index=index,
+                figure_number=figure_number,
+                figure_title=figure_title,
+                source="".join(body).rstrip("\r\n"),
+                start_line=start_line,
+                end_line=end_line,
+                start_offset=start_offset,
+                end_offset=offset,
+            )
+            continue
+
+        # 其它代码块整体跳过，避免把代码块内的内容识别为标题
+        if stripped.lstrip().startswith("```"):
+            offset += len(line)
+            i += 1
+            while i < len(lines):
+                inner = lines[i]
+                offset += len(inner)
+                i += 1
+                if FENCE_CLOSE_RE.match(inner.rstrip("\r\n")):
+                    break
+            continue
+
+        offset += len(line)
+        i += 1
+
+
+def read_text(path: str) -> str:
+    """以 UTF-8 读取文本文件（兼容带 BOM 的文件）"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return f.read()
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+附图图片优化与 DOCX 媒体去重
+
+`mmdc` 输出的 PNG 带有大片留白、截图元数据和未充分压缩的像素数据，
+直接嵌入后 DOCX 容易达到几十 MB。本工具在嵌入前后各做一次优化：
+
+- images：优化 `diagram_images/` 中的图片
+  - 裁掉四周留白（保留少量边距）
+  - 宽度超过打印宽度（DPI × 英寸）时缩小到打印宽度，并写入 DPI 信息
+  - 颜色数不超过256的平面图无损转换为调色板 PNG
+  - 去掉文本/时间等元数据块，以最高压缩级别重新压缩
+- docx：处理已生成的 DOCX
+  - 对 `word/media/` 中的 PNG 做无损优化（不裁剪、不缩放，版面尺寸不变）
+  - 内容相同的图片只保留一个媒体部件，关系文件改为指向同一部件
+
+裁剪、缩放和调色板转换需要 Pillow；未安装时只做无损的元数据清理和重新压缩。
+16 位或 Pillow 无法无损转换的颜色模式（`I;16`、`I`、`F`、`CMYK` 等）同样只做
+无损重新压缩，像素保持不变。DOCX 中每个部件保留原来的压缩方式。
+
+用法：
+    python image_optimizer.py images <images_dir> [--dpi 300] [--print-width 5]
+    python image_optimizer.py docx <input.docx> [-o output.docx]
+
+两个子命令都支持 `--trace trace.json`，输出 Chrome Trace 格式的阶段耗时。
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from trace_events import NULL_TRACER, tracer_for
+
+try:
+    from PIL import Image, ImageChops
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+    ImageChops = None
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# 无损优化时保留的辅助块（颜色管理和透明度），其余元数据块全部去掉
+KEEP_CHUNKS = (b"IHDR", b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"pHYs", b"IEND")
+
+DEFAULT_DPI = 300
+DEFAULT_PRINT_WIDTH = 5.0  # 英寸，A4 页面内的附图宽度
+DEFAULT_MARGIN = 20  # 裁剪后保留的边距（像素）
+# 可以无损裁剪、缩放和转换为调色板的颜色模式（8 位）
+PILLOW_MODES = ("1", "L", "LA", "P", "RGB", "RGBA")
+
+INCH_PER_METER = 39.3700787
+
+CONTENT_TYPES = "[Content_Types].xml"
+RELATIONSHIP_RE = re.compile(r"<Relationship\b[^>]*?/?>")
+TARGET_RE = re.compile(r'\bTarget="([^"]*)"')
+
+
+class ImageOptimizeError(Exception):
+    """图片或 DOCX 无法处理"""
+
+
+def print_width_pixels(dpi: int = DEFAULT_DPI, inches: float = DEFAULT_PRINT_WIDTH) -> int:
+    """打印宽度对应的像素数（300 DPI × 5 英寸 = 1500）"""
+    return int(round(dpi * inches))
+
+
+# ---------------------------------------------------------------------------
+# PNG 无损重新压缩（仅标准库）
+# ---------------------------------------------------------------------------
+
+def _iter_chunks(data: bytes):
+    if not data.startswith(PNG_SIGNATURE):
+        raise ImageOptimizeError("不是 PNG 文件")
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if len(body) != length:
+            raise ImageOptimizeError("PNG 数据不完整")
+        yield kind, body
+        pos += 12 + length
+        if kind == b"IEND":
+            return
+    raise ImageOptimizeError("PNG 缺少 IEND")
+
+
+def _chunk(kind: bytes, body: bytes) -> bytes:
+    crc = zlib.crc32(kind + body) & 0xFFFFFFFF
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", crc)
+
+
+def png_bit_depth(data: bytes) -> int:
+    """PNG 每个通道的位深（IHDR）"""
+    for kind, body in _iter_chunks(data):
+        if kind != b"IHDR" or len(body) < 9:
+            break
+        return body[8]
+    raise ImageOptimizeError("PNG 缺少 IHDR")
+
+
+def _phys_chunk(dpi: int) -> bytes:
+    ppm = int(round(dpi * INCH_PER_METER))
+    return struct.pack(">IIB", ppm, ppm, 1)
+
+
+def recompress_png(data: bytes, dpi: Optional[int] = None) -> bytes:
+    """去掉元数据块并以最高级别重新压缩像素数据（像素不变）"""
+    chunks = []  # type: List[Tuple[bytes, bytes]]
+    idat = []  # type: List[bytes]
+    for kind, body in _iter_chunks(data):
+        if kind == b"IDAT":
+            if not idat:
+                chunks.append((b"IDAT", b""))  # 占位，保持 IDAT 在原位置
+            idat.append(body)
+        elif kind in KEEP_CHUNKS:
+            if kind == b"pHYs" and dpi:
+                continue
+            chunks.append((kind, body))
+    if not idat:
+        raise ImageOptimizeError("PNG 缺少图像数据")
+
+    try:
+        raw = zlib.decompress(b"".join(idat))
+    except zlib.error as e:
+        raise ImageOptimizeError("PNG 图像数据损坏：{}".format(e))
+    compressed = zlib.compress(raw, 9)
+
+    out = [PNG_SIGNATURE]
+    for kind, body in chunks:
+        if kind == b"IDAT":
+            if dpi:
+                out.append(_chunk(b"pHYs", _phys_chunk(dpi)))
+            out.append(_chunk(b"IDAT", compressed))
+        else:
+            out.append(_chunk(kind, body))
+    return b"".join(out)
+
+
+# ---------------------------------------------------------------------------
+# Pillow 优化
+# ---------------------------------------------------------------------------
+
+def _crop_whitespace(img, margin: int):
+    """按左上角像素颜色裁掉四周留白"""
+    background = Image.new(img.mode, img.size, img.getpixel((0, 0)))
+    bbox = ImageChops.difference(img, background).getbbox()
+    if not bbox:
+        return img
+    left = max(0, bbox[0] - margin)
+    top = max(0, bbox[1] - margin)
+    right = min(img.width, bbox[2] + margin)
+    bottom = min(img.height, bbox[3] + margin)
+    if (left, top, right, bottom) == (0, 0, img.width, img.height):
+        return img
+    return img.crop((left, top, right, bottom))
+
+
+def _to_palette(img):
+    """颜色数不超过256时无损转换为调色板图像，否则返回 None"""
+    colors = img.getcolors(256)
+    if colors is None:
+        return None
+    palette = []  # type: List[int]
+    for _, color in colors:
+        palette.extend(color[:3])
+    # 用第一个颜色填充剩余调色板，避免量化时映射到不存在的颜色
+    palette.extend(list(colors[0][1][:3]) * (256 - len(colors)))
+    palette_image = Image.new("P", (1, 1))
+    palette_image.putpalette(palette)
+    dither = getattr(Image, "Dither", Image).NONE
+    converted = img.quantize(palette=palette_image, dither=dither)
+    if ImageChops.difference(converted.convert("RGB"), img).getbbox():
+        return None
+    return converted
+
+
+def _pillow_optimize(data: bytes, max_width: Optional[int], dpi: Optional[int],
+                     crop: bool, margin: int) -> Tuple[bytes, List[str]]:
+    steps = []  # type: List[str]
+    img = Image.open(io.BytesIO(data))
+    img.load()
+
+    # Pillow 读取 16 位 PNG 时会降为 8 位，其它模式转换为 RGB 会丢失数据：只做无损重新压缩
+    if img.mode not in PILLOW_MODES or (img.format == "PNG" and png_bit_depth(data) > 8):
+        return recompress_png(data, dpi=dpi), ["keep_pixels {}".format(img.mode)]
+
+    if img.mode in ("RGBA", "LA") and img.getchannel("A").getextrema()[0] == 255:
+        img = img.convert("RGB")
+        steps.append("drop_alpha")
+    elif img.mode == "1":
+        img = img.convert("L")
+    if img.mode == "P":
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+    if crop:
+        cropped = _crop_whitespace(img, margin)
+        if cropped.size != img.size:
+            steps.append("crop {}x{}->{}x{}".format(img.width, img.height,
+                                                    cropped.width, cropped.height))
+            img = cropped
+
+    if max_width and img.width > max_width:
+        height = max(1, int(round(img.height * max_width / float(img.width))))
+        resample = getattr(Image, "Resampling", Image).LANCZOS
+        steps.append("resize {}x{}->{}x{}".format(img.width, img.height, max_width, height))
+        img = img.resize((max_width, height), resample)
+
+    if img.mode == "RGB":
+        palette = _to_palette(img)
+        if palette is not None:
+            steps.append("palette")
+            img = palette
+
+    buffer = io.BytesIO()
+    options = {"optimize": True}
+    if dpi:
+        options["dpi"] = (dpi, dpi)
+    img.save(buffer, "PNG", **options)
+    return buffer.getvalue(), steps
+
+
+def optimize_png(data: bytes, max_width: Optional[int] = None, dpi: Optional[int] = None,
+                 crop: bool = True, margin: int = DEFAULT_MARGIN) -> Tuple[bytes, List[str]]:
+    """
+    优化一张 PNG，返回 (优化后的数据, 执行的步骤)
+
+    crop/max_width 会改变图片尺寸，只应在嵌入 DOCX 之前使用；
+    两者都关闭时结果与原图像素完全相同。
+    """
+    if Image is not None:
+        try:
+            optimized, steps = _pillow_optimize(data, max_width, dpi, crop, margin)
+        except (OSError, ValueError) as e:
+            raise ImageOptimizeError("无法读取图片：{}".format(e))
+    else:
+        optimized, steps = recompress_png(data, dpi=dpi), []
+    steps.append("recompress")
+
+    changed_geometry = any(s.startswith(("crop", "resize")) for s in steps)
+    if len(optimized) >= len(data) and not changed_geometry:
+        return data, []
+    return optimized, steps
+
+
+def _entry(name: str, original: int, optimized: int, steps: List[str]) -> Dict:
+    return {
+        "name": name,
+        "original_bytes": original,
+        "optimized_bytes": optimized,
+        "saved_bytes": original - optimized,
+        "steps": steps,
+    }
+
+
+def _totals(report: Dict, original: int, optimized: int) -> Dict:
+    report["original_bytes"] = original
+    report["optimized_bytes"] = optimized
+    report["saved_bytes"] = original - optimized
+    report["saved_percent"] = round(100.0 * (original - optimized) / original, 1) if original else 0.0
+    return report
+
+
+def optimize_directory(images_dir: str, dpi: int = DEFAULT_DPI,
+                       print_width: float = DEFAULT_PRINT_WIDTH, crop: bool = True,
+                       margin: int = DEFAULT_MARGIN, tracer=NULL_TRACER) -> Dict:
+    """优化目录下的全部 PNG（原地替换），返回优化报告"""
+    max_width = print_width_pixels(dpi, print_width)
+    images = []
+    total_before = total_after = 0
+    for path in sorted(glob.glob(os.path.join(images_dir, "*.png"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        with tracer.span("optimize_image", image=os.path.basename(path)):
+            optimized, steps = optimize_png(data, max_width=max_width, dpi=dpi, crop=crop,
+                                            margin=margin)
+        if optimized is not data:
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(optimized)
+            os.replace(tmp, path)
+        images.append(_entry(os.path.basename(path), len(data), len(optimized), steps))
+        total_before += len(data)
+        total_after += len(optimized)
+    report = {
+        "mode": "images",
+        "images_dir": images_dir,
+        "pillow": Image is not None,
+        "dpi": dpi,
+        "max_width": max_width,
+        "images": images,
+    }
+    return _totals(report, total_before, total_after)
+
+
+# ---------------------------------------------------------------------------
+# DOCX 媒体去重
+# ---------------------------------------------------------------------------
+
+def _rels_source_dir(rels_name: str) -> str:
+    """`word/_rels/document.xml.rels` → `word`"""
+    return posixpath.dirname(posixpath.dirname(rels_name))
+
+
+def _rewrite_rels(xml: str, source_dir: str, canonical: Dict[str, str]) -> str:
+    """把指向重复媒体部件的 Target 改为指向保留的部件"""
+
+    def replace_relationship(match):
+        element = match.group(0)
+        if 'TargetMode="External"' in element:
+            return element
+        target = TARGET_RE.search(element)
+        if not target:
+            return element
+        value = target.group(1)
+        if value.startswith("/"):
+            part = value.lstrip("/")
+        else:
+            part = posixpath.normpath(posixpath.join(source_dir, value))
+        keep = canonical.get(part)
+        if keep is None:
+            return element
+        if value.startswith("/"):
+            new_value = "/" + keep
+        else:
+            new_value = posixpath.relpath(keep, source_dir or ".")
+        return element[:target.start(1)] + new_value + element[target.end(1):]
+
+    return RELATIONSHIP_RE.sub(replace_relationship, xml)
+
+
+def _drop_overrides(xml: str, removed: List[str]) -> str:
+    for part in removed:
+        xml = re.sub(r'<Override\b[^>]*PartName="/{}"[^>]*/>'.format(re.escape(part)), "", xml)
+    return xml
+
+
+def optimize_docx(docx_path: str, output_path: Optional[str] = None,
+                  optimize_images: bool = True, tracer=NULL_TRACER) -> Dict:
+    """无损优化 DOCX 中的 PNG 并合并内容相同的媒体部件，返回优化报告"""
+    output_path = output_path or docx_path
+    try:
+        source = zipfile.ZipFile(docx_path)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise ImageOptimizeError("无法打开 DOCX：{}".format(e))
+
+    with source:
+        infos = source.infolist()
+        media = OrderedDict()  # type: OrderedDict[str, bytes]
+        images = []
+        with tracer.span("optimize_media", optimize_images=optimize_images):
+            for info in infos:
+                if not info.filename.startswith("word/media/"):
+                    continue
+                data = source.read(info)
+                steps = []  # type: List[str]
+                optimized = data
+                if optimize_images and data.startswith(PNG_SIGNATURE):
+                    try:
+                        optimized, steps = optimize_png(data, crop=False)
+                    except ImageOptimizeError:
+                        optimized, steps = data, []
+                media[info.filename] = optimized
+                images.append(_entry(info.filename, len(data), len(optimized), steps))
+
+        with tracer.span("dedupe_media"):
+            canonical = {}  # type: Dict[str, str]
+            by_hash = {}  # type: Dict[str, str]
+            for name, data in media.items():
+                digest = hashlib.sha256(data).hexdigest()
+                keep = by_hash.setdefault(digest, name)
+                if keep != name:
+                    canonical[name] = keep
+            for entry in images:
+                keep = canonical.get(entry["name"])
+                entry["duplicate_of"] = keep
+                if keep:
+                    entry["optimized_bytes"] = 0
+                    entry["saved_bytes"] = entry["original_bytes"]
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".docx",
+                                        dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            with tracer.span("write_package"), zipfile.ZipFile(tmp_path, "w") as target:
+                for info in infos:
+                    name = info.filename
+                    if name in canonical:
+                        continue
+                    data = media[name] if name in media else source.read(info)
+                    if canonical and name.endswith(".rels"):
+                        data = _rewrite_rels(data.decode("utf-8"), _rels_source_dir(name),
+                                             canonical).encode("utf-8")
+                    elif canonical and name == CONTENT_TYPES:
+                        data = _drop_overrides(data.decode("utf-8"),
+                                               list(canonical)).encode("utf-8")
+                    target.writestr(_copy_info(info), data)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    # 源文件关闭后再替换（Windows 下不能覆盖已打开的文件）
+    original_size = os.path.getsize(docx_path)
+    shutil.move(tmp_path, output_path)
+
+    report = {
+        "mode": "docx",
+        "source": docx_path,
+        "output": output_path,
+        "pillow": Image is not None,
+        "media_parts": len(media),
+        "duplicates_removed": len(canonical),
+        "images": images,
+        "media_saved_bytes": sum(e["saved_bytes"] for e in images),
+    }
+    return _totals(report, original_size, os.path.getsize(output_path))
+
+
+def _copy_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    copy = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    # 图片等已压缩的媒体通常以 STORED 方式存放，保持各部件原来的压缩方式
+    copy.compress_type = info.compress_type
+    copy.external_attr = info.external_attr
+    return copy
+
+
+def _format_bytes(size: int) -> str:
+    if abs(size) >= 1024 * 1024:
+        return "{:.2f} MB".format(size / 1024.0 / 1024.0)
+    return "{:.1f} KB".format(size / 1024.0)
+
+
+def print_report(report: Dict):
+    """打印每幅图片和整体的节省字节数"""
+    print("=== 附图图片优化报告 ===")
+    if not report["pillow"]:
+        print("ℹ️  未安装 Pillow，只执行无损重新压缩（pip install Pillow 可启用裁剪和调色板优化）")
+    print()
+    for entry in report["images"]:
+        if entry.get("duplicate_of"):
+            print("  ♻️  {}：与 {} 相同，已合并（-{}）".format(
+                entry["name"], entry["duplicate_of"], _format_bytes(entry["saved_bytes"])))
+        elif entry["saved_bytes"] > 0:
+            print("  ✂️  {}：{} → {}（-{}；{}）".format(
+                entry["name"], _format_bytes(entry["original_bytes"]),
+                _format_bytes(entry["optimized_bytes"]), _format_bytes(entry["saved_bytes"]),
+                "、".join(entry["steps"])))
+        else:
+            print("  ✓ {}：无需优化".format(entry["name"]))
+    print()
+    if report["mode"] == "docx":
+        print("🖼️  媒体部件: {}（合并重复 {} 个）".format(
+            report["media_parts"], report["duplicates_removed"]))
+        print("📦 DOCX 大小: {} → {}".format(
+            _format_bytes(report["original_bytes"]), _format_bytes(report["optimized_bytes"])))
+    else:
+        print("📦 图片总大小: {} → {}".format(
+            _format_bytes(report["original_bytes"]), _format_bytes(report["optimized_bytes"])))
+    print("💾 共节省: {}（{}%）".format(_format_bytes(report["saved_bytes"]),
+                                      report["saved_percent"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="优化附图图片并合并 DOCX 中的重复媒体")
+    sub = parser.add_subparsers(dest="command")
+
+    images = sub.add_parser("images", help="优化 diagram_images 目录中的 PNG（嵌入前）")
+    images.add_argument("images_dir", help="图片目录")
+    images.add_argument("--dpi", type=int, default=DEFAULT_DPI, help="打印分辨率")
+    images.add_argument("--print-width", type=float, default=DEFAULT_PRINT_WIDTH,
+                        help="附图打印宽度（英寸）")
+    images.add_argument("--margin", type=int, default=DEFAULT_MARGIN, help="裁剪后保留的边距（像素）")
+    images.add_argument("--no-crop", action="store_true", help="不裁剪留白")
+    images.add_argument("--report", help="优化报告 JSON 输出路径")
+    images.add_argument("--trace", help="输出 Chrome Trace 格式的阶段耗时（JSON）")
+
+    docx = sub.add_parser("docx", help="无损优化 DOCX 中的图片并合并重复媒体（嵌入后）")
+    docx.add_argument("docx_file", help="DOCX 文件")
+    docx.add_argument("-o", "--output", help="输出路径（默认覆盖原文件）")
+    docx.add_argument("--dedupe-only", action="store_true", help="只合并重复媒体，不重新压缩图片")
+    docx.add_argument("--report", help="优化报告 JSON 输出路径")
+    docx.add_argument("--trace", help="输出 Chrome Trace 格式的阶段耗时（JSON）")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        sys.exit(2)
+
+    tracer = tracer_for(args.trace, "image_optimizer")
+    try:
+        if args.command == "images":
+            if not os.path.isdir(args.images_dir):
+                print("❌ 错误：图片目录不存在")
+                print("📄 路径: {}".format(args.images_dir))
+                sys.exit(1)
+            report = optimize_directory(args.images_dir, dpi=args.dpi,
+                                        print_width=args.print_width,
+                                        crop=not args.no_crop, margin=args.margin,
+                                        tracer=tracer)
+        else:
+            if not os.path.exists(args.docx_file):
+                print("❌ 错误：DOCX 文件不存在")
+                print("📄 路径: {}".format(args.docx_file))
+                sys.exit(1)
+            report = optimize_docx(args.docx_file, args.output,
+                                   optimize_images=not args.dedupe_only, tracer=tracer)
+    except ImageOptimizeError as e:
+        print("❌ 错误：{}".format(e))
+        sys.exit(1)
+    finally:
+        if args.trace:
+            tracer.write(args.trace)
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("📄 优化报告: {}".format(args.report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP 缓存代理
+
+在 Claude Code 与 google-patents-mcp、exa、web-search-prime、web-reader 之间
+增加一层本地缓存，减少重复检索带来的等待：
+
+- `tools/call` 的成功结果缓存在本地 SQLite 中，每个服务使用各自的 TTL 和容量上限
+  （按最近访问淘汰）
+- 同时发出的相同请求只向上游发送一次，其余请求等待同一结果
+- 每个服务独立限速（令牌桶）
+- 记录缓存命中率和上游延迟，使用 `stats` 子命令查看
+
+每个 MCP 服务对应一个代理进程，代理以 stdio 方式对 Claude Code 提供服务，
+上游可以是 stdio 命令（`--` 之后的部分）或 HTTP 地址（`--url`）。
+服务名称保持不变，子代理中的工具名（如 `mcp__exa__...`）无需修改。
+
+用法：
+    python mcp_cache_proxy.py serve --service exa -- npx -y exa-mcp-server
+    python mcp_cache_proxy.py serve --service web-reader --url https://... --header "Authorization: Bearer KEY"
+    python mcp_cache_proxy.py stats
+    python mcp_cache_proxy.py clear [--service exa]
+
+离线验证（使用内置的桩上游）：
+    python mcp_cache_proxy.py serve --service stub -- python mcp_cache_proxy.py stub-upstream
+"""
+
+import argparse
+import hashlib
+import http.client
+import itertools
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "easyjob", "mcp_cache.sqlite")
+DEFAULT_TTL_HOURS = 72
+DEFAULT_MAX_MB = 256
+DEFAULT_RATE = 2.0       # 每秒请求数
+DEFAULT_BURST = 4
+DEFAULT_TIMEOUT = 120
+HANDLER_THREADS = 16
+
+PROTOCOL_VERSION = "2025-03-26"
+
+
+class ProxyError(Exception):
+    """上游调用失败"""
+
+    def __init__(self, message: str, code: int = -32603):
+        super(ProxyError, self).__init__(message)
+        self.code = code
+
+
+def request_key(service: str, tool: str, arguments) -> str:
+    """缓存/合并键：服务 + 工具 + 参数（规范化 JSON）"""
+    payload = json.dumps([service, tool, arguments], ensure_ascii=False,
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(object):
+    """
+    SQLite 响应缓存（多个代理进程可共享同一个数据库文件）
+
+    TTL 和容量上限只作用于写入条目所属的服务：每个代理进程按自己的参数
+    淘汰本服务的条目，不会删除共享数据库中其它服务的缓存。
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, service TEXT, tool TEXT, response TEXT,"
+            " size INTEGER, created REAL, last_access REAL, hits INTEGER DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache(last_access)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS cache_service_lru ON cache(service, last_access)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS stats ("
+            " service TEXT, metric TEXT, value REAL, PRIMARY KEY (service, metric))"
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl > 0 and row[1] + self.ttl < now:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._db.execute(
+                "UPDATE cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0])
+
+    def put(self, key: str, service: str, tool: str, result: Dict) -> int:
+        """写入缓存，返回因超出容量而淘汰的条目数"""
+        data = json.dumps(result, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return 0
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache"
+                " (key, service, tool, response, size, created, last_access, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, service, tool, data, size, now, now),
+            )
+            return self._evict(service)
+
+    def _evict(self, service: str) -> int:
+        """按本代理的 TTL 和容量上限淘汰 service 的条目"""
+        evicted = 0
+        if self.ttl > 0:
+            evicted += self._db.execute(
+                "DELETE FROM cache WHERE service = ? AND created < ?",
+                (service, time.time() - self.ttl),
+            ).rowcount
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE service = ?", (service,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return evicted
+        rows = self._db.execute(
+            "SELECT key, size FROM cache WHERE service = ? ORDER BY last_access", (service,)
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM cache WHERE key = ?", doomed)
+        return evicted + len(doomed)
+
+    def add_stats(self, service: str, **values):
+        """累加计数器；upstream_seconds_max 取最大值"""
+        with self._lock:
+            for metric, value in values.items():
+                if metric == "upstream_seconds_max":
+                    self._db.execute(
+                        "INSERT INTO stats VALUES (?, ?, ?) ON CONFLICT(service, metric)"
+                        " DO UPDATE SET value = MAX(value, excluded.value)",
+                        (service, metric, value),
+                    )
+                else:
+                    self._db.execute(
+                        "INSERT INTO stats VALUES (?, ?, ?) ON CONFLICT(service, metric)"
+                        " DO UPDATE SET value = value + excluded.value",
+                        (service, metric, value),
+                    )
+
+    def stats(self) -> Dict[str, Dict]:
+        result = {}  # type: Dict[str, Dict]
+        with self._lock:
+            for service, metric, value in self._db.execute("SELECT * FROM stats"):
+                result.setdefault(service, {})[metric] = value
+            for service, entries, size in self._db.execute(
+                    "SELECT service, COUNT(*), SUM(size) FROM cache GROUP BY service"):
+                result.setdefault(service, {}).update(entries=entries, bytes=size)
+        return result
+
+    def clear(self, service: Optional[str] = None):
+        with self._lock:
+            if service:
+                self._db.execute("DELETE FROM cache WHERE service = ?", (service,))
+                self._db.execute("DELETE FROM stats WHERE service = ?", (service,))
+            else:
+                self._db.execute("DELETE FROM cache")
+                self._db.execute("DELETE FROM stats")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RateLimiter(object):
+    """令牌桶限速"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class StdioUpstream(object):
+    """以子进程方式启动的 stdio MCP 服务"""
+
+    def __init__(self, command: List[str], on_notification: Callable[[Dict], None]):
+        self.on_notification = on_notification
+        self._ids = itertools.count(1)
+        self._pending = {}  # type: Dict[int, Future]
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+        )
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    def _read_loop(self):
+        for raw in iter(self._proc.stdout.readline, b""):
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line.decode("utf-8"))
+            except ValueError:
+                continue
+            if "method" in message:
+                if "id" in message:
+                    self._answer_server_request(message)
+                else:
+                    self.on_notification(message)
+                continue
+            with self._lock:
+                future = self._pending.pop(message.get("id"), None)
+            if future is not None:
+                future.set_result(message)
+        # 上游退出：所有等待中的请求失败
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ProxyError("上游 MCP 服务已退出"))
+
+    def _answer_server_request(self, message: Dict):
+        if message.get("method") == "ping":
+            self._send({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+        else:
+            self._send({"jsonrpc": "2.0", "id": message["id"],
+                        "error": {"code": -32601, "message": "代理不支持该请求"}})
+
+    def _send(self, message: Dict):
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._write_lock:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+
+    def request(self, message: Dict, timeout: float) -> Dict:
+        upstream_id = next(self._ids)
+        future = Future()  # type: Future
+        with self._lock:
+            self._pending[upstream_id] = future
+        outgoing = dict(message, id=upstream_id)
+        try:
+            self._send(outgoing)
+        except OSError:
+            with self._lock:
+                self._pending.pop(upstream_id, None)
+            raise ProxyError("无法写入上游 MCP 服务")
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._pending.pop(upstream_id, None)
+            raise ProxyError("上游响应超时（{}秒）".format(timeout))
+
+    def notify(self, message: Dict):
+        try:
+            self._send(message)
+        except OSError:
+            pass
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._proc.kill()
+
+
+class HttpUpstream(object):
+    """Streamable HTTP 方式的 MCP 服务（如智谱 web-search-prime、web-reader）"""
+
+    def __init__(self, url: str, headers: Dict[str, str]):
+        self.url = url
+        self.headers = headers
+        self.session_id = None  # type: Optional[str]
+        self._ids = itertools.count(1)
+
+    def _post(self, message: Dict, timeout: float):
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json, text/event-stream",
+        }
+        headers.update(self.headers)
+        if self.session_id:
+            headers["Mcp-Session-Id"] = self.session_id
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(message, ensure_ascii=False).encode("utf-8"),
+            headers=headers,
+            method="POST",
+        )
+        try:
+            return urllib.request.urlopen(req, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            raise ProxyError("上游 HTTP {}: {}".format(e.code, e.reason))
+        except (urllib.error.URLError, OSError) as e:
+            raise ProxyError("无法连接上游：{}".format(e))
+
+    def request(self, message: Dict, timeout: float) -> Dict:
+        upstream_id = next(self._ids)
+        response = self._post(dict(message, id=upstream_id), timeout)
+        try:
+            with response:
+                session = response.headers.get("Mcp-Session-Id")
+                if session:
+                    self.session_id = session
+                content_type = response.headers.get("Content-Type", "")
+                if "text/event-stream" in content_type:
+                    reply = self._read_sse(response, upstream_id)
+                else:
+                    reply = json.loads(response.read().decode("utf-8"))
+        except (OSError, http.client.HTTPException) as e:
+            raise ProxyError("读取上游响应失败：{}".format(e))
+        except ValueError as e:
+            raise ProxyError("上游响应不是有效的 JSON：{}".format(e))
+        if not isinstance(reply, dict):
+            raise ProxyError("上游响应不是 JSON-RPC 消息")
+        return reply
+
+    @staticmethod
+    def _read_sse(response, upstream_id: int) -> Dict:
+        data = []  # type: List[str]
+        for raw in response:
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if line.startswith("data:"):
+                data.append(line[5:].strip())
+                continue
+            if line or not data:
+                continue
+            message = json.loads("\n".join(data))
+            data = []
+            if message.get("id") == upstream_id and "method" not in message:
+                return message
+        raise ProxyError("上游事件流在返回结果前结束")
+
+    def notify(self, message: Dict):
+        try:
+            self._post(message, DEFAULT_TIMEOUT).close()
+        except ProxyError:
+            pass
+
+    def close(self):
+        pass
+
+
+class CachingProxy(object):
+    """转发 MCP 消息，对 tools/call 做缓存、合并与限速"""
+
+    def __init__(self, service: str, upstream, cache: ResponseCache,
+                 limiter: RateLimiter, timeout: float = DEFAULT_TIMEOUT,
+                 uncached_tools=()):
+        self.service = service
+        self.upstream = upstream
+        self.cache = cache
+        self.limiter = limiter
+        self.timeout = timeout
+        self.uncached_tools = set(uncached_tools)
+        self._inflight = {}  # type: Dict[str, Future]
+        self._lock = threading.Lock()
+
+    def handle_request(self, message: Dict) -> Dict:
+        """处理一条客户端请求，返回发回客户端的响应"""
+        try:
+            if message.get("method") == "tools/call":
+                result = self._call_tool(message)
+            else:
+                result = self._forward(message)
+        except ProxyError as e:
+            return {"jsonrpc": "2.0", "id": message.get("id"),
+                    "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            # 任何失败都必须回复客户端，否则客户端会一直等待该请求
+            log("处理请求 {} 失败：{!r}".format(message.get("method"), e))
+            return {"jsonrpc": "2.0", "id": message.get("id"),
+                    "error": {"code": -32603, "message": "代理内部错误：{}".format(e)}}
+        response = dict(result)
+        response["id"] = message.get("id")
+        return response
+
+    def _forward(self, message: Dict) -> Dict:
+        return self.upstream.request(message, self.timeout)
+
+    def _call_tool(self, message: Dict) -> Dict:
+        params = message.get("params") or {}
+        tool = params.get("name", "")
+        if tool in self.uncached_tools:
+            return self._call_upstream(message, None, tool)
+
+        key = request_key(self.service, tool, params.get("arguments"))
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.add_stats(self.service, hits=1)
+            return {"jsonrpc": "2.0", "result": cached}
+
+        with self._lock:
+            leader = self._inflight.get(key)
+            if leader is None:
+                future = Future()  # type: Future
+                self._inflight[key] = future
+        if leader is not None:
+            self.cache.add_stats(self.service, coalesced=1)
+            try:
+                return leader.result(timeout=self.timeout)
+            except FutureTimeout:
+                raise ProxyError("等待合并请求超时（{}秒）".format(self.timeout))
+
+        try:
+            # 上一个领导者可能在首次查询缓存之后才写入结果
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.add_stats(self.service, hits=1)
+                response = {"jsonrpc": "2.0", "result": cached}
+            else:
+                self.cache.add_stats(self.service, misses=1)
+                response = self._call_upstream(message, key, tool)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if not future.done():
+                # KeyboardInterrupt 等非 Exception 异常：不能让等待者一直等到超时
+                future.set_exception(ProxyError("合并请求的领导者已中断"))
+        return response
+
+    def _call_upstream(self, message: Dict, key: Optional[str], tool: str) -> Dict:
+        self.limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = self.upstream.request(message, self.timeout)
+        except Exception:
+            self.cache.add_stats(self.service, upstream_calls=1, upstream_errors=1)
+            raise
+        elapsed = time.perf_counter() - start
+        self.cache.add_stats(self.service, upstream_calls=1,
+                             upstream_seconds_total=elapsed,
+                             upstream_seconds_max=elapsed)
+
+        result = response.get("result")
+        # 只缓存成功的结果，错误和 isError 结果下次仍请求上游
+        if key is not None and isinstance(result, dict) and not result.get("isError"):
+            evicted = self.cache.put(key, self.service, tool, result)
+            if evicted:
+                self.cache.add_stats(self.service, evictions=evicted)
+        return response
+
+
+class StdoutWriter(object):
+    """线程安全地向 stdout 写 JSON-RPC 消息（每行一条）"""
+
+    def __init__(self, stream=None):
+        self._stream = stream or sys.stdout.buffer
+        self._lock = threading.Lock()
+
+    def write(self, message: Dict):
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._stream.write(data)
+            self._stream.flush()
+
+
+def log(message: str):
+    """日志输出到 stderr（stdout 专用于 MCP 协议）"""
+    sys.stderr.write("[mcp-cache-proxy] {}\n".format(message))
+    sys.stderr.flush()
+
+
+def format_stats(stats: Dict[str, Dict]) -> str:
+    lines = [
+        "=== MCP 缓存代理统计 ===",
+        "",
+        "| 服务 | 命中 | 未命中 | 合并 | 命中率 | 上游调用 | 上游错误 | 平均延迟(秒) | 最大延迟(秒) | 缓存条目 | 缓存大小 |",
+        "|------|------|--------|------|--------|----------|----------|--------------|--------------|----------|----------|",
+    ]
+    for service in sorted(stats):
+        s = stats[service]
+        hits = int(s.get("hits", 0))
+        misses = int(s.get("misses", 0))
+        coalesced = int(s.get("coalesced", 0))
+        requests = hits + misses + coalesced
+        calls = int(s.get("upstream_calls", 0))
+        ok_calls = calls - int(s.get("upstream_errors", 0))
+        avg = s.get("upstream_seconds_total", 0) / ok_calls if ok_calls else 0
+        lines.append("| {} | {} | {} | {} | {} | {} | {} | {:.2f} | {:.2f} | {} | {:.1f}KB |".format(
+            service, hits, misses, coalesced,
+            "{:.1%}".format((hits + coalesced) / requests) if requests else "-",
+            calls, int(s.get("upstream_errors", 0)), avg,
+            s.get("upstream_seconds_max", 0), int(s.get("entries", 0) or 0),
+            (s.get("bytes", 0) or 0) / 1024.0,
+        ))
+    return "\n".join(lines)
+
+
+def serve(args):
+    """以 stdio MCP 服务方式运行代理"""
+    upstream_cmd = args.upstream_command
+    if upstream_cmd and upstream_cmd[0] == "--":
+        upstream_cmd = upstream_cmd[1:]
+    if bool(upstream_cmd) == bool(args.url):
+        log("必须且只能指定一种上游：'-- <command>' 或 --url")
+        sys.exit(2)
+
+    cache = ResponseCache(args.cache, args.ttl_hours * 3600, int(args.max_mb * 1024 * 1024))
+    writer = StdoutWriter()
+    if args.url:
+        headers = {}
+        for header in args.header or []:
+            name, _, value = header.partition(":")
+            headers[name.strip()] = value.strip()
+        upstream = HttpUpstream(args.url, headers)
+    else:
+        upstream = StdioUpstream(upstream_cmd, on_notification=writer.write)
+
+    proxy = CachingProxy(args.service, upstream, cache,
+                         RateLimiter(args.rate, args.burst),
+                         timeout=args.timeout,
+                         uncached_tools=args.no_cache_tool or ())
+    log("服务 {} 已启动，缓存：{}".format(args.service, args.cache))
+
+    def handle(message):
+        writer.write(proxy.handle_request(message))
+
+    pool = ThreadPoolExecutor(max_workers=HANDLER_THREADS)
+    try:
+        for raw in iter(sys.stdin.buffer.readline, b""):
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line.decode("utf-8"))
+            except ValueError:
+                writer.write({"jsonrpc": "2.0", "id": None,
+                              "error": {"code": -32700, "message": "Parse error"}})
+                continue
+            if "method" not in message:
+                continue  # 客户端对上游请求的响应，代理不转发上游请求，忽略即可
+            if "id" in message:
+                pool.submit(handle, message)
+            else:
+                upstream.notify(message)
+    finally:
+        pool.shutdown(wait=True)
+        upstream.close()
+        log(format_stats({args.service: cache.stats().get(args.service, {})}))
+        cache.close()
+
+
+def stub_upstream(args):
+    """
+    确定性的桩 MCP 服务，用于离线验证代理
+
+    提供一个 `echo` 工具，按 --latency 延迟后返回参数和调用序号，
+    通过序号可以判断请求是否真正到达了上游。
+    """
+    counter = itertools.count(1)
+    lock = threading.Lock()
+    out = StdoutWriter()
+
+    def reply(message):
+        method = message.get("method")
+        if method == "initialize":
+            result = {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "stub-upstream", "version": "1.0"},
+            }
+        elif method == "tools/list":
+            result = {"tools": [{
+                "name": "echo",
+                "description": "返回输入参数",
+                "inputSchema": {"type": "object"},
+            }]}
+        elif method == "tools/call":
+            time.sleep(args.latency)
+            with lock:
+                call = next(counter)
+            arguments = (message.get("params") or {}).get("arguments") or {}
+            result = {
+                "content": [{"type": "text", "text": json.dumps(
+                    {"call": call, "arguments": arguments}, ensure_ascii=False)}],
+                "isError": bool(arguments.get("fail")),
+            }
+        elif method == "ping":
+            result = {}
+        else:
+            out.write({"jsonrpc": "2.0", "id": message["id"],
+                       "error": {"code": -32601, "message": "Method not found"}})
+            return
+        out.write({"jsonrpc": "2.0", "id": message["id"], "result": result})
+
+    pool = ThreadPoolExecutor(max_workers=HANDLER_THREADS)
+    for raw in iter(sys.stdin.buffer.readline, b""):
+        line = raw.strip()
+        if not line:
+            continue
+        message = json.loads(line.decode("utf-8"))
+        if "id" in message and "method" in message:
+            pool.submit(reply, message)
+    pool.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 缓存代理（SQLite 缓存、请求合并、限速）")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="SQLite 缓存文件路径")
+    sub = parser.add_subparsers(dest="command")
+
+    p_serve = sub.add_parser("serve", help="以 stdio MCP 服务方式运行代理")
+    p_serve.add_argument("--service", required=True, help="服务名称（如 exa、google-patents-mcp）")
+    p_serve.add_argument("--url", help="HTTP 上游地址")
+    p_serve.add_argument("--header", action="append", help="HTTP 上游请求头，格式 'Name: value'")
+    p_serve.add_argument("--ttl-hours", type=float, default=DEFAULT_TTL_HOURS,
+                         help="缓存有效期（小时，0 表示不过期）")
+    p_serve.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB, help="本服务的缓存容量上限（MB）")
+    p_serve.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                         help="上游限速（每秒请求数，0 表示不限速）")
+    p_serve.add_argument("--burst", type=int, default=DEFAULT_BURST, help="限速允许的突发请求数")
+    p_serve.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="上游超时（秒）")
+    p_serve.add_argument("--no-cache-tool", action="append", help="不缓存的工具名（可多次指定）")
+    p_serve.add_argument("upstream_command", nargs=argparse.REMAINDER,
+                         help="stdio 上游命令（放在 -- 之后）")
+
+    sub.add_parser("stats", help="查看缓存命中率和上游延迟")
+
+    p_clear = sub.add_parser("clear", help="清空缓存")
+    p_clear.add_argument("--service", help="只清空指定服务")
+
+    p_stub = sub.add_parser("stub-upstream", help="运行用于离线验证的桩 MCP 服务")
+    p_stub.add_argument("--latency", type=float, default=0.2, help="每次工具调用的延迟（秒）")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    elif args.command == "stats":
+        if not os.path.exists(args.cache):
+            print("📭 缓存文件不存在：{}".format(args.cache))
+            return
+        cache = ResponseCache(args.cache, 0, 0)
+        print(format_stats(cache.stats()))
+        cache.close()
+    elif args.command == "clear":
+        if os.path.exists(args.cache):
+            cache = ResponseCache(args.cache, 0, 0)
+            cache.clear(args.service)
+            cache.close()
+        print("✅ 缓存已清空{}".format("：" + args.service if args.service else ""))
+    elif args.command == "stub-upstream":
+        stub_upstream(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
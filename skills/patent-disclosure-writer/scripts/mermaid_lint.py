@@ -0,0 +1,959 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mermaid 附图检查器
+
+按 diagram-validator 子代理的检查清单，确定性地检查 `10_附图说明.md`
+和章节文件中的全部 Mermaid 代码块：
+
+- 代码块语法：```mermaid 开始、``` 结束，图表类型声明（graph/flowchart、sequenceDiagram）
+- 节点定义：节点ID字符、标签括号配对、标签内未加引号的括号
+- 箭头连接：箭头语法、箭头两端节点已定义
+- sequenceDiagram：participant、消息、Note 语法，loop/alt/opt/par 块嵌套
+- subgraph：subgraph/end 配对、direction 取值
+- 附图标记：图N 的标记在 N00-N99 范围内、同图内连续不重复、
+  `父标记-子编号` 格式及子编号连续、全文档唯一
+  - 节点、参与者、子图取标签末尾的标记；连线、消息、Note 只取 `<br/>` 后单独一行的标记
+  - sequenceDiagram 的消息和时间标注各自连续，参与者标记按十位分配不检查连续性
+
+输出与 diagram-validator 相同结构的验证报告，问题位置精确到行号和列号。
+
+用法：
+    python mermaid_lint.py [directory_or_files ...] [--level standard] [--format markdown|json]
+                           [--trace trace.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from figure_utils import iter_figure_headings, iter_mermaid_blocks, read_text
+from trace_events import NULL_TRACER, tracer_for
+
+ERROR = "error"
+WARNING = "warning"
+
+LEVELS = ("basic", "standard", "strict")
+
+GRAPH_HEADER_RE = re.compile(r"^(graph|flowchart)(?:\s+(TB|TD|BT|RL|LR))?\s*;?$")
+DIRECTION_RE = re.compile(r"^direction\s+(\S+)$")
+VALID_DIRECTIONS = ("TB", "TD", "BT", "RL", "LR")
+NODE_ID_RE = re.compile(r"[A-Za-z0-9_]+")
+ID_CHARS_RE = re.compile(r"[^\s\[\]{}()<>|&;:\-=.\"]+")
+SKIP_GRAPH_RE = re.compile(r"^(classDef|class|style|linkStyle|click)\b")
+SUBGRAPH_RE = re.compile(r"^subgraph(?:\s+(.*))?$")
+
+# 节点形状（按从长到短的顺序匹配）
+SHAPES = [
+    ("(((", ")))"),
+    ("((", "))"),
+    ("([", "])"),
+    ("[(", ")]"),
+    ("[[", "]]"),
+    ("[/", "/]"),
+    ("[\\", "\\]"),
+    ("[/", "\\]"),
+    ("[\\", "/]"),
+    ("{{", "}}"),
+    ("[", "]"),
+    ("{", "}"),
+    ("(", ")"),
+    (">", "]"),
+]
+BRACKET_CHARS = set("[]{}()")
+
+LINK_RE = re.compile(
+    r"<?(?:"
+    r"--\s*[^-|>\s][^|>]*?\s*-{2,}[>xo]?"    # -- 文本 -->
+    r"|==\s*[^=|>\s][^|>]*?\s*={2,}[>xo]?"  # == 文本 ==>
+    r"|-\.\s*[^.\-|>\s][^|>]*?\s*\.-+>?"    # -. 文本 .->
+    r"|-\.+-[>xo]?"                     # -.->、-.-
+    r"|={2,}[>xo]?"                     # ==>、===
+    r"|-{2,}[>xo]?"                     # -->、---
+    r")(?:\s*\|[^|]*\|)?"
+)
+BAD_LINK_RE = re.compile(r"-{2,}>>|(?<![-.=])->(?!>)|=>(?!>)")
+
+SEQ_PARTICIPANT_RE = re.compile(r"^(participant|actor)\s+(.+?)(?:\s+as\s+(.+))?$")
+SEQ_MESSAGE_RE = re.compile(
+    r"^([^\s:+\-<>]+?)\s*(-->>|->>|-->|->|--x|-x|--\)|-\))\s*([+-]?)\s*([^\s:]+)\s*(:)?\s*(.*)$"
+)
+SEQ_NOTE_RE = re.compile(
+    r"^[Nn]ote\s+(?:over\s+([^:,]+?)(?:\s*,\s*([^:]+?))?|(?:left|right)\s+of\s+([^:]+?))\s*:\s*(.+)$"
+)
+SEQ_BLOCK_OPEN = ("loop", "alt", "opt", "par", "critical", "break", "rect")
+SEQ_BLOCK_MIDDLE = {"else": ("alt",), "and": ("par",), "option": ("critical",)}
+SEQ_OTHER_RE = re.compile(
+    r"^(autonumber|title\b|activate\s+\S+|deactivate\s+\S+|create\s+|destroy\s+|box\b|link\s|links\s)"
+)
+
+MARK_TOKEN_RE = re.compile(r"^(\d{3,4})(?:-(\d{1,2}))?$")
+LABEL_SPLIT_RE = re.compile(r"<br\s*/?>|[\s（）():：,，、\"']+")
+# 连线、消息和注释的标记必须单独占一行（`消息1<br/>621`），
+# 文字中的普通数字（如 `返回 HTTP 404`）不是附图标记
+TEXT_OWNERS = ("link", "message", "note")
+TEXT_MARK_RE = re.compile(r"<br\s*/?>\s*(\d{3,4}(?:-\d{1,2})?)\s*$")
+
+DEFAULT_CHAPTER_PATTERNS = [
+    "03_*.md", "04_*.md", "05_*.md", "06_*.md", "07_*.md", "10_*.md",
+]
+
+
+class Issue(object):
+    """检查发现的问题"""
+
+    __slots__ = ("severity", "category", "message", "suggestion", "path",
+                 "line", "column", "figure")
+
+    def __init__(self, severity, category, message, suggestion, path, line, column,
+                 figure=None):
+        self.severity = severity
+        self.category = category
+        self.message = message
+        self.suggestion = suggestion
+        self.path = path
+        self.line = line
+        self.column = column
+        self.figure = figure
+
+    def as_dict(self) -> Dict:
+        return {
+            "severity": self.severity,
+            "category": self.category,
+            "message": self.message,
+            "suggestion": self.suggestion,
+            "file": self.path,
+            "line": self.line,
+            "column": self.column,
+            "figure": self.figure,
+        }
+
+
+class Mark(object):
+    __slots__ = ("parent", "sub", "text", "line", "column", "owner")
+
+    def __init__(self, parent, sub, text, line, column, owner):
+        self.parent = parent
+        self.sub = sub
+        self.text = text
+        self.line = line
+        self.column = column
+        self.owner = owner
+
+    @property
+    def element(self) -> bool:
+        """标记属于节点、参与者或子图（而非连线、消息、注释）"""
+        return self.owner not in TEXT_OWNERS
+
+
+class BlockResult(object):
+    """单个 Mermaid 代码块的检查结果"""
+
+    def __init__(self, path, block):
+        self.path = path
+        self.block = block
+        self.diagram_type = None  # type: Optional[str]
+        self.issues = []  # type: List[Issue]
+        self.marks = []  # type: List[Mark]
+
+    @property
+    def figure(self) -> Optional[int]:
+        return self.block.figure_number
+
+    def add(self, severity, category, message, suggestion, line, column):
+        self.issues.append(Issue(severity, category, message, suggestion, self.path,
+                                 line, column, self.figure))
+
+
+def _strip_comment(line: str) -> str:
+    index = line.find("%%")
+    return line if index < 0 else line[:index]
+
+
+def _label_marks(result: BlockResult, label: str, line: int, column: int, owner: str):
+    """从标签末尾提取附图标记（如 `设备上电<br/>401`、`从属设备 101-1`、`消息1<br/>621`）"""
+    if owner in TEXT_OWNERS and not TEXT_MARK_RE.search(label.strip().strip('"')):
+        return
+    tokens = [t for t in LABEL_SPLIT_RE.split(label.strip().strip('"')) if t]
+    if not tokens:
+        return
+    last = tokens[-1]
+    match = MARK_TOKEN_RE.match(last)
+    if not match:
+        return
+    offset = label.rfind(last)
+    result.marks.append(Mark(
+        parent=int(match.group(1)),
+        sub=int(match.group(2)) if match.group(2) else None,
+        text=last,
+        line=line,
+        column=column + max(offset, 0),
+        owner=owner,
+    ))
+
+
+# ---------------------------------------------------------------------------
+# graph / flowchart
+# ---------------------------------------------------------------------------
+
+def _match_shape(text: str, pos: int) -> Optional[Tuple[str, str]]:
+    for opener, closer in SHAPES:
+        if text.startswith(opener, pos):
+            # [/ 和 [\ 的两种闭合方式都合法，取先出现的那个
+            if opener in ("[/", "[\\"):
+                ends = [(text.find(c, pos + 2), c) for c in ("/]", "\\]")]
+                ends = [e for e in ends if e[0] >= 0]
+                if ends:
+                    return opener, min(ends)[1]
+            return opener, closer
+    return None
+
+
+def _find_closer(text: str, start: int, closer: str) -> int:
+    """查找标签闭合位置（跳过引号内的内容）"""
+    i = start
+    in_quote = False
+    while i < len(text):
+        ch = text[i]
+        if ch == '"':
+            in_quote = not in_quote
+        elif not in_quote and text.startswith(closer, i):
+            return i
+        i += 1
+    return -1
+
+
+class _GraphState(object):
+    def __init__(self):
+        self.defined = {}  # type: Dict[str, Tuple[int, int]]
+        self.referenced = []  # type: List[Tuple[str, int, int]]
+        self.subgraphs = []  # type: List[Tuple[str, int, int]]
+        self.subgraph_ids = set()
+
+
+def _parse_node(result: BlockResult, state: _GraphState, text: str, pos: int,
+                line_no: int, col_base: int) -> int:
+    """解析一个节点（ID + 可选形状），返回解析结束位置"""
+    match = ID_CHARS_RE.match(text, pos)
+    if not match:
+        result.add(ERROR, "node", "此处应为节点ID",
+                   "节点ID只能使用字母、数字和下划线", line_no, col_base + pos)
+        return -1
+    node_id = match.group(0)
+    if not NODE_ID_RE.fullmatch(node_id):
+        result.add(ERROR, "node", "节点ID '{}' 包含非法字符".format(node_id),
+                   "节点ID只能使用字母、数字和下划线，中文请写在标签中：A[中文标签]",
+                   line_no, col_base + pos)
+    pos = match.end()
+
+    shape = _match_shape(text, pos)
+    if shape is None:
+        state.referenced.append((node_id, line_no, col_base + match.start()))
+        return pos
+
+    opener, closer = shape
+    label_start = pos + len(opener)
+    end = _find_closer(text, label_start, closer)
+    if end < 0:
+        result.add(ERROR, "syntax", "节点 '{}' 的标签括号不配对（缺少 '{}'）".format(node_id, closer),
+                   "确保标签以 '{}' 结束".format(closer), line_no, col_base + pos)
+        return -1
+    label = text[label_start:end]
+    stripped = label.strip()
+    quoted = len(stripped) >= 2 and stripped[0] == '"' and stripped[-1] == '"'
+    if not quoted:
+        for offset, ch in enumerate(label):
+            if ch in BRACKET_CHARS:
+                result.add(ERROR, "special_char",
+                           "节点 '{}' 的标签中包含未加引号的括号 '{}'".format(node_id, ch),
+                           "用双引号包裹标签（A[\"文本(说明)\"]），或改用全角括号",
+                           line_no, col_base + label_start + offset)
+                break
+    if stripped.count('"') % 2:
+        result.add(ERROR, "special_char", "节点 '{}' 的标签引号不配对".format(node_id),
+                   "检查标签中的双引号", line_no, col_base + label_start)
+
+    state.defined.setdefault(node_id, (line_no, col_base + match.start()))
+    _label_marks(result, label, line_no, col_base + label_start, node_id)
+    return end + len(closer)
+
+
+def _parse_statement(result: BlockResult, state: _GraphState, text: str,
+                     line_no: int, col_base: int):
+    """解析一条节点/连线语句：A[x] --> B{y} -->|z| C & D"""
+    pos = 0
+    expect_node = True
+    while True:
+        while pos < len(text) and text[pos] in " \t":
+            pos += 1
+        if pos >= len(text):
+            if expect_node and pos > 0:
+                result.add(ERROR, "arrow", "箭头缺少目标节点", "在箭头后补充目标节点",
+                           line_no, col_base + pos)
+            return
+        if expect_node:
+            pos = _parse_node(result, state, text, pos, line_no, col_base)
+            if pos < 0:
+                return
+            expect_node = False
+            continue
+
+        if text[pos] == "&":
+            pos += 1
+            expect_node = True
+            continue
+
+        bad = BAD_LINK_RE.match(text, pos)
+        link = LINK_RE.match(text, pos)
+        if bad and (link is None or bad.end() > link.end()):
+            result.add(ERROR, "arrow", "箭头语法错误：'{}'".format(bad.group(0)),
+                       "使用 -->、-.->、==> 或 -->|标签|", line_no, col_base + pos)
+            return
+        if link is None:
+            result.add(ERROR, "syntax", "无法识别的内容：'{}'".format(text[pos:pos + 20]),
+                       "检查节点定义和箭头语法", line_no, col_base + pos)
+            return
+        label = re.search(r"\|([^|]*)\|\s*$", link.group(0))
+        if label:
+            _label_marks(result, label.group(1), line_no, col_base + pos + label.start(1),
+                         "link")
+        pos = link.end()
+        expect_node = True
+
+
+def _lint_graph(result: BlockResult, lines: List[Tuple[int, str]]):
+    state = _GraphState()
+    for line_no, raw in lines:
+        code = _strip_comment(raw)
+        indent = len(code) - len(code.lstrip())
+        for statement in code.split(";"):
+            text = statement.strip()
+            col = indent + 1
+            if not text:
+                continue
+            sub = SUBGRAPH_RE.match(text)
+            if sub:
+                title = (sub.group(1) or "").strip()
+                sub_id = title
+                bracket = re.match(r"^(.*?)\s*\[(.*)\]$", title)
+                if bracket:
+                    sub_id = bracket.group(1)
+                    _label_marks(result, bracket.group(2), line_no,
+                                 col + text.find("[") + 1, sub_id)
+                elif title:
+                    _label_marks(result, title, line_no, col + len("subgraph "), title)
+                if not title:
+                    result.add(ERROR, "subgraph", "subgraph 缺少标题",
+                               "使用 subgraph 标题 或 subgraph ID [标题]", line_no, col)
+                state.subgraphs.append((sub_id, line_no, col))
+                state.subgraph_ids.add(sub_id.split()[0] if sub_id else sub_id)
+                continue
+            if text == "end":
+                if not state.subgraphs:
+                    result.add(ERROR, "subgraph", "多余的 end（没有对应的 subgraph）",
+                               "删除多余的 end 或补充 subgraph", line_no, col)
+                else:
+                    state.subgraphs.pop()
+                continue
+            direction = DIRECTION_RE.match(text)
+            if direction:
+                if direction.group(1) not in VALID_DIRECTIONS:
+                    result.add(ERROR, "subgraph",
+                               "direction 取值 '{}' 无效".format(direction.group(1)),
+                               "使用 TB、TD、BT、RL 或 LR", line_no, col)
+                continue
+            if SKIP_GRAPH_RE.match(text):
+                continue
+            _parse_statement(result, state, text, line_no, col)
+
+    for sub_id, line_no, col in state.subgraphs:
+        result.add(ERROR, "subgraph", "subgraph '{}' 没有以 end 结束".format(sub_id),
+                   "在 subgraph 内容之后补充 end", line_no, col)
+
+    reported = set()
+    for node_id, line_no, col in state.referenced:
+        if node_id in state.defined or node_id in state.subgraph_ids or node_id in reported:
+            continue
+        reported.add(node_id)
+        result.add(WARNING, "arrow", "节点 '{}' 未定义标签".format(node_id),
+                   "为节点定义标签：{}[名称]，或检查节点ID拼写".format(node_id), line_no, col)
+
+
+# ---------------------------------------------------------------------------
+# sequenceDiagram
+# ---------------------------------------------------------------------------
+
+def _lint_sequence(result: BlockResult, lines: List[Tuple[int, str]]):
+    participants = {}  # type: Dict[str, Tuple[int, int]]
+    used = []  # type: List[Tuple[str, int, int]]
+    blocks = []  # type: List[Tuple[str, int, int]]
+
+    for line_no, raw in lines:
+        code = _strip_comment(raw)
+        text = code.strip()
+        if not text:
+            continue
+        col = len(code) - len(code.lstrip()) + 1
+        keyword = text.split()[0]
+
+        if keyword in ("participant", "actor"):
+            match = SEQ_PARTICIPANT_RE.match(text)
+            if not match:
+                result.add(ERROR, "sequence", "参与者声明语法错误",
+                           "使用 participant 名称 as 标签", line_no, col)
+                continue
+            name = match.group(2).strip()
+            participants.setdefault(name, (line_no, col))
+            label = match.group(3) or name
+            _label_marks(result, label, line_no, col + text.find(label), name)
+            continue
+
+        if keyword in SEQ_BLOCK_OPEN:
+            blocks.append((keyword, line_no, col))
+            continue
+        if keyword in SEQ_BLOCK_MIDDLE:
+            allowed = SEQ_BLOCK_MIDDLE[keyword]
+            if not blocks or blocks[-1][0] not in allowed:
+                result.add(ERROR, "sequence",
+                           "'{}' 只能出现在 {} 块中".format(keyword, "/".join(allowed)),
+                           "检查 alt/else、par/and 的嵌套关系", line_no, col)
+            continue
+        if text == "end":
+            if not blocks:
+                result.add(ERROR, "sequence", "多余的 end（没有对应的块）",
+                           "删除多余的 end 或补充 loop/alt/opt/par", line_no, col)
+            else:
+                blocks.pop()
+            continue
+        if keyword.lower() == "note":
+            match = SEQ_NOTE_RE.match(text)
+            if not match:
+                result.add(ERROR, "sequence", "Note 语法错误",
+                           "使用 Note over A,B: 文本、Note right of A: 文本 或 Note left of A: 文本",
+                           line_no, col)
+                continue
+            for name in (match.group(1), match.group(2), match.group(3)):
+                if name:
+                    used.append((name.strip(), line_no, col))
+            _label_marks(result, match.group(4), line_no, col + text.rfind(match.group(4)), "note")
+            continue
+        if SEQ_OTHER_RE.match(text):
+            continue
+
+        match = SEQ_MESSAGE_RE.match(text)
+        if match:
+            if not match.group(5):
+                result.add(ERROR, "sequence", "消息缺少冒号和消息内容",
+                           "使用 A->>B: 消息", line_no, col)
+                continue
+            used.append((match.group(1), line_no, col))
+            used.append((match.group(4), line_no, col + text.find(match.group(4), match.end(2))))
+            _label_marks(result, match.group(6), line_no, col + text.rfind(match.group(6)),
+                         "message")
+            continue
+
+        result.add(ERROR, "sequence", "无法识别的语句：'{}'".format(text[:30]),
+                   "检查消息语法 A->>B: 消息 或块结构关键字", line_no, col)
+
+    for keyword, line_no, col in blocks:
+        result.add(ERROR, "sequence", "'{}' 块没有以 end 结束".format(keyword),
+                   "在块内容之后补充 end", line_no, col)
+
+    if participants:
+        reported = set()
+        for name, line_no, col in used:
+            if name not in participants and name not in reported:
+                reported.add(name)
+                result.add(WARNING, "arrow", "参与者 '{}' 未声明".format(name),
+                           "添加 participant {} as 标签".format(name), line_no, col)
+
+
+# ---------------------------------------------------------------------------
+# 代码块与附图标记
+# ---------------------------------------------------------------------------
+
+def lint_block(path: str, block) -> BlockResult:
+    """检查单个 Mermaid 代码块的语法并提取附图标记"""
+    result = BlockResult(path, block)
+    if block.end_line is None:
+        result.add(ERROR, "fence", "Mermaid 代码块没有以 ``` 结束",
+                   "在代码块末尾补充 ```", block.start_line, 1)
+
+    lines = [(block.start_line + i + 1, line) for i, line in enumerate(block.source.splitlines())]
+    body = [(n, l) for n, l in lines if _strip_comment(l).strip()]
+    if not body:
+        result.add(ERROR, "fence", "Mermaid 代码块为空", "补充图表代码", block.start_line, 1)
+        return result
+
+    header_no, header = body[0]
+    header_text = _strip_comment(header).strip()
+    header_col = len(header) - len(header.lstrip()) + 1
+    if header_text == "sequenceDiagram":
+        result.diagram_type = "sequenceDiagram"
+        _lint_sequence(result, body[1:])
+    elif GRAPH_HEADER_RE.match(header_text):
+        match = GRAPH_HEADER_RE.match(header_text)
+        result.diagram_type = "graph {}".format(match.group(2)) if match.group(2) else match.group(1)
+        if not match.group(2):
+            result.add(WARNING, "fence", "图表方向未声明",
+                       "使用 graph TD/TB/LR 声明方向", header_no, header_col)
+        _lint_graph(result, body[1:])
+    else:
+        first = header_text.split()[0] if header_text else ""
+        if first in ("graph", "flowchart"):
+            result.add(ERROR, "fence", "图表方向 '{}' 无效".format(header_text[len(first):].strip()),
+                       "使用 graph TD、graph TB 或 graph LR", header_no, header_col)
+            _lint_graph(result, body[1:])
+        else:
+            result.add(ERROR, "fence", "图表类型声明错误：'{}'".format(header_text[:30]),
+                       "第一行应为 graph TD/TB/LR 或 sequenceDiagram", header_no, header_col)
+    return result
+
+
+def _is_figure_description(path: str) -> bool:
+    return os.path.basename(path).startswith("10_")
+
+
+def _distinct_figures(results: List[BlockResult]) -> List[BlockResult]:
+    """同一附图同时出现在附图说明和章节文件中时，只保留一个文件中的代码块
+
+    优先保留章节文件；同一编号出现在多个章节文件中由 check_figure_headings 报告。
+    """
+    sources = {}  # type: Dict[int, str]
+    for result in results:
+        if result.figure is None:
+            continue
+        current = sources.get(result.figure)
+        if current is None or (_is_figure_description(current) and
+                               not _is_figure_description(result.path)):
+            sources[result.figure] = result.path
+    return [r for r in results if r.figure is not None and sources[r.figure] == r.path]
+
+
+def _sequence_group(result: BlockResult, mark: Mark) -> Optional[str]:
+    """
+    连续性检查的分组
+
+    sequenceDiagram 的参与者、消息、时间标注分段编号（600/610/620、621-679、680-699），
+    消息和时间标注各自连续；参与者按十位递增，不检查连续性。
+    """
+    if result.diagram_type != "sequenceDiagram":
+        return "all"
+    if mark.element:
+        return None
+    return mark.owner
+
+
+def check_marks(results: List[BlockResult]) -> List[Issue]:
+    """检查附图标记范围、同图连续性、子编号格式以及全文档唯一性"""
+    issues = []  # type: List[Issue]
+
+    by_figure = OrderedDict()  # type: OrderedDict[int, List[Tuple[BlockResult, Mark]]]
+    for result in _distinct_figures(results):
+        figure = result.figure
+        for mark in result.marks:
+            by_figure.setdefault(figure, []).append((result, mark))
+            low, high = figure * 100, figure * 100 + 99
+            if not low <= mark.parent <= high:
+                issues.append(Issue(
+                    ERROR, "mark_range",
+                    "标记 {} 超出图{}的范围 {}-{}".format(mark.text, figure, low, high),
+                    "图{}的标记应使用 {}-{}".format(figure, low, high),
+                    result.path, mark.line, mark.column, figure))
+
+    owners = {}  # type: Dict[int, Tuple[int, BlockResult, Mark]]
+    for figure, entries in by_figure.items():
+        parents = OrderedDict()  # type: OrderedDict[int, Tuple[BlockResult, Mark]]
+        groups = OrderedDict()  # type: OrderedDict[str, List[int]]
+        subs = {}  # type: Dict[int, List[Tuple[int, BlockResult, Mark]]]
+        for result, mark in entries:
+            if mark.sub is not None:
+                subs.setdefault(mark.parent, []).append((mark.sub, result, mark))
+                continue
+            seen = parents.get(mark.parent)
+            # 同一节点可在多处带标签出现；消息、注释、连线的标记每处都是不同要素
+            if seen is not None and (seen[0] is not result or seen[1].owner != mark.owner or
+                                     not mark.element):
+                issues.append(Issue(
+                    ERROR, "mark_unique",
+                    "图{}中标记 {} 重复（已用于第{}行）".format(figure, mark.text, seen[1].line),
+                    "为每个要素分配不同的标记", result.path, mark.line, mark.column, figure))
+                continue
+            parents.setdefault(mark.parent, (result, mark))
+            group = _sequence_group(result, mark)
+            if group is not None and mark.parent // 100 == figure:
+                groups.setdefault(group, []).append(mark.parent)
+
+            other = owners.get(mark.parent)
+            if other is not None and other[0] != figure:
+                issues.append(Issue(
+                    ERROR, "mark_unique",
+                    "标记 {} 同时用于图{}和图{}".format(mark.text, other[0], figure),
+                    "检查跨图标记冲突", result.path, mark.line, mark.column, figure))
+            owners.setdefault(mark.parent, (figure, result, mark))
+
+        for group in groups.values():
+            numbers = sorted(set(group))
+            missing = [n for n in range(numbers[0], numbers[-1] + 1) if n not in parents]
+            if missing:
+                result, mark = parents[numbers[-1]]
+                issues.append(Issue(
+                    WARNING, "mark_sequence",
+                    "图{}标记不连续，缺少：{}".format(figure, "、".join(str(n) for n in missing)),
+                    "同一幅图内的标记应连续递增", result.path, mark.line, mark.column, figure))
+
+        for parent, items in subs.items():
+            numbers = sorted(set(n for n, _, _ in items))
+            result, mark = items[0][1], items[0][2]
+            if parent not in parents:
+                issues.append(Issue(
+                    WARNING, "mark_sub",
+                    "子标记 {} 的父标记 {} 未在图{}中使用".format(mark.text, parent, figure),
+                    "子要素标记格式为 父标记-子编号，父标记需对应一个要素",
+                    result.path, mark.line, mark.column, figure))
+            expected = list(range(1, len(numbers) + 1))
+            if numbers != expected:
+                issues.append(Issue(
+                    WARNING, "mark_sub",
+                    "标记 {} 的子编号不连续：{}".format(parent, "、".join(str(n) for n in numbers)),
+                    "子编号应从1开始连续递增（{0}-1、{0}-2……）".format(parent),
+                    result.path, mark.line, mark.column, figure))
+    return issues
+
+
+def check_figure_headings(paths: List[str], results: List[BlockResult]) -> List[Issue]:
+    """检查附图编号重复以及没有附图标题的代码块"""
+    issues = []  # type: List[Issue]
+    seen = {}  # type: Dict[int, Tuple[str, int]]
+    for path in paths:
+        for heading in iter_figure_headings(read_text(path)):
+            if _is_figure_description(path):
+                continue  # 附图说明文件与章节文件描述的是同一批附图
+            if heading.number in seen:
+                first = seen[heading.number]
+                issues.append(Issue(
+                    ERROR, "mark_unique",
+                    "附图编号 图{} 重复（首次出现在 {}:{}）".format(
+                        heading.number, os.path.basename(first[0]), first[1]),
+                    "运行 figure_renumber.py 重新编号", path, heading.line, 1, heading.number))
+            else:
+                seen[heading.number] = (path, heading.line)
+    for result in results:
+        if result.figure is None:
+            issues.append(Issue(
+                WARNING, "fence", "Mermaid 代码块前没有附图标题",
+                "在代码块前添加 #### 附图N：名称", result.path,
+                result.block.start_line, 1, None))
+    return issues
+
+
+def check_unlabelled_fences(path: str, text: str) -> List[Issue]:
+    """检查未声明 mermaid 语言但内容是 Mermaid 图表的代码块"""
+    issues = []
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        stripped = lines[i].strip()
+        if stripped.startswith("```"):
+            lang = stripped[3:].strip()
+            start = i
+            i += 1
+            while i < len(lines) and lines[i].strip() != "```":
+                i += 1
+            if lang.lower() != "mermaid" and start + 1 < len(lines):
+                first = lines[start + 1].strip()
+                if first == "sequenceDiagram" or first.split(" ")[0] in ("graph", "flowchart"):
+                    issues.append(Issue(
+                        ERROR, "fence",
+                        "代码块包含 Mermaid 图表但未以 ```mermaid 开始",
+                        "将代码块开头改为 ```mermaid", path, start + 1, 1, None))
+        i += 1
+    return issues
+
+
+def collect_files(targets: List[str]) -> List[str]:
+    files = []  # type: List[str]
+    for target in targets:
+        if os.path.isdir(target):
+            for pattern in DEFAULT_CHAPTER_PATTERNS:
+                files.extend(sorted(glob.glob(os.path.join(target, pattern))))
+        elif os.path.isfile(target):
+            files.append(target)
+    seen = set()
+    unique = []
+    for f in files:
+        if f not in seen:
+            seen.add(f)
+            unique.append(f)
+    return unique
+
+
+def lint_files(paths: List[str], level: str = "standard",
+               expected: Optional[int] = None, tracer=NULL_TRACER) -> Dict:
+    """检查文件中的全部 Mermaid 代码块，返回验证报告数据"""
+    results = []  # type: List[BlockResult]
+    issues = []  # type: List[Issue]
+    for path in paths:
+        with tracer.span("lint_file", file=os.path.basename(path)):
+            text = read_text(path)
+            issues.extend(check_unlabelled_fences(path, text))
+            for block in iter_mermaid_blocks(text):
+                result = lint_block(path, block)
+                results.append(result)
+                issues.extend(result.issues)
+
+    if level != "basic":
+        with tracer.span("check_marks", diagrams=len(results)):
+            issues.extend(check_marks(results))
+        with tracer.span("check_figure_headings"):
+            issues.extend(check_figure_headings(paths, results))
+
+    issues.sort(key=lambda i: (i.path, i.line, i.column))
+    figures = OrderedDict()  # type: OrderedDict[Tuple, Dict]
+    for result in results:
+        key = (result.figure if result.figure is not None else "?", result.path,
+               result.block.index)
+        block_issues = [i for i in issues if i.path == result.path and
+                        result.block.start_line <= i.line <= (result.block.end_line or i.line)]
+        figures[key] = {
+            "figure": result.figure,
+            "title": result.block.figure_title,
+            "file": result.path,
+            "line": result.block.start_line,
+            "diagram_type": result.diagram_type,
+            "syntax_ok": not any(i.severity == ERROR and not i.category.startswith("mark")
+                                 for i in block_issues),
+            "marks_ok": not any(i.category.startswith("mark") and i.severity == ERROR
+                                for i in block_issues),
+            "marks": [m.text for m in result.marks],
+        }
+
+    errors = sum(1 for i in issues if i.severity == ERROR)
+    warnings = len(issues) - errors
+    figure_numbers = set(f["figure"] for f in figures.values() if f["figure"] is not None)
+    complete = expected is None or len(figure_numbers) >= expected
+    passed = errors == 0 and complete and (level != "strict" or warnings == 0)
+    return {
+        "validation_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "level": level,
+        "files": paths,
+        "expected": expected,
+        "total_diagrams": len(results),
+        "figures": list(figures.values()),
+        "syntax_ok": sum(1 for f in figures.values() if f["syntax_ok"]),
+        "marks_ok": sum(1 for f in figures.values() if f["marks_ok"]),
+        "errors": errors,
+        "warnings": warnings,
+        "complete": complete,
+        "passed": passed,
+        "issues": [i.as_dict() for i in issues],
+    }
+
+
+CATEGORY_NAMES = {
+    "fence": "代码块语法",
+    "node": "节点定义",
+    "arrow": "箭头连接",
+    "sequence": "sequenceDiagram 语法",
+    "subgraph": "subgraph 语法",
+    "special_char": "特殊字符",
+    "syntax": "语法错误",
+    "mark_range": "标记范围",
+    "mark_sequence": "标记连续性",
+    "mark_unique": "标记唯一性",
+    "mark_sub": "子要素标记",
+}
+
+
+def _location(issue: Dict) -> str:
+    return "{}:{}:{}".format(os.path.basename(issue["file"]), issue["line"], issue["column"])
+
+
+def format_markdown(report: Dict) -> str:
+    """按 diagram-validator 的报告格式输出 Markdown"""
+    out = []
+    expected = report["expected"]
+    total = report["total_diagrams"]
+    figures = report["figures"]
+    issues = report["issues"]
+
+    out.append("# 专利附图质量验证报告")
+    out.append("")
+    out.append("## 一、验证概要")
+    out.append("")
+    out.append("- **验证时间**：{}".format(report["validation_time"]))
+    out.append("- **验证级别**：{}".format(report["level"]))
+    out.append("- **附图说明文件**：{}".format("、".join(report["files"]) or "（无）"))
+    out.append("")
+    out.append("## 二、验证结果统计")
+    out.append("")
+    out.append("- **总图表数**：{}{}".format(total, "/{}".format(expected) if expected else ""))
+    out.append("- **语法正确**：{}".format(report["syntax_ok"]))
+    out.append("- **语法错误**：{}".format(total - report["syntax_ok"]))
+    out.append("- **标记规范**：{}".format(report["marks_ok"]))
+    out.append("- **标记问题**：{}".format(total - report["marks_ok"]))
+    out.append("- **完整性检查**：{}".format("通过" if report["complete"] else "失败"))
+    out.append("")
+    out.append("## 三、详细验证结果")
+    out.append("")
+    out.append("### 3.1 图表完整性")
+    out.append("")
+    out.append("| 附图编号 | 附图名称 | 图表类型 | 状态 | 说明 |")
+    out.append("|---------|---------|---------|------|------|")
+    for f in figures:
+        ok = f["syntax_ok"] and f["marks_ok"]
+        out.append("| {} | {} | {} | {} | {}:{} |".format(
+            "图{}".format(f["figure"]) if f["figure"] is not None else "-",
+            f["title"] or "-", f["diagram_type"] or "未知", "✓" if ok else "✗",
+            os.path.basename(f["file"]), f["line"]))
+    out.append("")
+
+    out.append("### 3.2 Mermaid 语法验证")
+    out.append("")
+    out.append("#### 通过的图表")
+    passed = [f for f in figures if f["syntax_ok"]]
+    for f in passed:
+        out.append("- {}：语法正确".format(
+            "图{}".format(f["figure"]) if f["figure"] is not None else
+            "{}:{}".format(os.path.basename(f["file"]), f["line"])))
+    if not passed:
+        out.append("- 无")
+    out.append("")
+    out.append("#### 存在问题的图表")
+    out.append("")
+    syntax_issues = [i for i in issues if not i["category"].startswith("mark")]
+    if not syntax_issues:
+        out.append("无")
+        out.append("")
+    for issue in syntax_issues:
+        figure = "图{}".format(issue["figure"]) if issue["figure"] is not None else "未编号代码块"
+        out.append("**{}**".format(figure))
+        out.append("- **问题类型**：{}（{}）".format(
+            CATEGORY_NAMES.get(issue["category"], issue["category"]),
+            "错误" if issue["severity"] == ERROR else "警告"))
+        out.append("- **问题描述**：{}".format(issue["message"]))
+        out.append("- **位置**：{}".format(_location(issue)))
+        out.append("- **修复建议**：{}".format(issue["suggestion"]))
+        out.append("")
+
+    if report["level"] != "basic":
+        out.append("### 3.3 标记系统验证")
+        out.append("")
+        out.append("#### 标记范围检查")
+        numbers = sorted(set(f["figure"] for f in figures if f["figure"] is not None))
+        for n in numbers:
+            bad = [i for i in issues if i["category"] == "mark_range" and i["figure"] == n]
+            out.append("- {} 图{}标记范围：{}-{} [{}]".format(
+                "✗" if bad else "✓", n, n * 100, n * 100 + 99, "失败" if bad else "通过"))
+        out.append("")
+        out.append("#### 标记唯一性检查")
+        dup = [i for i in issues if i["category"] == "mark_unique"]
+        if dup:
+            for i in dup:
+                out.append("- ✗ {}（{}）".format(i["message"], _location(i)))
+        else:
+            out.append("- ✓ 所有标记唯一 [通过]")
+        out.append("")
+        out.append("#### 标记连续性检查")
+        for n in numbers:
+            bad = [i for i in issues if i["category"] in ("mark_sequence", "mark_sub")
+                   and i["figure"] == n]
+            if bad:
+                for i in bad:
+                    out.append("- ✗ {}（{}）".format(i["message"], _location(i)))
+            else:
+                out.append("- ✓ 图{}标记连续 [通过]".format(n))
+        out.append("")
+
+    out.append("## 四、修复建议")
+    out.append("")
+    must = [i for i in issues if i["severity"] == ERROR]
+    should = [i for i in issues if i["severity"] == WARNING]
+    out.append("### 优先级1：必须修复")
+    for n, i in enumerate(must, 1):
+        out.append("{}. [{}] {} - {}".format(n, _location(i), i["message"], i["suggestion"]))
+    if not must:
+        out.append("无")
+    out.append("")
+    out.append("### 优先级2：建议修复")
+    for n, i in enumerate(should, 1):
+        out.append("{}. [{}] {} - {}".format(n, _location(i), i["message"], i["suggestion"]))
+    if not should:
+        out.append("无")
+    out.append("")
+
+    out.append("## 五、验证结论")
+    out.append("")
+    if report["passed"] and not should:
+        verdict, action = "优秀", "通过"
+    elif report["passed"]:
+        verdict, action = "良好", "通过"
+    elif report["errors"] <= 3:
+        verdict, action = "需改进", "修改后重新验证"
+    else:
+        verdict, action = "需改进", "重新生成"
+    out.append("- **总体评价**：{}".format(verdict))
+    out.append("- **建议操作**：{}".format(action))
+
+    if report["level"] != "basic":
+        out.append("")
+        out.append("## 六、附录")
+        out.append("")
+        out.append("### 6.1 标记清单")
+        for f in figures:
+            if f["marks"]:
+                out.append("- {}：{}".format(
+                    "图{}".format(f["figure"]) if f["figure"] is not None else "-",
+                    "、".join(f["marks"])))
+    return "\n".join(out) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查 Mermaid 附图的语法和附图标记")
+    parser.add_argument("targets", nargs="*", default=["."],
+                        help="章节目录或 Markdown 文件（默认当前目录）")
+    parser.add_argument("--level", choices=LEVELS, default="standard",
+                        help="basic 只检查语法；standard 增加标记检查；strict 警告也视为不通过")
+    parser.add_argument("--expected", type=int, help="预期的附图数量")
+    parser.add_argument("--format", choices=["markdown", "json"], default="markdown",
+                        help="输出格式")
+    parser.add_argument("--output", help="报告输出文件（默认输出到终端）")
+    parser.add_argument("--trace", help="输出 Chrome Trace 格式的阶段耗时（JSON）")
+    args = parser.parse_args()
+
+    files = collect_files(args.targets)
+    if not files:
+        print("❌ 错误：未找到需要检查的 Markdown 文件")
+        print("📄 路径: {}".format("、".join(args.targets)))
+        sys.exit(2)
+
+    tracer = tracer_for(args.trace, "mermaid_lint")
+    report = lint_files(files, level=args.level, expected=args.expected, tracer=tracer)
+    if args.trace:
+        tracer.write(args.trace)
+    if args.format == "json":
+        content = json.dumps(report, ensure_ascii=False, indent=2) + "\n"
+    else:
+        content = format_markdown(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(content)
+        print("{} 附图检查{}：{} 个错误，{} 个警告".format(
+            "✅" if report["passed"] else "❌", "通过" if report["passed"] else "未通过",
+            report["errors"], report["warnings"]))
+        print("📄 验证报告: {}".format(args.output))
+    else:
+        sys.stdout.write(content)
+
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
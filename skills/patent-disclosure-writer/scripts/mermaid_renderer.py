@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mermaid 附图渲染器（带内容寻址缓存）
+
+将 Markdown 中的 Mermaid 代码块渲染为 PNG，输出到 `diagram_images/`：
+
+- 渲染结果按「Mermaid 源码 + 主题 + 输出尺寸 + mmdc 版本」的哈希缓存在
+  `diagram_images/.mermaid_cache/` 下，未修改的附图不会重新渲染
+- 未命中缓存的附图按批次分配给多个 mmdc 进程并行渲染，每个进程
+  只启动一次浏览器，批次内的所有附图共用该浏览器实例
+- 指定 `--print-dpi` 时按打印分辨率和页面宽度渲染，渲染结果经
+  image_optimizer 裁剪留白、压缩后再写入缓存
+- 渲染失败的附图会删除 `diagram_images/` 中上一次留下的同名图片，
+  插入步骤（docx_pipeline.py）找不到图片时报错，不会插入过期的附图
+
+用法：
+    python mermaid_renderer.py <markdown_file> <images_dir> [--workers 3] [--print-dpi 300]
+                               [--trace trace.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from figure_utils import MermaidBlock, iter_mermaid_blocks, read_text
+from image_optimizer import DEFAULT_PRINT_WIDTH, ImageOptimizeError, optimize_png
+from trace_events import NULL_TRACER, tracer_for
+
+CACHE_DIRNAME = ".mermaid_cache"
+CACHE_SCHEMA_VERSION = 1
+
+# 300 DPI × 5 英寸（A4 页面内的附图宽度）
+DEFAULT_WIDTH = 1500
+DEFAULT_HEIGHT = 1000
+DEFAULT_THEME = "default"
+DEFAULT_BACKGROUND = "white"
+DEFAULT_WORKERS = 3
+# 浏览器 CSS 像素的分辨率，打印渲染时 scale = DPI / 96
+CSS_DPI = 96
+
+
+class RenderError(Exception):
+    """Mermaid 渲染失败"""
+
+
+class RenderOptions(object):
+    """影响渲染结果的参数，全部参与缓存键计算"""
+
+    def __init__(self, theme=DEFAULT_THEME, width=DEFAULT_WIDTH,
+                 height=DEFAULT_HEIGHT, scale=1, background=DEFAULT_BACKGROUND,
+                 print_dpi=None):
+        self.theme = theme
+        self.width = int(width)
+        self.height = int(height)
+        self.scale = scale
+        self.background = background
+        self.print_dpi = print_dpi
+
+    @classmethod
+    def for_print(cls, dpi: int, print_width: float = DEFAULT_PRINT_WIDTH, **kwargs):
+        """按打印分辨率渲染：视口为页面宽度（CSS 像素），scale 放大到目标 DPI"""
+        return cls(width=int(round(print_width * CSS_DPI)), scale=dpi / float(CSS_DPI),
+                   print_dpi=dpi, **kwargs)
+
+    @property
+    def max_pixel_width(self) -> int:
+        return int(round(self.width * self.scale))
+
+    def as_dict(self) -> Dict:
+        options = {
+            "theme": self.theme,
+            "width": self.width,
+            "height": self.height,
+            "scale": self.scale,
+            "background": self.background,
+        }
+        if self.print_dpi:
+            # 未启用打印优化时保持原有的缓存键
+            options["print_dpi"] = self.print_dpi
+        return options
+
+
+class MmdcRenderer(object):
+    """
+    基于 mermaid-cli 的批量渲染器
+
+    一次 mmdc 调用以 Markdown 作为输入，渲染其中全部 Mermaid 代码块，
+    浏览器只启动一次。
+    """
+
+    def __init__(self, mmdc="mmdc", puppeteer_config=None, timeout=300):
+        self.mmdc = mmdc
+        self.puppeteer_config = puppeteer_config
+        self.timeout = timeout
+        self._version = None  # type: Optional[str]
+
+    @property
+    def executable(self) -> str:
+        """mmdc 的完整路径（Windows 下 npm 安装的是 mmdc.cmd，需要按 PATHEXT 查找）"""
+        return shutil.which(self.mmdc) or self.mmdc
+
+    @property
+    def version(self) -> str:
+        """mmdc 版本号（参与缓存键，升级 mermaid-cli 后缓存自动失效）"""
+        if self._version is None:
+            try:
+                result = subprocess.run(
+                    [self.executable, "--version"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    universal_newlines=True,
+                    timeout=60,
+                )
+            except (OSError, subprocess.TimeoutExpired):
+                raise RenderError("mermaid-cli 未安装或无法执行：{}".format(self.mmdc))
+            self._version = result.stdout.strip() or "unknown"
+        return self._version
+
+    def render_batch(self, sources: Sequence[str], workdir: str,
+                     options: RenderOptions) -> List[str]:
+        """渲染一批 Mermaid 源码，按输入顺序返回 PNG 路径"""
+        input_path = os.path.join(workdir, "batch.md")
+        output_path = os.path.join(workdir, "batch_out.md")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for source in sources:
+                f.write("```mermaid\n{}\n```\n\n".format(source))
+
+        cmd = [
+            self.executable,
+            "-i", input_path,
+            "-o", output_path,
+            "-e", "png",
+            "-t", options.theme,
+            "-w", str(options.width),
+            "-H", str(options.height),
+            "-s", str(options.scale),
+            "-b", options.background,
+        ]
+        if self.puppeteer_config:
+            cmd += ["-p", self.puppeteer_config]
+
+        try:
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                timeout=self.timeout,
+            )
+        except OSError:
+            raise RenderError("mermaid-cli 未安装或无法执行：{}".format(self.mmdc))
+        except subprocess.TimeoutExpired:
+            raise RenderError("mermaid-cli 渲染超时（{}秒）".format(self.timeout))
+        if result.returncode != 0:
+            raise RenderError(result.stderr.strip() or "mmdc 返回码 {}".format(result.returncode))
+
+        images = [
+            os.path.join(workdir, "batch_out-{}.png".format(i))
+            for i in range(1, len(sources) + 1)
+        ]
+        missing = [p for p in images if not os.path.exists(p)]
+        if missing:
+            raise RenderError("mmdc 未生成预期的图片：{}".format(", ".join(missing)))
+        return images
+
+
+def cache_key(source: str, options: RenderOptions, renderer_version: str) -> str:
+    """计算渲染缓存键"""
+    normalized = "\n".join(line.rstrip() for line in source.strip().splitlines())
+    payload = json.dumps(
+        {
+            "schema": CACHE_SCHEMA_VERSION,
+            "source": normalized,
+            "options": options.as_dict(),
+            "renderer": renderer_version,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def image_filename(block: MermaidBlock, part: int = 1) -> str:
+    """
+    附图图片文件名：`图N_名称.png`，无附图编号时使用代码块序号
+
+    同一附图标题下有多个代码块时，第2个起加序号：`图N_名称_2.png`。
+    """
+    if block.figure_number is None:
+        return "mermaid_{}.png".format(block.index)
+    title = block.figure_title
+    for ch in '\\/:*?"<>|':
+        title = title.replace(ch, "_")
+    stem = "图{}_{}".format(block.figure_number, title) if title else "图{}".format(block.figure_number)
+    if part > 1:
+        stem += "_{}".format(part)
+    return stem + ".png"
+
+
+def image_filenames(blocks: Sequence[MermaidBlock]) -> List[str]:
+    """按顺序返回全部代码块的图片文件名（同一附图的多个代码块互不覆盖）"""
+    parts = {}  # type: Dict[int, int]
+    names = []
+    for block in blocks:
+        part = 1
+        if block.figure_number is not None:
+            part = parts.get(block.figure_number, 0) + 1
+            parts[block.figure_number] = part
+        names.append(image_filename(block, part))
+    return names
+
+
+class MermaidRenderCache(object):
+    """按内容寻址的渲染缓存，并行渲染未命中的附图"""
+
+    def __init__(self, images_dir: str, renderer=None, options=None,
+                 workers=DEFAULT_WORKERS, tracer=NULL_TRACER):
+        self.images_dir = images_dir
+        self.cache_dir = os.path.join(images_dir, CACHE_DIRNAME)
+        self.renderer = renderer or MmdcRenderer()
+        self.options = options or RenderOptions()
+        self.workers = max(1, int(workers))
+        self.tracer = tracer
+
+    def cached_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def render_blocks(self, blocks: Sequence[MermaidBlock]) -> Dict:
+        """渲染全部代码块并返回渲染报告"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self.tracer.span("renderer_version"):
+            version = self.renderer.version
+
+        with self.tracer.span("cache_lookup", blocks=len(blocks)):
+            entries, pending, sources = self._lookup(blocks, version)
+
+        start = time.perf_counter()
+        with self.tracer.span("render", pending=len(pending)):
+            self._render_pending(pending, sources)
+        total_render = time.perf_counter() - start
+
+        with self.tracer.span("publish"):
+            for entry in entries:
+                self._publish(entry)
+
+        hits = sum(1 for e in entries if e["cache"] == "hit")
+        misses = len(entries) - hits
+        return {
+            "render_timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "renderer_version": version,
+            "options": self.options.as_dict(),
+            "workers": self.workers,
+            "total_diagrams": len(entries),
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "failed": sum(1 for e in entries if e["status"] != "success"),
+            "render_seconds": round(total_render, 3),
+            "renders": entries,
+        }
+
+    def _lookup(self, blocks: Sequence[MermaidBlock], version: str):
+        """计算缓存键，返回 (全部条目, 未命中的条目, 缓存键 → 源码)"""
+        entries = []
+        pending = {}  # type: Dict[str, List[Dict]]
+        for block, filename in zip(blocks, image_filenames(blocks)):
+            key = cache_key(block.source, self.options, version)
+            entry = {
+                "diagram_number": "图{}".format(block.figure_number)
+                if block.figure_number is not None else None,
+                "diagram_name": block.figure_title,
+                "block_index": block.index,
+                "line": block.start_line,
+                "cache_key": key,
+                "cache": "hit" if os.path.exists(self.cached_path(key)) else "miss",
+                "render_seconds": 0.0,
+                "image_path": os.path.join(self.images_dir, filename),
+                "status": "success",
+            }
+            entries.append(entry)
+            if entry["cache"] == "miss":
+                pending.setdefault(key, []).append(entry)
+
+        sources = {}
+        for block, entry in zip(blocks, entries):
+            sources.setdefault(entry["cache_key"], block.source)
+        return entries, pending, sources
+
+    def _render_pending(self, pending: Dict[str, List[Dict]], sources: Dict[str, str]):
+        """将未命中的附图分成若干批次，每批由一个渲染进程完成"""
+        keys = list(pending)
+        if not keys:
+            return
+        batch_count = min(self.workers, len(keys))
+        batches = [keys[i::batch_count] for i in range(batch_count)]
+
+        def render(batch_keys, span):
+            workdir = tempfile.mkdtemp(prefix="mermaid_", dir=self.cache_dir)
+            try:
+                with self.tracer.span(span, figures=len(batch_keys)):
+                    images = self.renderer.render_batch(
+                        [sources[k] for k in batch_keys], workdir, self.options
+                    )
+                for key, image in zip(batch_keys, images):
+                    # 先写临时文件再原子替换，避免并发进程读到半个文件
+                    tmp = self.cached_path(key) + ".tmp"
+                    if self.options.print_dpi:
+                        self._optimize(image, tmp, pending[key])
+                    else:
+                        shutil.copyfile(image, tmp)
+                    os.replace(tmp, self.cached_path(key))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        def run(batch_keys):
+            start = time.perf_counter()
+            errors = {}  # type: Dict[str, str]
+            try:
+                render(batch_keys, "render_batch")
+            except (RenderError, ImageOptimizeError) as e:
+                if len(batch_keys) == 1:
+                    errors[batch_keys[0]] = str(e)
+                else:
+                    # 一幅附图有语法错误会导致整批失败，逐幅重试，只把出错的附图标记为失败
+                    for key in batch_keys:
+                        try:
+                            render([key], "render_retry")
+                        except (RenderError, ImageOptimizeError) as retry_error:
+                            errors[key] = str(retry_error)
+            # 批次内共用一个浏览器，单图耗时按批次平均计算
+            per_figure = (time.perf_counter() - start) / len(batch_keys)
+            for key in batch_keys:
+                for entry in pending[key]:
+                    entry["render_seconds"] = round(per_figure, 3)
+                    if key in errors:
+                        entry["status"] = "failed"
+                        entry["error"] = errors[key]
+
+        with ThreadPoolExecutor(max_workers=batch_count) as pool:
+            list(pool.map(run, batches))
+
+    def _optimize(self, image: str, target: str, entries: List[Dict]):
+        """裁剪、缩放到打印宽度并压缩，记录优化前后的字节数"""
+        with open(image, "rb") as f:
+            data = f.read()
+        with self.tracer.span("optimize_image", bytes=len(data)):
+            optimized, steps = optimize_png(data, max_width=self.options.max_pixel_width,
+                                            dpi=self.options.print_dpi)
+        with open(target, "wb") as f:
+            f.write(optimized)
+        for entry in entries:
+            entry["original_bytes"] = len(data)
+            entry["optimized_bytes"] = len(optimized)
+            entry["optimize_steps"] = steps
+
+    def _publish(self, entry: Dict):
+        """
+        从缓存复制到 `diagram_images/图N_名称.png`（内容相同则跳过）
+
+        渲染失败的附图删除上一次留下的同名图片，避免插入步骤把旧图当作新结果使用。
+        """
+        target = entry["image_path"]
+        if entry["status"] != "success":
+            if os.path.exists(target):
+                os.remove(target)
+                entry["stale_image_removed"] = True
+            return
+        source = self.cached_path(entry["cache_key"])
+        if os.path.exists(target) and os.path.getsize(target) == os.path.getsize(source):
+            with open(source, "rb") as a, open(target, "rb") as b:
+                if a.read() == b.read():
+                    return
+        shutil.copyfile(source, target)
+
+
+def render_markdown(markdown_path: str, images_dir: str, renderer=None,
+                    options=None, workers=DEFAULT_WORKERS, tracer=NULL_TRACER) -> Dict:
+    """渲染 Markdown 文件中的全部 Mermaid 附图"""
+    with tracer.span("extract_blocks"):
+        blocks = list(iter_mermaid_blocks(read_text(markdown_path)))
+    cache = MermaidRenderCache(images_dir, renderer=renderer, options=options,
+                               workers=workers, tracer=tracer)
+    report = cache.render_blocks(blocks)
+    report["markdown_file"] = markdown_path
+    return report
+
+
+def print_report(report: Dict):
+    """打印渲染统计"""
+    print("=== Mermaid 附图渲染报告 ===")
+    print("✅ 总附图数: {}".format(report["total_diagrams"]))
+    print("♻️  缓存命中: {}".format(report["cache_hits"]))
+    print("🎨 重新渲染: {}".format(report["cache_misses"]))
+    if report["failed"]:
+        print("❌ 渲染失败: {}".format(report["failed"]))
+    optimized = [e for e in report["renders"] if "optimized_bytes" in e]
+    if optimized:
+        before = sum(e["original_bytes"] for e in optimized)
+        after = sum(e["optimized_bytes"] for e in optimized)
+        print("💾 图片优化: {:.1f} KB → {:.1f} KB（{} 幅新渲染附图）".format(
+            before / 1024.0, after / 1024.0, len(optimized)))
+    print("⏱️  渲染耗时: {:.2f}秒（{}个并行渲染进程）".format(
+        report["render_seconds"], report["workers"]))
+    print()
+    for entry in report["renders"]:
+        label = entry["diagram_number"] or "代码块{}".format(entry["block_index"])
+        if entry["status"] != "success":
+            removed = "（已删除旧图片）" if entry.get("stale_image_removed") else ""
+            print("  ❌ {} 渲染失败{}: {}".format(label, removed, entry.get("error", "")))
+        elif entry["cache"] == "hit":
+            print("  ♻️  {} 缓存命中 -> {}".format(label, entry["image_path"]))
+        else:
+            print("  🎨 {} 渲染 {:.2f}秒 -> {}".format(
+                label, entry["render_seconds"], entry["image_path"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染 Markdown 中的 Mermaid 附图（带缓存）")
+    parser.add_argument("markdown_file", help="交底书或附图说明 Markdown 文件")
+    parser.add_argument("images_dir", help="图片输出目录（通常为 diagram_images）")
+    parser.add_argument("--theme", default=DEFAULT_THEME, help="Mermaid 主题")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="输出宽度（像素）")
+    parser.add_argument("--height", type=int, default=DEFAULT_HEIGHT, help="输出高度（像素）")
+    parser.add_argument("--scale", type=float, default=1, help="缩放倍数")
+    parser.add_argument("--background", default=DEFAULT_BACKGROUND, help="背景颜色")
+    parser.add_argument("--print-dpi", type=int,
+                        help="按打印分辨率渲染并优化图片（如 300，忽略 --width/--scale）")
+    parser.add_argument("--print-width", type=float, default=DEFAULT_PRINT_WIDTH,
+                        help="附图打印宽度（英寸，配合 --print-dpi 使用）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="并行渲染进程数（每个进程保持一个浏览器实例）")
+    parser.add_argument("--mmdc", default="mmdc", help="mermaid-cli 可执行文件")
+    parser.add_argument("--puppeteer-config", help="传递给 mmdc 的 puppeteer 配置文件")
+    parser.add_argument("--report", help="渲染报告 JSON 输出路径")
+    parser.add_argument("--trace", help="输出 Chrome Trace 格式的阶段耗时（JSON）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.markdown_file):
+        print("❌ 错误：Markdown 文件不存在")
+        print("📄 路径: {}".format(args.markdown_file))
+        sys.exit(1)
+
+    os.makedirs(args.images_dir, exist_ok=True)
+    if args.print_dpi:
+        options = RenderOptions.for_print(
+            args.print_dpi,
+            args.print_width,
+            theme=args.theme,
+            height=args.height,
+            background=args.background,
+        )
+    else:
+        options = RenderOptions(
+            theme=args.theme,
+            width=args.width,
+            height=args.height,
+            scale=args.scale,
+            background=args.background,
+        )
+    renderer = MmdcRenderer(mmdc=args.mmdc, puppeteer_config=args.puppeteer_config)
+    tracer = tracer_for(args.trace, "mermaid_renderer")
+
+    try:
+        report = render_markdown(args.markdown_file, args.images_dir,
+                                 renderer=renderer, options=options,
+                                 workers=args.workers, tracer=tracer)
+    except RenderError as e:
+        print("❌ 错误：{}".format(e))
+        print()
+        print("💡 解决方法：")
+        print("   npm install -g @mermaid-js/mermaid-cli")
+        sys.exit(1)
+    finally:
+        if args.trace:
+            tracer.write(args.trace)
+
+    print_report(report)
+    report_path = args.report or os.path.join(args.images_dir, "render_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print()
+    print("📄 渲染报告: {}".format(report_path))
+
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作目录状态索引（.patent_state.json）
+
+`/patent` 断点续传和 `/patent-update-diagrams` 需要知道哪些章节已生成、
+每个章节包含哪些附图、附图编号是否连续。本工具把这些信息缓存在工作目录的
+`.patent_state.json` 中，每个章节记录：
+
+- 文件大小、修改时间和内容哈希（SHA-256）
+- 附图编号与名称（`#### 附图N：`）
+- Mermaid 代码块的行号和字符偏移
+- 生成该章节的子代理
+
+每次运行只重新读取修改时间或大小变化的文件；修改时间变化但内容不变的文件
+只重新计算哈希，不重新解析。状态报告、附图编号连续性检查和子代理跳过判断
+都直接由索引回答。
+
+并行运行的子代理可能同时执行 `record`，索引的「读取-更新-写入」在锁文件
+`.patent_state.lock` 的系统文件锁（fcntl/msvcrt）保护下串行执行，写入先写临时文件
+再原子替换。持有进程异常退出时系统自动释放文件锁，遗留的锁文件直接复用。
+
+用法：
+    python patent_state.py status [directory] [--json]
+    python patent_state.py figures [directory] [--json]
+    python patent_state.py plan [directory]
+    python patent_state.py record <chapter_file> [--agent title-generator]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+from figure_utils import iter_figure_headings, iter_mermaid_blocks
+
+STATE_FILENAME = ".patent_state.json"
+STATE_VERSION = 1
+LOCK_FILENAME = ".patent_state.lock"
+LOCK_TIMEOUT = 30  # 等待锁的最长时间（秒）
+
+CHAPTER_FILE_RE = re.compile(r"^(\d{2})_.+\.md$")
+
+# 章节编号 → 生成该章节的子代理
+CHAPTER_AGENTS = OrderedDict([
+    ("01", "title-generator"),
+    ("02", "field-analyzer"),
+    ("03", "background-researcher"),
+    ("04", "problem-analyzer"),
+    ("05", "solution-designer"),
+    ("06", "benefit-analyzer"),
+    ("07", "implementation-writer"),
+    ("08", "protection-extractor"),
+    ("09", "reference-collector"),
+    ("10", "diagram-generator"),
+])
+# 可能包含附图的章节，以及必须包含附图的核心章节
+FIGURE_CHAPTERS = ("03", "04", "05", "06", "07")
+CORE_FIGURE_CHAPTERS = ("05", "07")
+REQUIRED_CHAPTERS = tuple("{:02d}".format(n) for n in range(1, 10))
+
+# 修改时间与索引时间过于接近时，同一时间粒度内的再次写入无法从
+# 修改时间上区分，下次检查时重新计算哈希
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+def state_path(directory: str) -> str:
+    return os.path.join(directory, STATE_FILENAME)
+
+
+def _empty_state() -> Dict:
+    return {"version": STATE_VERSION, "chapters": {}}
+
+
+def load_state(directory: str) -> Dict:
+    """读取状态索引，文件不存在、损坏或版本不一致时返回空索引"""
+    try:
+        with open(state_path(directory), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return _empty_state()
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return _empty_state()
+    state.setdefault("chapters", {})
+    return state
+
+
+def _try_lock(fd: int) -> bool:
+    """以非阻塞方式获取文件锁，已被其他进程持有时返回 False"""
+    try:
+        if os.name == "nt":
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _is_current(fd: int, path: str) -> bool:
+    """加锁的文件是否仍是目录中的锁文件（前一个持有者释放时会删除锁文件）"""
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def state_lock(directory: str):
+    """独占状态索引，串行化并行子代理的「读取-更新-写入」
+
+    使用系统文件锁而不是判断锁文件的修改时间：持有进程退出时锁自动释放，
+    不需要由等待者删除「过期」的锁文件，多个等待者之间也就不存在误删
+    他人刚取得的锁的竞争。
+    """
+    path = os.path.join(directory, LOCK_FILENAME)
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        fd = os.open(path, os.O_CREAT | os.O_RDWR)
+        if _try_lock(fd):
+            if _is_current(fd, path):
+                break
+        os.close(fd)
+        if time.monotonic() > deadline:
+            raise TimeoutError("等待状态索引锁超时：{}".format(path))
+        time.sleep(0.05)
+    try:
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        yield
+    finally:
+        if os.name == "nt":
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            os.close(fd)
+            try:
+                os.remove(path)
+            except OSError:  # 其他等待者已打开锁文件，留给它复用
+                pass
+        else:
+            # 先删除再解锁：已打开旧锁文件的等待者取得锁后发现文件已不在目录中，重新打开
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+
+def save_state(directory: str, state: Dict):
+    """原子写入状态索引（以 `_` 开头的键只在内存中使用，不写入文件）"""
+    path = state_path(directory)
+    fd, tmp = tempfile.mkstemp(prefix=STATE_FILENAME + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in state.items() if not k.startswith("_")},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def chapter_files(directory: str) -> List[str]:
+    """返回目录下编号为 01-10 的章节文件名（按编号排序）"""
+    names = []
+    for path in glob.glob(os.path.join(directory, "[0-9][0-9]_*.md")):
+        name = os.path.basename(path)
+        match = CHAPTER_FILE_RE.match(name)
+        if match and match.group(1) in CHAPTER_AGENTS:
+            names.append(name)
+    return sorted(names)
+
+
+def index_chapter(data: bytes) -> Dict:
+    """解析章节内容，提取附图和 Mermaid 代码块信息"""
+    text = data.decode("utf-8-sig")
+    figures = [
+        {"number": h.number, "title": h.title, "line": h.line}
+        for h in iter_figure_headings(text)
+    ]
+    blocks = [
+        {
+            "index": b.index,
+            "figure": b.figure_number,
+            "start_line": b.start_line,
+            "end_line": b.end_line,
+            "start_offset": b.start_offset,
+            "end_offset": b.end_offset,
+            "sha256": hashlib.sha256(b.source.encode("utf-8")).hexdigest(),
+        }
+        for b in iter_mermaid_blocks(text)
+    ]
+    return {
+        "characters": len(text),
+        "figures": figures,
+        "mermaid_blocks": blocks,
+    }
+
+
+def _is_fresh(entry: Dict, st) -> bool:
+    """大小和修改时间均未变化，且修改时间不在索引时间的竞争窗口内"""
+    return (entry.get("size") == st.st_size
+            and entry.get("mtime_ns") == st.st_mtime_ns
+            and st.st_mtime_ns < entry.get("indexed_at_ns", 0) - RACY_WINDOW_NS)
+
+
+def update_state(directory: str, save: bool = True) -> Dict:
+    """
+    增量更新状态索引并返回
+
+    返回的索引带有 `_stats`（不写入文件），记录本次复用、重新哈希、
+    重新解析和移除的文件数量。`save` 为 True 时在锁内读取并写回索引。
+    """
+    if not save:
+        return _refresh_state(directory)
+    with state_lock(directory):
+        state = _refresh_state(directory)
+        if any(state["_stats"][k] for k in ("rehashed", "reparsed", "removed")):
+            save_state(directory, state)
+    return state
+
+
+def _refresh_state(directory: str) -> Dict:
+    state = load_state(directory)
+    old = state["chapters"]
+    chapters = OrderedDict()  # type: OrderedDict[str, Dict]
+    stats = {"reused": 0, "rehashed": 0, "reparsed": 0, "removed": 0}
+
+    for name in chapter_files(directory):
+        path = os.path.join(directory, name)
+        st = os.stat(path)
+        entry = old.get(name)
+        if entry is not None and _is_fresh(entry, st):
+            chapters[name] = entry
+            stats["reused"] += 1
+            continue
+
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        now_ns = time.time_ns()
+        if entry is not None and entry.get("sha256") == digest:
+            entry = dict(entry)
+            stats["rehashed"] += 1
+        else:
+            chapter = CHAPTER_FILE_RE.match(name).group(1)
+            previous_agent = entry.get("agent") if entry else None
+            entry = {
+                "chapter": chapter,
+                "agent": previous_agent or CHAPTER_AGENTS[chapter],
+                "sha256": digest,
+            }
+            entry.update(index_chapter(data))
+            stats["reparsed"] += 1
+        entry["size"] = st.st_size
+        entry["mtime_ns"] = st.st_mtime_ns
+        entry["indexed_at_ns"] = now_ns
+        chapters[name] = entry
+
+    stats["removed"] = len(set(old) - set(chapters))
+    state["chapters"] = chapters
+    state["_stats"] = stats
+    return state
+
+
+def record_chapter(path: str, agent: Optional[str] = None) -> Dict:
+    """子代理写入章节后调用：立即更新该章节的索引并记录生成它的子代理"""
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    with state_lock(directory):
+        state = update_state(directory, save=False)
+        entry = state["chapters"].get(name)
+        if entry is None:
+            raise FileNotFoundError("不是有效的章节文件：{}".format(path))
+        if agent:
+            entry["agent"] = agent
+        save_state(directory, state)
+    return entry
+
+
+# ---------------------------------------------------------------------------
+# 查询
+# ---------------------------------------------------------------------------
+
+def figure_sequence(state: Dict) -> Dict:
+    """按章节顺序汇总附图编号并检查连续性（只统计章节 03-07）"""
+    figures = []
+    seen = {}  # type: Dict[int, str]
+    duplicates = []
+    for name, entry in state["chapters"].items():
+        if entry["chapter"] not in FIGURE_CHAPTERS:
+            continue
+        for figure in entry["figures"]:
+            number = figure["number"]
+            if number in seen:
+                duplicates.append({"number": number, "files": [seen[number], name]})
+            else:
+                seen[number] = name
+            figures.append({"number": number, "title": figure["title"], "file": name})
+    numbers = sorted(seen)
+    missing = [n for n in range(1, numbers[-1] + 1) if n not in seen] if numbers else []
+    return {
+        "figures": figures,
+        "numbers": numbers,
+        "missing": missing,
+        "duplicates": duplicates,
+        "continuous": not missing and not duplicates,
+        "next_number": numbers[-1] + 1 if numbers else 1,
+    }
+
+
+def chapter_status(state: Dict) -> List[Dict]:
+    """每个章节的完成状态：complete、missing、empty 或 no_figures"""
+    by_chapter = {}
+    for name, entry in state["chapters"].items():
+        by_chapter.setdefault(entry["chapter"], (name, entry))
+
+    rows = []
+    for chapter, agent in CHAPTER_AGENTS.items():
+        found = by_chapter.get(chapter)
+        if found is None:
+            rows.append({"chapter": chapter, "file": None, "agent": agent,
+                         "status": "missing", "figures": []})
+            continue
+        name, entry = found
+        if entry["characters"] == 0 or not entry["size"]:
+            status = "empty"
+        elif chapter in CORE_FIGURE_CHAPTERS and not entry["figures"]:
+            status = "no_figures"
+        else:
+            status = "complete"
+        rows.append({
+            "chapter": chapter,
+            "file": name,
+            "agent": entry.get("agent") or agent,
+            "status": status,
+            "figures": [f["number"] for f in entry["figures"]],
+            "mermaid_blocks": len(entry["mermaid_blocks"]),
+        })
+    return rows
+
+
+def execution_plan(state: Dict) -> Dict:
+    """继续执行模式下需要运行和可以跳过的子代理"""
+    rows = [r for r in chapter_status(state) if r["chapter"] in REQUIRED_CHAPTERS]
+    run = [r["agent"] for r in rows if r["status"] in ("missing", "empty")]
+    skip = [r["agent"] for r in rows if r["status"] in ("complete", "no_figures")]
+    stale = [r["file"] for r in rows if r["status"] == "no_figures"]
+    return {
+        "run": run,
+        "skip": skip,
+        "stale": stale,
+        "integrate_only": not run,
+    }
+
+
+def _format_numbers(numbers: List[int]) -> str:
+    return ", ".join("图{}".format(n) for n in numbers)
+
+
+def print_status(state: Dict):
+    rows = chapter_status(state)
+    sequence = figure_sequence(state)
+    done = [r for r in rows if r["status"] == "complete"]
+    todo = [r for r in rows if r["status"] != "complete" and r["chapter"] in REQUIRED_CHAPTERS]
+
+    print("=== 章节状态检测报告 ===")
+    print()
+    print("已完成的章节：")
+    for r in done:
+        if r["figures"]:
+            print("✓ {} - 包含 {} 幅附图（{}）".format(
+                r["file"], len(r["figures"]), _format_numbers(r["figures"])))
+        else:
+            print("✓ {} - 完成".format(r["file"]))
+    if todo:
+        print()
+        print("缺少或需要更新的章节：")
+        reasons = {"missing": "不存在", "empty": "文件为空",
+                   "no_figures": "已存在但无附图（可能是旧版本）"}
+        for r in todo:
+            label = r["file"] or "{}_*.md（{}）".format(r["chapter"], r["agent"])
+            print("✗ {} - {}".format(label, reasons[r["status"]]))
+    print()
+    numbers = sequence["numbers"]
+    if numbers:
+        print("附图统计：共 {} 幅（图{}-图{}）".format(len(numbers), numbers[0], numbers[-1]))
+    else:
+        print("附图统计：无附图")
+    _print_continuity(sequence)
+    stats = state.get("_stats")
+    if stats:
+        print()
+        print("索引：复用 {reused} 个，重新哈希 {rehashed} 个，重新解析 {reparsed} 个，"
+              "移除 {removed} 个".format(**stats))
+
+
+def _print_continuity(sequence: Dict):
+    if sequence["continuous"]:
+        if sequence["numbers"]:
+            print("✓ 附图编号连续，下一个可用编号：{}".format(sequence["next_number"]))
+        return
+    print("⚠ 警告：附图编号不连续")
+    by_file = OrderedDict()  # type: OrderedDict[str, List[int]]
+    for figure in sequence["figures"]:
+        by_file.setdefault(figure["file"], []).append(figure["number"])
+    for name, numbers in by_file.items():
+        print("  - {}: {}".format(name, _format_numbers(numbers)))
+    if sequence["missing"]:
+        print("  缺少：{}".format(_format_numbers(sequence["missing"])))
+    for dup in sequence["duplicates"]:
+        print("  重复：图{}（{}）".format(dup["number"], "、".join(dup["files"])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="维护专利工作目录的章节与附图状态索引")
+    sub = parser.add_subparsers(dest="command")
+
+    for command, help_text in (
+        ("status", "章节完成状态和附图统计"),
+        ("figures", "附图编号连续性（不连续时退出码为1）"),
+        ("plan", "继续执行模式下需要运行/跳过的子代理（JSON）"),
+    ):
+        p = sub.add_parser(command, help=help_text)
+        p.add_argument("directory", nargs="?", default=".", help="章节文件所在目录")
+        if command != "plan":
+            p.add_argument("--json", action="store_true", help="输出 JSON")
+
+    record = sub.add_parser("record", help="子代理写入章节后更新索引")
+    record.add_argument("chapter_file", help="章节文件路径")
+    record.add_argument("--agent", help="生成该章节的子代理名称")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        sys.exit(2)
+
+    if args.command == "record":
+        try:
+            entry = record_chapter(args.chapter_file, agent=args.agent)
+        except (OSError, UnicodeDecodeError) as e:
+            print("❌ 错误：{}".format(e))
+            sys.exit(1)
+        print("✓ {} - {}，{} 幅附图".format(
+            os.path.basename(args.chapter_file), entry["agent"], len(entry["figures"])))
+        return
+
+    if not os.path.isdir(args.directory):
+        print("❌ 错误：目录不存在")
+        print("📄 路径: {}".format(args.directory))
+        sys.exit(1)
+
+    try:
+        state = update_state(args.directory)
+    except UnicodeDecodeError as e:
+        print("❌ 错误：章节文件不是 UTF-8 编码（{}）".format(e))
+        sys.exit(1)
+    except OSError as e:
+        print("❌ 错误：{}".format(e))
+        sys.exit(1)
+
+    if args.command == "status":
+        if args.json:
+            print(json.dumps({"chapters": chapter_status(state),
+                              "figures": figure_sequence(state),
+                              "index": state["_stats"]}, ensure_ascii=False, indent=2))
+        else:
+            print_status(state)
+    elif args.command == "figures":
+        sequence = figure_sequence(state)
+        if args.json:
+            print(json.dumps(sequence, ensure_ascii=False, indent=2))
+        else:
+            _print_continuity(sequence)
+        sys.exit(0 if sequence["continuous"] else 1)
+    else:
+        print(json.dumps(execution_plan(state), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
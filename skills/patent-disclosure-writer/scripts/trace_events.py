@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段耗时追踪（Chrome Trace 格式）
+
+各脚本的 `--trace <file>` 参数使用本模块记录内部阶段的时间线，输出的 JSON
+可以在 Chrome 的 `chrome://tracing` 或 https://ui.perfetto.dev 中打开。
+
+    tracer = Tracer()
+    with tracer.span("load_styles"):
+        ...
+    tracer.write("trace.json")
+
+未启用追踪时使用 NULL_TRACER，`span()` 不记录任何内容。时间戳以系统时间为基准，
+多个进程分别记录的事件可以直接合并到同一条时间线上（见 batch_convert.py）。
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class Tracer(object):
+    """记录完整事件（ph=X），时间戳单位为微秒"""
+
+    def __init__(self, enabled: bool = True, process_name: Optional[str] = None):
+        self.enabled = enabled
+        self.process_name = process_name
+        self.events = []  # type: List[Dict]
+        # 进程内用单调时钟计时，起点对齐到系统时间
+        self._origin = time.perf_counter()
+        self._epoch_us = time.time() * 1e6
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return self._epoch_us + (time.perf_counter() - self._origin) * 1e6
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase", **args):
+        if not self.enabled:
+            yield
+            return
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round(start, 1),
+                "dur": round(self._now_us() - start, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+
+    def to_dict(self, extra_events: Optional[List[Dict]] = None) -> Dict:
+        events = list(self.events) + list(extra_events or [])
+        if self.process_name:
+            events.insert(0, {
+                "name": "process_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "args": {"name": self.process_name},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str, extra_events: Optional[List[Dict]] = None):
+        """写入追踪文件，extra_events 为其它进程记录的事件"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(extra_events), f, ensure_ascii=False)
+
+
+NULL_TRACER = Tracer(enabled=False)
+
+
+def tracer_for(path: Optional[str], process_name: str) -> Tracer:
+    """命令行 `--trace` 参数为空时返回不记录的追踪器"""
+    return Tracer(process_name=process_name) if path else NULL_TRACER
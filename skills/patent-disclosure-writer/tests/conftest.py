@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""测试配置：脚本之间按文件名互相导入，测试时把 scripts 目录加入模块搜索路径"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "scripts"))
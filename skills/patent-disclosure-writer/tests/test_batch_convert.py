@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""批量转换的失败隔离、汇总报告和工作进程异常处理测试"""
+
+import json
+import os
+import re
+import stat
+import sys
+
+import pytest
+
+pytest.importorskip("docx")
+
+import batch_convert
+from test_docx_pipeline import DISCLOSURE, TEMPLATE
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(batch_convert.__file__))
+
+# 代替 mermaid-cli：按输入中的代码块数量输出桩图片，记录每次调用的输入文件
+FAKE_MMDC = """#!{python}
+import os, sys
+sys.path.insert(0, {scripts!r})
+import benchmark
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("fake-1.0")
+    sys.exit(0)
+with open(args[args.index("-i") + 1], encoding="utf-8") as f:
+    source = f.read()
+with open({log!r}, "a", encoding="utf-8") as log:
+    log.write("{{}}\\t{{}}\\n".format(args[args.index("-i") + 1], source.count("```mermaid")))
+if "BROKEN" in source:
+    sys.stderr.write("Parse error\\n")
+    sys.exit(1)
+output = os.path.splitext(args[args.index("-o") + 1])[0]
+for i in range(1, source.count("```mermaid") + 1):
+    with open("{{}}-{{}}.png".format(output, i), "wb") as f:
+        f.write(benchmark.stub_png(600, 300, 2, i))
+"""
+
+COMPLETE = DISCLOSURE.replace("### **（3）有益效果**\n\n不在第4章节内的子项标题按正文处理。\n\n", "") \
+    .replace("## **5. 具体实施方式**", "### **（3）有益效果**\n\n减少了重复渲染的时间。\n\n"
+             "## **5. 具体实施方式**")
+
+
+def _fake_mmdc(tmp_path):
+    path = tmp_path / "mmdc"
+    log = tmp_path / "mmdc.log"
+    path.write_text(FAKE_MMDC.format(python=sys.executable, scripts=SCRIPTS_DIR, log=str(log)),
+                    encoding="utf-8")
+    os.chmod(str(path), os.stat(str(path)).st_mode | stat.S_IEXEC)
+    return str(path), log
+
+
+def _config(mmdc="mmdc", template=TEMPLATE):
+    return {"template": template, "level": "standard", "mmdc": mmdc,
+            "render_workers": 1, "print_dpi": None, "trace": False}
+
+
+def _write(root, relative, text):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="桩 mmdc 依赖 shebang")
+def test_failed_file_does_not_stop_batch(tmp_path):
+    root = tmp_path / "root"
+    _write(root, "a/专利申请技术交底书_正常.md", COMPLETE)
+    _write(root, "b/专利申请技术交底书_语法错误.md", COMPLETE.replace("--> B[结束<br/>202]", "--> BROKEN"))
+    _write(root, "b/专利申请技术交底书_无附图.md",
+           re.sub(r"\*\*附图\d：.*?```\n.*?```\n", "", COMPLETE, flags=re.S))
+    mmdc, log = _fake_mmdc(tmp_path)
+
+    summary = batch_convert.run_batch(str(root), 2, _config(mmdc))
+
+    assert (summary["total_files"], summary["succeeded"], summary["failed"]) == (3, 2, 1)
+    assert summary["files_per_minute"] is not None and summary["average_score"] is not None
+    records = {os.path.basename(r["markdown_file"]): r for r in summary["files"]}
+    failed = records["专利申请技术交底书_语法错误.md"]
+    assert failed["status"] == "failed" and failed["failed_stage"] == "render"
+    assert list(failed["stage_seconds"]) == ["parse", "render"]
+    for name, figures in (("专利申请技术交底书_正常.md", 2), ("专利申请技术交底书_无附图.md", 0)):
+        record = records[name]
+        assert record["status"] == "success" and record["diagrams"] == figures
+        assert record["overall_score"] is not None
+        report = os.path.join(os.path.dirname(record["docx_file"]), "validation_report_{}.json"
+                              .format(name[len("专利申请技术交底书_"):-3]))
+        with open(report, encoding="utf-8") as f:
+            assert json.load(f)["overall_score"] == record["overall_score"]
+
+    # 每幅附图只渲染一次：正常文件一批2幅，语法错误的文件整批失败后逐幅重试
+    calls = [line.split("\t") for line in log.read_text(encoding="utf-8").splitlines()]
+    normal = [int(n) for path, n in calls if "diagram_images_正常" in path]
+    broken = [int(n) for path, n in calls if "diagram_images_语法错误" in path]
+    assert normal == [2]
+    assert sorted(broken) == [1, 1, 2]
+
+
+def test_convert_one_records_errors_in_process(tmp_path):
+    batch_convert._init_worker(_config())
+    markdown = _write(tmp_path, "专利申请技术交底书_缺少图片.md", DISCLOSURE)
+    paths = batch_convert.output_paths(markdown, None, str(tmp_path))
+    batch_convert._worker["renderer"] = None  # 不渲染，直接使用已有图片
+
+    record = batch_convert.convert_one(markdown, paths)
+
+    assert record["status"] == "failed"
+    assert record["failed_stage"] == "insert"
+    assert "seconds" in record
+
+
+def test_worker_start_failure_is_recorded_per_file(tmp_path):
+    root = tmp_path / "root"
+    _write(root, "专利申请技术交底书_一.md", COMPLETE)
+    _write(root, "专利申请技术交底书_二.md", COMPLETE)
+
+    summary = batch_convert.run_batch(str(root), 2, _config(template=str(tmp_path / "缺失.docx")))
+
+    assert (summary["total_files"], summary["failed"]) == (2, 2)
+    assert all(r["status"] == "failed" and r["error"] for r in summary["files"])
+    assert summary["average_score"] is None
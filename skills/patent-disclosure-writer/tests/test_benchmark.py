@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""基准测试框架的子进程超时与工作目录处理测试"""
+
+import os
+import sys
+
+import benchmark
+
+
+def test_measure_kills_stage_after_timeout(tmp_path):
+    run = benchmark.measure([sys.executable, "-c", "import time; time.sleep(60)"],
+                            str(tmp_path), timeout=0.5)
+    assert run["timed_out"]
+    assert run["returncode"] != 0
+    assert run["wall_seconds"] < 10
+    assert "超时" in benchmark._run_error(run)
+
+
+def test_measure_reports_exit_code(tmp_path):
+    run = benchmark.measure([sys.executable, "-c", "print('done'); raise SystemExit(3)"],
+                            str(tmp_path))
+    assert not run["timed_out"]
+    assert run["returncode"] == 3
+    assert run["last_line"] == "done"
+
+
+def test_keep_without_workdir_prints_temp_dir(monkeypatch, capsys):
+    roots = []
+
+    def run_size(name, spec, workdir, *args):
+        roots.append(os.path.dirname(workdir))
+        return {"stages": {}}
+
+    monkeypatch.setattr(benchmark, "run_size", run_size)
+    benchmark.run_benchmark(["small"], keep=True)
+    try:
+        assert os.path.isdir(roots[0])
+        assert roots[0] in capsys.readouterr().out
+    finally:
+        os.rmdir(roots[0])
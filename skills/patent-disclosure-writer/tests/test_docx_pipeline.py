@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""单进程转换流水线测试"""
+
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip("docx")
+
+import benchmark
+import docx_pipeline as dp
+from figure_utils import iter_mermaid_blocks
+from mermaid_renderer import image_filenames
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "templates", "发明、实用新型专利申请交底书 模板.docx")
+
+BODY = "本发明涉及一种基于内容哈希的附图渲染缓存方法，能够避免重复渲染未修改的附图。"
+
+DISCLOSURE = """# 专利申请技术交底书
+
+## **1. 发明创造名称**
+
+一种附图渲染缓存方法
+
+## **2. 所属技术领域**
+
+{body}
+
+## **3. 相关的背景技术**
+
+{body}
+
+## **4. 发明内容**
+
+### **（1）解决的技术问题**
+
+{body}
+
+### **（2）技术方案**
+
+**附图1：系统架构图**
+
+```mermaid
+graph TD
+    A[渲染请求<br/>101] --> B[缓存<br/>102]
+```
+
+图1说明：{body}
+
+## **5. 具体实施方式**
+
+- {body}
+
+**附图2：处理流程图**
+
+```mermaid
+graph TD
+    A[开始<br/>201] --> B[结束<br/>202]
+```
+
+## **6. 关键点和欲保护点**
+
+{body}
+
+### **（3）有益效果**
+
+不在第4章节内的子项标题按正文处理。
+
+## **7. 其他有助于理解本技术的资料**
+
+{body}
+""".format(body=BODY)
+
+
+def _write_images(images_dir, text):
+    blocks = list(iter_mermaid_blocks(text))
+    os.makedirs(str(images_dir), exist_ok=True)
+    for name in image_filenames(blocks):
+        with open(os.path.join(str(images_dir), name), "wb") as f:
+            f.write(benchmark.stub_png(1500, 600, 3, 7))
+
+
+def test_parse_sections_and_figure_owners():
+    parsed = dp.parse_markdown(DISCLOSURE)
+    assert parsed["title"] == "专利申请技术交底书"
+    assert [s["number"] for s in parsed["sections"]] == ["1", "2", "3", "4", "5", "6", "7"]
+    section_4 = parsed["sections"][3]
+    assert [s["number"] for s in section_4["subsections"]] == ["4.1", "4.2"]
+    assert section_4["subsections"][1]["figures"] == [1]
+    assert parsed["sections"][4]["figures"] == [2]
+    assert parsed["sections"][0]["content"] == "一种附图渲染缓存方法"
+    assert parsed["validation"]["missing_subsections"] == ["4.3"]
+    assert not parsed["validation"]["is_complete"]
+
+
+def test_convert_uses_existing_images_and_saves_once(tmp_path):
+    text = DISCLOSURE.replace("### **（3）有益效果**", "")
+    text = text.replace("## **5. 具体实施方式**",
+                        "### **（3）有益效果**\n\n{}\n\n## **5. 具体实施方式**".format(BODY))
+    markdown = tmp_path / "专利申请技术交底书_测试.md"
+    markdown.write_text(text, encoding="utf-8")
+    _write_images(tmp_path / "diagram_images", text)
+    output = tmp_path / "out.docx"
+
+    report = dp.convert_markdown(str(markdown), str(output), dp.load_template(TEMPLATE),
+                                 str(tmp_path / "diagram_images"), level="strict")
+
+    assert list(report["stage_seconds"]) == ["parse", "generate", "insert", "validate", "save"]
+    assert [i["diagram_number"] for i in report["insertions"]] == ["图1", "图2"]
+    assert report["parse_validation"]["is_complete"]
+    checks = report["validation"]["checks"]
+    assert checks["section_completeness"]["passed"]
+    assert checks["font_application"]["passed"]
+    assert checks["paragraph_formatting"]["passed"]
+    quality = checks["content_quality"]["details"]
+    assert (quality["empty_paragraphs"], quality["image_paragraphs"]) == (0, 2)
+    with zipfile.ZipFile(TEMPLATE) as z:
+        template_media = [n for n in z.namelist()
+                          if n.startswith("word/media/") and not n.endswith("/")]
+    with zipfile.ZipFile(str(output)) as z:
+        document = z.read("word/document.xml").decode("utf-8")
+        media = [n for n in z.namelist() if n.startswith("word/media/")]
+    assert document.count("<w:drawing>") == 2
+    # 两幅附图的图片内容相同，python-docx 只保存一个媒体部件
+    assert len(media) == len(template_media) + 1
+    assert os.path.getsize(str(output)) == report["docx_bytes"]
+
+
+def test_missing_image_fails_insert_without_writing(tmp_path):
+    markdown = tmp_path / "专利申请技术交底书_测试.md"
+    markdown.write_text(DISCLOSURE, encoding="utf-8")
+    output = tmp_path / "out.docx"
+    with pytest.raises(dp.StageError) as error:
+        dp.convert_markdown(str(markdown), str(output), dp.load_template(TEMPLATE),
+                            str(tmp_path / "diagram_images"))
+    assert error.value.stage == "insert"
+    assert not output.exists()
+
+
+def test_render_stage_fills_missing_images(tmp_path):
+    markdown = tmp_path / "专利申请技术交底书_测试.md"
+    markdown.write_text(DISCLOSURE, encoding="utf-8")
+    report = dp.convert_markdown(str(markdown), str(tmp_path / "out.docx"),
+                                 dp.load_template(TEMPLATE), str(tmp_path / "diagram_images"),
+                                 renderer=benchmark.StubRenderer())
+    assert report["cache_misses"] == 2
+    assert "render" in report["stage_seconds"]
+    assert len(report["insertions"]) == 2
+
+
+def test_template_is_read_once():
+    assert dp.load_template(TEMPLATE) is dp.load_template(TEMPLATE)
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+流式验证引擎与 python-docx 验证逻辑的一致性测试
+
+参照实现按 docx-validator 子代理的验证逻辑用 python-docx 遍历
+`doc.paragraphs`、`paragraph.text` 和 `paragraph.runs[0]`，两者对同一份
+DOCX 的评分和各类别结果必须相同（标题粗体只来自样式时的差异见
+test_style_inherited_bold_headings）。
+"""
+
+import io
+
+import pytest
+
+docx = pytest.importorskip("docx")
+from docx.enum.text import WD_ALIGN_PARAGRAPH  # noqa: E402
+from docx.shared import Cm, Pt  # noqa: E402
+
+import docx_stream_validator as sv  # noqa: E402
+from benchmark import stub_png  # noqa: E402
+
+SECTION_TITLES = dict(sv.REQUIRED_SECTIONS)
+BODY_TEXT = "所述数据采集模块按照预设周期读取各检测设备上报的状态信息，并写入共享存储区域。"
+
+
+def _has_drawing(para) -> bool:
+    return any(run._r.xpath(".//w:drawing | .//w:pict") for run in para.runs)
+
+
+def reference_validate(data: bytes, level: str = "standard") -> dict:
+    """按 docx-validator 的验证逻辑，用 python-docx 计算各类别结果和总分"""
+    doc = docx.Document(io.BytesIO(data))
+    sections, subsections, lengths = set(), set(), {}
+    current = None
+    title_para = body_para = None
+    title_fonts, body_fonts = set(), set()
+    body = spacing_ok = indent_ok = justify_ok = empty = 0
+    spacing_values = []
+
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if para.runs:
+            font = para.runs[0].font
+            info = (font.name, font.size.pt if font.size else None, bool(font.bold))
+            if info[2]:
+                title_fonts.add(font.name)
+                title_para = title_para or info
+            else:
+                body_fonts.add(font.name)
+                body_para = body_para or info
+        if not text:
+            if not _has_drawing(para):
+                empty += 1
+            continue
+        bold = bool(para.runs and para.runs[0].font.bold)
+        heading = sv.SECTION_RE.match(text)
+        if heading and len(text) <= sv.MAX_HEADING_LENGTH and (
+                SECTION_TITLES[heading.group(1)] in heading.group(2) or bold):
+            sections.add(heading.group(1))
+            current = heading.group(1)
+            lengths.setdefault(current, 0)
+            continue
+        sub = sv.SUBSECTION_RE.match(text)
+        if sub and current == "4" and len(text) <= sv.MAX_HEADING_LENGTH:
+            subsections.add(sub.group(1))
+        if current is not None:
+            lengths[current] += len(text)
+        if bold:
+            continue
+        body += 1
+        fmt = para.paragraph_format
+        if fmt.line_spacing is not None:
+            spacing_values.append(fmt.line_spacing)
+            if abs(fmt.line_spacing - sv.LINE_SPACING) <= sv.LINE_SPACING_TOLERANCE:
+                spacing_ok += 1
+        if fmt.alignment == WD_ALIGN_PARAGRAPH.JUSTIFY:
+            justify_ok += 1
+        size = para.runs[0].font.size if para.runs else None
+        if fmt.first_line_indent is not None and abs(
+                fmt.first_line_indent.pt / (size.pt if size else sv.BODY_FONT_SIZE) -
+                sv.FIRST_LINE_INDENT_CHARS) <= 0.5:
+            indent_ok += 1
+
+    def font_ok(info, size):
+        return info is not None and bool(info[0]) and sv.EXPECTED_FONT in info[0] and \
+            info[1] is not None and abs(info[1] - size) <= 1
+
+    def ratio_ok(count):
+        return body == 0 or count >= body * sv.FORMAT_RATIO[level]
+
+    section = doc.sections[0]
+    checks = {
+        "section_completeness": len(sections) == 7 and len(subsections) == 3,
+        "font_application": font_ok(title_para, sv.TITLE_FONT_SIZE) and
+        font_ok(body_para, sv.BODY_FONT_SIZE),
+        "paragraph_formatting": bool(spacing_values) and ratio_ok(spacing_ok) and
+        ratio_ok(justify_ok) and (level != "strict" or ratio_ok(indent_ok)),
+        "style_consistency": len(title_fonts) <= 2 and len(body_fonts) <= 2,
+        "page_setup": abs(section.page_width.cm - sv.A4_WIDTH_CM) < sv.PAGE_TOLERANCE_CM and
+        abs(section.page_height.cm - sv.A4_HEIGHT_CM) < sv.PAGE_TOLERANCE_CM,
+        "content_quality": empty <= sv.MAX_EMPTY_PARAGRAPHS and
+        all(v >= sv.MIN_SECTION_LENGTH for v in lengths.values()),
+    }
+    return {
+        "checks": checks,
+        "overall_score": sum(sv.WEIGHTS[k] for k, ok in checks.items() if ok),
+        "empty_paragraphs": empty,
+    }
+
+
+def _add(doc, text, size=10, bold=False, font="思源黑体 CN", body=True, style=None):
+    para = doc.add_paragraph(style=style)
+    run = para.add_run(text)
+    run.font.name = font
+    run.font.size = Pt(size)
+    run.font.bold = bold
+    if body:
+        para.paragraph_format.line_spacing = 1.5
+        para.paragraph_format.first_line_indent = Pt(20)
+        para.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+    return para
+
+
+def build_disclosure(tmp_path, figures=8, table=False, odd_first_runs=False,
+                     unindented=0, styled_headings=False) -> bytes:
+    doc = docx.Document()
+    section = doc.sections[0]
+    section.page_width, section.page_height = Cm(21.0), Cm(29.7)
+    image = tmp_path / "figure.png"
+    image.write_bytes(stub_png(300, 200, 3, 7))
+
+    # 粗体来自标题样式时文字块本身不设置粗体
+    heading = {"bold": None, "style": "Heading 1"} if styled_headings else {"bold": True}
+    _add(doc, "发明专利申请交底书", size=18, body=False, **heading)
+    for number, title in sv.REQUIRED_SECTIONS:
+        _add(doc, "{}. {}".format(number, title), size=18, body=False, **heading)
+        if number == "4":
+            for sub, name in (("1", "解决的技术问题"), ("2", "技术方案"), ("3", "有益效果")):
+                _add(doc, "（{}）{}".format(sub, name), size=18, body=False, **heading)
+                _add(doc, BODY_TEXT)
+        else:
+            _add(doc, BODY_TEXT)
+    for _ in range(figures):
+        doc.add_picture(str(image))
+        _add(doc, BODY_TEXT)
+    for _ in range(unindented):
+        _add(doc, BODY_TEXT).paragraph_format.first_line_indent = None
+    if table:
+        # 表格单元格中的空段落不属于 doc.paragraphs
+        cells = doc.add_table(rows=4, cols=3)
+        for cell in cells._cells:
+            cell.add_paragraph("")
+    if odd_first_runs:
+        # 第一个文字块没有文字时，字体仍取自该文字块
+        for font in ("宋体", "Arial"):
+            para = _add(doc, "", font=font)
+            run = para.add_run(BODY_TEXT)
+            run.font.name = "思源黑体 CN"
+            run.font.size = Pt(10)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("options", [
+    {"figures": 0},
+    {"figures": 3},
+    {"figures": 24},
+    {"figures": 2, "table": True},
+    {"figures": 0, "odd_first_runs": True},
+    {"figures": 8, "unindented": 1},
+])
+@pytest.mark.parametrize("level", ["standard", "strict"])
+def test_scores_match_python_docx(tmp_path, options, level):
+    data = build_disclosure(tmp_path, **options)
+    expected = reference_validate(data, level)
+    report = sv.validate_docx(data, level=level)
+
+    assert {k: v["passed"] for k, v in report["checks"].items()} == expected["checks"]
+    assert report["overall_score"] == expected["overall_score"]
+    assert report["checks"]["content_quality"]["details"]["empty_paragraphs"] == \
+        expected["empty_paragraphs"]
+
+
+def test_strict_level_requires_every_paragraph(tmp_path):
+    # 18个正文段落中1个没有首行缩进、1个不是两端对齐：standard 通过，strict 不通过
+    data = build_disclosure(tmp_path, figures=8, unindented=1)
+    doc = docx.Document(io.BytesIO(data))
+    doc.paragraphs[-1].paragraph_format.alignment = None
+    buffer = io.BytesIO()
+    doc.save(buffer)
+
+    standard = sv.validate_docx(buffer.getvalue(), level="standard")
+    strict = sv.validate_docx(buffer.getvalue(), level="strict")
+    assert standard["checks"]["paragraph_formatting"]["passed"]
+    assert not strict["checks"]["paragraph_formatting"]["passed"]
+    assert strict["checks"]["paragraph_formatting"]["details"]["first_line_indent_check"]["scored"]
+    assert standard["overall_score"] - strict["overall_score"] == \
+        sv.WEIGHTS["paragraph_formatting"]
+
+
+def test_style_inherited_bold_headings(tmp_path):
+    """标题粗体只来自样式时，python-docx 的 run.font.bold 为空，参照实现把标题当作正文"""
+    data = build_disclosure(tmp_path, styled_headings=True)
+    expected = reference_validate(data)
+    report = sv.validate_docx(data)
+    checks = {k: v["passed"] for k, v in report["checks"].items()}
+
+    assert report["overall_score"] == 100
+    differing = {k for k in checks if checks[k] != expected["checks"][k]}
+    assert differing == {"font_application", "paragraph_formatting"}
+    assert expected["overall_score"] == 100 - sv.WEIGHTS["font_application"] - \
+        sv.WEIGHTS["paragraph_formatting"]
+
+
+def test_image_paragraphs_are_not_empty(tmp_path):
+    report = sv.validate_docx(build_disclosure(tmp_path, figures=24), level="strict")
+    details = report["checks"]["content_quality"]["details"]
+    assert details["image_paragraphs"] == 24
+    assert details["empty_paragraphs"] == 0
+    assert report["overall_score"] == 100
+
+
+def test_processed_elements_are_removed(tmp_path, monkeypatch):
+    """已处理的正文元素从 body 中移除：每个段落被处理时都是 body 的第一个子元素"""
+    bodies = []
+    first_child = []
+    original_read = sv._read_paragraph
+    original_iterparse = sv.ET.iterparse
+
+    def read_paragraph(p, styles):
+        first_child.append(bodies[0][0] is p)
+        return original_read(p, styles)
+
+    def iterparse(source, events=None):
+        for event, elem in original_iterparse(source, events=events):
+            if event == "start" and elem.tag == sv.W + "body":
+                bodies.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(sv, "_read_paragraph", read_paragraph)
+    monkeypatch.setattr(sv.ET, "iterparse", iterparse)
+    sv.validate_docx(build_disclosure(tmp_path, figures=24, table=True))
+    assert first_child and all(first_child)
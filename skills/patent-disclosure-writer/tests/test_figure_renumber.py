@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""附图重新编号的回归测试"""
+
+from figure_renumber import renumber_text
+
+CHAPTER = """#### 附图1：请求处理流程图
+
+```mermaid
+graph TD
+    A[接收请求<br/>101] -->|HTTP 200 OK| B("网关 102")
+    B -- 重试 3 次 --> C{判断 101-1}
+    C -->|返回 HTTP 404| D[记录日志 103]
+    E[缓存 200 条记录]
+```
+
+如图1所示，网关（102）接收请求后执行步骤101。
+
+#### 附图2：交互时序图
+
+```mermaid
+sequenceDiagram
+    participant U as 用户 201
+    participant S as 服务器 202
+    U->>S: GET /status 200
+    Note over U,S: 超时 300 秒
+    S-->>U: 响应 HTTP 204
+```
+"""
+
+EXPECTED = """#### 附图3：请求处理流程图
+
+```mermaid
+graph TD
+    A[接收请求<br/>301] -->|HTTP 200 OK| B("网关 302")
+    B -- 重试 3 次 --> C{判断 301-1}
+    C -->|返回 HTTP 404| D[记录日志 303]
+    E[缓存 200 条记录]
+```
+
+如图3所示，网关（302）接收请求后执行步骤301。
+
+#### 附图4：交互时序图
+
+```mermaid
+sequenceDiagram
+    participant U as 用户 401
+    participant S as 服务器 402
+    U->>S: GET /status 200
+    Note over U,S: 超时 300 秒
+    S-->>U: 响应 HTTP 204
+```
+"""
+
+
+def test_only_label_marks_are_renumbered():
+    assert renumber_text(CHAPTER, {1: 3, 2: 4}) == EXPECTED
+
+
+def test_marks_from_other_figures_are_kept():
+    text = CHAPTER.replace("用户 201", "用户 101")
+    assert "用户 101" in renumber_text(text, {1: 3, 2: 4})
+
+
+SEQUENCE = """#### 附图6：IP地址分配时序图
+
+```mermaid
+sequenceDiagram
+    participant A as 从属设备<br/>600
+    participant B as 网络广播<br/>610
+    A->>B: IP_DISCOVER广播<br/>621
+    Note over A,B: T0时刻<br/>680
+    B-->>A: 响应 HTTP 200
+    B-->>A: 响应消息<br/>623
+```
+
+从属设备（600）发送广播消息（621），并在T0时刻（680）收到响应（623）。
+"""
+
+
+def test_sequence_message_and_note_marks_follow_participants():
+    result = renumber_text(SEQUENCE, {6: 2})
+    assert "participant A as 从属设备<br/>200" in result
+    assert "A->>B: IP_DISCOVER广播<br/>221" in result
+    assert "Note over A,B: T0时刻<br/>280" in result
+    assert "B-->>A: 响应消息<br/>223" in result
+    assert "B-->>A: 响应 HTTP 200" in result
+    assert "从属设备（200）发送广播消息（221），并在T0时刻（280）收到响应（223）。" in result
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""附图图片优化与 DOCX 媒体去重测试"""
+
+import io
+import random
+import zipfile
+
+import pytest
+
+import image_optimizer as io_opt
+
+Image = pytest.importorskip("PIL.Image")
+ImageChops = pytest.importorskip("PIL.ImageChops")
+
+
+def _png(img, **options) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", **options)
+    return buffer.getvalue()
+
+
+def _diagram(width=400, height=300) -> "Image.Image":
+    """白底上的几个色块，颜色数远少于256"""
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    for i, color in enumerate([(0, 0, 0), (30, 120, 200), (200, 60, 40)]):
+        img.paste(color, (100 + i * 40, 100, 130 + i * 40, 180))
+    return img
+
+
+def _open(data: bytes):
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+def test_palette_conversion_is_lossless():
+    original = _diagram()
+    optimized, steps = io_opt.optimize_png(_png(original), crop=False)
+    assert "palette" in steps
+    result = _open(optimized)
+    assert result.mode == "P"
+    assert ImageChops.difference(result.convert("RGB"), original).getbbox() is None
+
+
+def test_crop_keeps_margin_around_content():
+    optimized, steps = io_opt.optimize_png(_png(_diagram()), margin=10)
+    assert "crop 400x300->130x100" in steps
+    result = _open(optimized).convert("RGB")
+    assert result.size == (130, 100)
+    assert result.getpixel((10, 10)) == (0, 0, 0)
+    assert result.getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_resize_to_print_width_and_write_dpi():
+    max_width = io_opt.print_width_pixels(dpi=100, inches=2)
+    optimized, steps = io_opt.optimize_png(_png(_diagram(800, 600)), max_width=max_width,
+                                           dpi=100, crop=False)
+    assert "resize 800x600->200x150" in steps
+    result = _open(optimized)
+    assert result.size == (200, 150)
+    assert [round(v) for v in result.info["dpi"]] == [100, 100]
+
+
+def test_sixteen_bit_images_keep_their_pixels():
+    rng = random.Random(7)
+    original = Image.new("I;16", (64, 48))
+    # 高位为渐变、低位为噪声：Pillow 转为 RGB 后几乎全部变成白色
+    original.putdata([(x * 977 + y * 131) % 60000 + rng.randrange(64)
+                      for y in range(48) for x in range(64)])
+    data = _png(original, compress_level=0)
+
+    optimized, steps = io_opt.optimize_png(data, max_width=16, dpi=300)
+    assert steps == ["keep_pixels I;16", "recompress"]
+    result = _open(optimized)
+    assert result.mode == original.mode and result.size == original.size
+    assert result.tobytes() == original.tobytes()
+    assert io_opt.png_bit_depth(optimized) == 16
+
+
+def _relationship(rid, target):
+    return ('<Relationship Id="{}" Type="http://schemas.openxmlformats.org/officeDocument/'
+            '2006/relationships/image" Target="{}"/>'.format(rid, target))
+
+
+def _package(path, image: bytes):
+    rels = ('<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.'
+            'openxmlformats.org/package/2006/relationships">{}{}{}</Relationships>').format(
+        _relationship("rId1", "media/image1.png"),
+        _relationship("rId2", "media/image2.png"),
+        _relationship("rId3", "/word/media/image3.png"))
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr(zipfile.ZipInfo(io_opt.CONTENT_TYPES),
+                   '<Types><Override PartName="/word/media/image2.png" ContentType="image/png"/>'
+                   '<Default Extension="png" ContentType="image/png"/></Types>',
+                   compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("word/document.xml", "<w:document/>", compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("word/_rels/document.xml.rels", rels, compress_type=zipfile.ZIP_DEFLATED)
+        for n in (1, 2, 3):
+            z.writestr("word/media/image{}.png".format(n), image, compress_type=zipfile.ZIP_STORED)
+
+
+def test_docx_media_dedupe_rewrites_relationships(tmp_path):
+    source = tmp_path / "input.docx"
+    output = tmp_path / "output.docx"
+    _package(str(source), _png(_diagram()))
+    report = io_opt.optimize_docx(str(source), str(output))
+
+    assert report["duplicates_removed"] == 2
+    with zipfile.ZipFile(str(output)) as z:
+        names = z.namelist()
+        rels = z.read("word/_rels/document.xml.rels").decode("utf-8")
+        content_types = z.read(io_opt.CONTENT_TYPES).decode("utf-8")
+        compress = {i.filename: i.compress_type for i in z.infolist()}
+    assert [n for n in names if n.startswith("word/media/")] == ["word/media/image1.png"]
+    assert rels.count('Target="media/image1.png"') == 2
+    assert 'Target="/word/media/image1.png"' in rels
+    assert "image2.png" not in content_types and 'Extension="png"' in content_types
+    assert compress["word/media/image1.png"] == zipfile.ZIP_STORED
+    assert compress["word/document.xml"] == zipfile.ZIP_DEFLATED
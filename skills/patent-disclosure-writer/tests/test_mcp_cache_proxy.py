@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""MCP 缓存代理的错误处理与请求合并测试"""
+
+import http.server
+import threading
+import time
+
+import pytest
+
+import mcp_cache_proxy as mcp
+
+
+def _call(arguments=None, request_id=1):
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": "search", "arguments": arguments or {"q": "专利"}}}
+
+
+class BlockingUpstream(object):
+    """第一次请求阻塞到 release 之后，再按 outcome 返回结果或抛出异常"""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def request(self, message, timeout):
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(5)
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return {"jsonrpc": "2.0", "id": message["id"], "result": self.outcome}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = mcp.ResponseCache(str(tmp_path / "cache.sqlite"), 3600, 1 << 20)
+    yield cache
+    cache.close()
+
+
+def _proxy(upstream, cache):
+    return mcp.CachingProxy("stub", upstream, cache, mcp.RateLimiter(0, 1), timeout=5)
+
+
+def test_unexpected_upstream_error_fails_leader_and_followers(cache):
+    upstream = BlockingUpstream(RuntimeError("boom"))
+    proxy = _proxy(upstream, cache)
+    responses = {}
+
+    def run(request_id):
+        responses[request_id] = proxy.handle_request(_call(request_id=request_id))
+
+    leader = threading.Thread(target=run, args=(1,))
+    leader.start()
+    assert upstream.entered.wait(5)
+    follower = threading.Thread(target=run, args=(2,))
+    follower.start()
+    deadline = time.monotonic() + 5
+    while not cache.stats().get("stub", {}).get("coalesced") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    upstream.release.set()
+    leader.join(5)
+    follower.join(5)
+
+    for request_id in (1, 2):
+        assert responses[request_id]["id"] == request_id
+        assert responses[request_id]["error"]["code"] == -32603
+        assert "boom" in responses[request_id]["error"]["message"]
+    assert upstream.calls == 1
+    assert proxy._inflight == {}
+
+
+def test_leader_rechecks_cache(cache, monkeypatch):
+    upstream = BlockingUpstream({"content": []})
+    upstream.release.set()
+    proxy = _proxy(upstream, cache)
+    message = _call()
+    key = mcp.request_key("stub", "search", message["params"]["arguments"])
+    cache.put(key, "stub", "search", {"content": [{"type": "text", "text": "已缓存"}]})
+
+    # 模拟首次查询缓存时另一个领导者尚未写入结果
+    original_get = cache.get
+    lookups = []
+
+    def get(k):
+        lookups.append(k)
+        return None if len(lookups) == 1 else original_get(k)
+
+    monkeypatch.setattr(cache, "get", get)
+    response = proxy.handle_request(message)
+    assert response["result"]["content"][0]["text"] == "已缓存"
+    assert upstream.calls == 0
+
+
+class _InvalidJsonHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"<html>gateway error</html>")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_invalid_http_response_becomes_jsonrpc_error(cache):
+    server = http.server.HTTPServer(("127.0.0.1", 0), _InvalidJsonHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        upstream = mcp.HttpUpstream("http://127.0.0.1:{}/mcp".format(server.server_port), {})
+        with pytest.raises(mcp.ProxyError):
+            upstream.request({"jsonrpc": "2.0", "method": "tools/list"}, 5)
+        response = _proxy(upstream, cache).handle_request(_call(request_id=7))
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+    assert response["id"] == 7
+    assert "JSON" in response["error"]["message"]
+
+
+def _age(cache, key, seconds):
+    cache._db.execute("UPDATE cache SET created = created - ?, last_access = last_access - ?"
+                      " WHERE key = ?", (seconds, seconds, key))
+
+
+def test_ttl_and_size_limit_apply_per_service(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    patents = mcp.ResponseCache(path, 7 * 24 * 3600, 1 << 20)
+    exa = mcp.ResponseCache(path, 60, 200)
+    try:
+        patent_key = mcp.request_key("google-patents-mcp", "search", {"q": "专利"})
+        patents.put(patent_key, "google-patents-mcp", "search", {"text": "x" * 500})
+        _age(patents, patent_key, 3600)
+        old_key = mcp.request_key("exa", "search", {"q": "旧"})
+        exa.put(old_key, "exa", "search", {"text": "旧结果"})
+        _age(exa, old_key, 3600)
+
+        # exa 的 TTL（60秒）和容量上限（200字节）都不影响专利检索服务的条目
+        new_key = mcp.request_key("exa", "search", {"q": "新"})
+        assert exa.put(new_key, "exa", "search", {"text": "y" * 100}) == 1
+        assert patents.get(patent_key) == {"text": "x" * 500}
+        assert exa.get(old_key) is None
+        assert exa.get(new_key) == {"text": "y" * 100}
+
+        # 超出 exa 的容量上限时只淘汰 exa 最久未访问的条目
+        exa.put(mcp.request_key("exa", "search", {"q": "再"}), "exa", "search", {"text": "z" * 100})
+        assert exa.get(new_key) is None
+        assert patents.get(patent_key) is not None
+    finally:
+        patents.close()
+        exa.close()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""附图标记检查的回归测试"""
+
+import mermaid_lint as ml
+
+FIGURE_4 = """#### 附图4：数据处理流程图
+
+```mermaid
+graph TD
+    A[设备上电<br/>401] -->|返回 HTTP 404| B("网关 402")
+    B --> C{判断 403}
+```
+"""
+
+FIGURE_5 = """#### 附图5：交互时序图
+
+```mermaid
+sequenceDiagram
+    participant U as 用户 501
+    participant S as 服务器 502
+    U->>S: 请求状态 200
+    Note over U,S: 超时 300
+    S-->>U: 响应 HTTP 504
+```
+"""
+
+
+def _mark_issues(tmp_path, files):
+    paths = []
+    for name, text in files:
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        paths.append(str(path))
+    report = ml.lint_files(paths)
+    return [i for i in report["issues"] if i["category"].startswith("mark")], report
+
+
+def test_figure_in_description_and_chapter_is_counted_once(tmp_path):
+    issues, report = _mark_issues(tmp_path, [
+        ("05_具体实施方式.md", FIGURE_4),
+        ("10_附图说明.md", FIGURE_4),
+    ])
+    assert issues == []
+    assert report["passed"]
+
+
+def test_digits_in_link_message_and_note_text_are_not_marks(tmp_path):
+    issues, report = _mark_issues(tmp_path, [("05_具体实施方式.md", FIGURE_4 + "\n" + FIGURE_5)])
+    assert issues == []
+    assert [f["marks"] for f in report["figures"]] == [["401", "402", "403"], ["501", "502"]]
+
+
+# sequence-generator 子代理（agents/patent/13）的标准时序图结构
+SEQUENCE_TEMPLATE = """#### 附图6：IP地址分配时序图
+
+```mermaid
+sequenceDiagram
+    participant A as 参与者1<br/>600
+    participant B as 参与者2<br/>610
+    participant C as 参与者3<br/>620
+
+    A->>B: 消息1<br/>621
+    Note over A,B: 时间标注<br/>680
+
+    B->>C: 消息2<br/>622
+    C-->>B: 响应<br/>623
+
+    B-->>A: 最终响应<br/>624
+```
+"""
+
+
+def test_sequence_template_passes_strict(tmp_path):
+    path = tmp_path / "05_具体实施方式.md"
+    path.write_text(SEQUENCE_TEMPLATE, encoding="utf-8")
+    report = ml.lint_files([str(path)], level="strict")
+    assert report["issues"] == []
+    assert report["passed"]
+    assert report["figures"][0]["marks"] == ["600", "610", "620", "621", "680", "622", "623", "624"]
+
+
+def test_message_and_note_marks_are_checked(tmp_path):
+    text = SEQUENCE_TEMPLATE.replace("最终响应<br/>624", "最终响应<br/>923") \
+        .replace("响应<br/>623", "响应<br/>621").replace("消息2<br/>622", "消息2<br/>624")
+    issues, _ = _mark_issues(tmp_path, [("05_具体实施方式.md", text)])
+    found = sorted((i["category"], i["line"], i["message"]) for i in issues)
+    assert found == [
+        ("mark_range", 15, "标记 923 超出图6的范围 600-699"),
+        ("mark_sequence", 12, "图6标记不连续，缺少：622、623"),
+        ("mark_unique", 13, "图6中标记 621 重复（已用于第9行）"),
+    ]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Mermaid 渲染缓存测试（用 benchmark 的桩渲染器代替 mmdc）"""
+
+import os
+
+import benchmark
+import mermaid_renderer as mr
+from figure_utils import iter_mermaid_blocks
+
+MARKDOWN = """**附图1：系统架构图**
+
+```mermaid
+graph TD
+    A[请求<br/>101] --> B[缓存<br/>102]
+```
+
+**附图2：处理流程图**
+
+```mermaid
+graph TD
+    A[开始<br/>201] --> BROKEN
+```
+
+**附图3：交互时序图**
+
+```mermaid
+sequenceDiagram
+    participant A as 终端<br/>301
+```
+"""
+
+
+class FlakyRenderer(benchmark.StubRenderer):
+    """含 BROKEN 的源码视为语法错误，与 mmdc 一样导致整批失败"""
+
+    def __init__(self):
+        self.batches = []
+
+    def render_batch(self, sources, workdir, options):
+        self.batches.append(len(sources))
+        if any("BROKEN" in source for source in sources):
+            raise mr.RenderError("Parse error")
+        return super(FlakyRenderer, self).render_batch(sources, workdir, options)
+
+
+def _render(tmp_path, text=MARKDOWN, renderer=None):
+    renderer = renderer or FlakyRenderer()
+    cache = mr.MermaidRenderCache(str(tmp_path), renderer=renderer, workers=1)
+    return cache.render_blocks(list(iter_mermaid_blocks(text))), renderer
+
+
+def test_cache_key_depends_on_source_options_and_version():
+    options = mr.RenderOptions()
+    key = mr.cache_key("graph TD\n    A --> B", options, "10.0.0")
+    assert mr.cache_key("graph TD  \n    A --> B\n\n", options, "10.0.0") == key
+    assert mr.cache_key("graph TD\n    A --> C", options, "10.0.0") != key
+    assert mr.cache_key("graph TD\n    A --> B", options, "11.0.0") != key
+    assert mr.cache_key("graph TD\n    A --> B", mr.RenderOptions(theme="dark"), "10.0.0") != key
+    assert mr.cache_key("graph TD\n    A --> B", mr.RenderOptions(width=800), "10.0.0") != key
+    assert mr.cache_key("graph TD\n    A --> B", mr.RenderOptions.for_print(300), "10.0.0") != key
+
+
+def test_failed_batch_is_retried_per_figure(tmp_path):
+    report, renderer = _render(tmp_path)
+    assert renderer.batches == [3, 1, 1, 1]
+    assert [e["status"] for e in report["renders"]] == ["success", "failed", "success"]
+    assert report["renders"][1]["error"] == "Parse error"
+    assert report["failed"] == 1
+    assert os.path.exists(str(tmp_path / "图1_系统架构图.png"))
+    assert not os.path.exists(str(tmp_path / "图2_处理流程图.png"))
+
+
+def test_second_run_hits_cache(tmp_path):
+    _render(tmp_path)
+    report, renderer = _render(tmp_path)
+    assert [e["cache"] for e in report["renders"]] == ["hit", "miss", "hit"]
+    assert renderer.batches == [1]
+
+
+def test_failed_figure_removes_stale_image(tmp_path):
+    fixed = MARKDOWN.replace("--> BROKEN", "--> B[结束<br/>202]")
+    report, _ = _render(tmp_path, fixed)
+    assert report["failed"] == 0
+    stale = tmp_path / "图2_处理流程图.png"
+    assert stale.exists()
+
+    report, _ = _render(tmp_path)
+    assert report["renders"][1]["stale_image_removed"]
+    assert not stale.exists()
+
+
+def test_publish_skips_identical_image(tmp_path):
+    report, _ = _render(tmp_path)
+    image = str(tmp_path / "图1_系统架构图.png")
+    os.utime(image, (1000000000, 1000000000))
+    cache = mr.MermaidRenderCache(str(tmp_path), renderer=FlakyRenderer())
+    cache._publish(report["renders"][0])
+    assert os.stat(image).st_mtime == 1000000000
+
+    with open(image, "wb") as f:
+        f.write(b"old")
+    cache._publish(report["renders"][0])
+    with open(cache.cached_path(report["renders"][0]["cache_key"]), "rb") as a, \
+            open(image, "rb") as b:
+        assert a.read() == b.read()
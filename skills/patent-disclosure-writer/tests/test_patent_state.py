@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""状态索引并发写入测试"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import patent_state
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(patent_state.__file__)), "patent_state.py")
+CHAPTERS = ["{:02d}_章节{}.md".format(n, n) for n in range(1, 11)]
+
+
+def test_parallel_records_keep_every_agent(tmp_path):
+    for name in CHAPTERS:
+        (tmp_path / name).write_text("# 章节\n\n正文内容。\n", encoding="utf-8")
+
+    procs = [
+        subprocess.Popen([sys.executable, SCRIPT, "record", str(tmp_path / name),
+                          "--agent", "agent-{}".format(name[:2])],
+                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        for name in CHAPTERS
+    ]
+    for proc in procs:
+        output = proc.communicate(timeout=60)[0]
+        assert proc.returncode == 0, output.decode("utf-8", "replace")
+
+    with open(str(tmp_path / patent_state.STATE_FILENAME), encoding="utf-8") as f:
+        state = json.load(f)
+    assert {name: entry["agent"] for name, entry in state["chapters"].items()} == \
+        {name: "agent-{}".format(name[:2]) for name in CHAPTERS}
+    assert sorted(os.listdir(str(tmp_path))) == sorted(CHAPTERS + [patent_state.STATE_FILENAME])
+
+
+def _leftover_lock(tmp_path):
+    """模拟持有进程异常退出后遗留的锁文件"""
+    lock = tmp_path / patent_state.LOCK_FILENAME
+    lock.write_text("12345", encoding="ascii")
+    stale = os.stat(str(lock)).st_mtime - 3600
+    os.utime(str(lock), (stale, stale))
+    return lock
+
+
+def test_leftover_lock_file_is_reused(tmp_path):
+    lock = _leftover_lock(tmp_path)
+    with patent_state.state_lock(str(tmp_path)):
+        assert lock.read_text(encoding="ascii") == str(os.getpid())
+    assert not lock.exists()
+
+
+def test_waiters_racing_on_leftover_lock_do_not_overlap(tmp_path, monkeypatch):
+    lock = str(_leftover_lock(tmp_path))
+    real_stat = os.stat
+
+    def slow_stat(path, *args, **kwargs):
+        # 拉长「检查锁文件」与后续操作之间的窗口，让等待者的检查交错发生
+        result = real_stat(path, *args, **kwargs)
+        if str(path) == lock:
+            time.sleep(0.02)
+        return result
+
+    monkeypatch.setattr(os, "stat", slow_stat)
+    start = threading.Barrier(4)
+    holders = []
+    overlaps = []
+
+    def waiter():
+        start.wait()
+        for _ in range(5):
+            with patent_state.state_lock(str(tmp_path)):
+                holders.append(threading.get_ident())
+                if len(holders) > 1:
+                    overlaps.append(list(holders))
+                time.sleep(0.01)
+                holders.remove(threading.get_ident())
+
+    threads = [threading.Thread(target=waiter) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in threads)
+    assert overlaps == []
+    assert not (tmp_path / patent_state.LOCK_FILENAME).exists()